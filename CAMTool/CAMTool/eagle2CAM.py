@@ -36,6 +36,8 @@ eagle2gerbers
 import configparser
 from pkg_resources import Requirement, resource_filename
 import CAMTool.fab.SiteConfiguration as config
+from CAMTool.fab import BoardCache
+from CAMTool import eagle2fab
 
 import sys
 import os
@@ -468,13 +470,12 @@ def isNeeded(file, base_time):
     return True
 
 
+"""
+BOM, pick-n-place job and SVG for the singleton and panel boards.
+Each board is parsed once for all of its outputs, and the feeder table is
+only loaded if something needs to be rebuilt.
+"""
 def generateFabFiles(args):
-    def callCommand(args, command, board):
-        command = "{COMMAND} --feederfile=/tmp/PnP-feeders {BOARD}".format(COMMAND=command, BOARD=board)
-        if args.verbose:
-            print('% {}'.format(command))
-        os.system(command)
-
     singletonbase = args.project
     panelbase     = "{}_array".format(args.project)
 
@@ -487,6 +488,7 @@ def generateFabFiles(args):
             s='# ERROR: Can not create fab files without a brd file ({} or {})...'
             raise Exception(s.format(singleton, panel))
 
+    fabdata = None
     for project in [singletonbase, panelbase]:
 
         blist = genBoardFilenameList(args, project)
@@ -497,13 +499,26 @@ def generateFabFiles(args):
 
         base_time = getCADtime(schematic, b)
 
+        outputs = []
         if args.picknplace:
             if isNeeded(blist['dpv'], base_time):
-                callCommand(args, args.config.get('EagleTools', 'eagle2chmt'), b)
+                outputs.append('dpv')
         if isNeeded(blist['svg'], base_time):
-            callCommand(args, args.config.get('EagleTools', 'eagle2svg'),  b)
+            outputs.append('svg')
         if isNeeded(blist['bom'], base_time):
-            callCommand(args, args.config.get('EagleTools', 'eagle2bom'),  b)
+            outputs.append('bom')
+        if not outputs:
+            continue
+
+        if fabdata is None:
+            BoardCache.configure(args.config)
+            fabdata = eagle2fab.loadFabData(args.config, feederfile="/tmp/PnP-feeders")
+        if args.verbose:
+            print('% eagle2fab --{} {}'.format(' --'.join(outputs), b))
+        try:
+            eagle2fab.makeFabFiles(b, outputs, *fabdata, configuration=args.config)
+        except Exception as e:
+            print('# ERROR: Could not create fab files for {}: {}'.format(b, e))
 
 
 def clean(args):
@@ -15,146 +15,56 @@ Generate a parts BOM used in an Eagle project
 import configparser
 from pkg_resources import Requirement, resource_filename
 import CAMTool.fab.SiteConfiguration as config
-from CAMTool.fab import CHMTPickNPlace, EagleCAD
+from CAMTool.fab import Artifact, Batch, BOM, BoardCache, CHMTPickNPlace, EagleCAD, Panel, Rollup
 
-from natsort import natsorted
 import sys
 import argparse
+import csv
 import io
+import json
 import os.path
-import re
 
+# BOM formats, and the suffix of the file each is written to
+FORMATS = {
+    "md":   ".bom.md",
+    "wiki": ".bom.wiki",
+    "csv":  ".bom.csv",
+    "json": ".bom.json",
+}
 
-def sorted_nicely(l):
-    """ Sorts the given iterable in the way that is expected.
+# parts that aren't bought (board outlines, test points, mounting holes...)
+NOTBOUGHT = ("#-", "target-", "no_load-", "mount-", "fidicual-")
+# the wiki BOM also leaves out everything without a value
+NOTBOUGHTWIKI = ("-", "target-", "no_load-", "mount-", "fidicual-")
 
-    Required arguments:
-    l -- The iterable to be sorted.
-
-    """
-    convert = lambda text: int(text) if text.isdigit() else text
-    alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
-    return sorted(l, key=alphanum_key)
-
-
-def try_int(s):
-    "Convert to integer if possible."
-    try:
-        return int(s)
-    except:
-        return s
-
-
-def natsort_key(s):
-    "Used internally to get a tuple by which s is sorted."
-    import re
-    return list(map(try_int, re.findall(r'(\d+|\D+)', s)))
-
-
-def natcmp(a, b):
-    "Natural string comparison, case sensitive."
-    return cmp(natsort_key(a), natsort_key(b))
-
-def natural_sort(l):
-    convert      = lambda i: int(i['name']) if i['name'].isdigit() else i['name'].lower()
-    alphanum_key = lambda key: [ convert(c) for c in re.split('([0-9]+)', key) ]
-    return sorted(l, key = alphanum_key)
+"""
+The lines of a BOM (see BOM.aggregate()) to list: SMT and/or PTH parts,
+leaving out those whose ids start with one of the skip prefixes
+"""
+def selectLines(bom, smt, pth, skip=NOTBOUGHT):
+    for line in bom:
+        if line.id.startswith(skip):
+            continue
+        if (smt if line.smd else pth):
+            yield line
 
 def outputParts(parts, smt, pth):
-    return outputPartsMD(parts, smt, pth)
+    return outputPartsMD(BOM.aggregate(parts), smt, pth)
 
-def outputPartsMD(parts, smt, pth):
+def outputPartsMD(bom, smt, pth):
     output = io.StringIO()
-    partcounts = {}
-
-    # by part name, with common values collected together...
-    for pn in sorted(iter(parts.keys()), key=EagleCAD.natural_sort_key):
-        p = parts[pn]
-        # p['id'] == part value - package
-        if p['id'] in partcounts:
-            partcounts[p['id']]['cnt'] += 1
-            partcounts[p['id']]['list'].append(p)
-
-        else:
-            partcounts[p['id']] = {}
-            partcounts[p['id']]['cnt'] = 1
-            partcounts[p['id']]['list'] = []
-            partcounts[p['id']]['p'] = p
-            partcounts[p['id']]['list'].append(p)
-
-            if 'feeder' in p:
-                partcounts[p['id']]['feed'] = p['feeder']
-
-
     output.write("{:.partlist}\n")  # CSS styling class...
     output.write("| Parts | Value | Package | Quantity | Library | Type/Feeder\n")
-
-    for pn in sorted(iter(partcounts.keys()), key=EagleCAD.natural_sort_key):
-
-        count = partcounts[pn]['cnt']
-        list  = partcounts[pn]['list']
-        f     = partcounts[pn]['feed']
-        p     = partcounts[pn]['p']
-
-        if      not pn.startswith("#-") \
-            and not pn.startswith("target-") \
-            and not pn.startswith("no_load-") \
-            and not pn.startswith("mount-") \
-            and not pn.startswith("fidicual-") \
-            and list :
-
-            if f == CHMTPickNPlace.SKIP:
-                if pth:
-                    output.write('|-\n')
-                    sep='| '
-                    for p in natsorted(list, key=lambda i: i['name']):
-                        output.write('{}{}'.format(sep, p['name']))
-                        sep = ', '
-                    output.write(" | {} | {} | {}x | {} | {}\n".format(p['value'], p['package'], count, p['library'], 'PTH'))
-            elif f == CHMTPickNPlace.NOTFOUND:
-                if smt:
-                    output.write('|-\n')
-                    sep='| '
-                    for p in natsorted(list, key=lambda i: i['name']):
-                        output.write('{}{}'.format(sep, p['name']))
-                        sep = ', '
-                    output.write(" | {} | {} | {}x | {} | {}\n".format(p['value'], p['package'], count, p['library'], 'NONE'))
-            else:
-                if smt:
-                    output.write('|-\n')
-                    sep='| '
-                    for p in natsorted(list, key=lambda i: i['name']):
-                        output.write('{}{}'.format(sep, p['name']))
-                        sep = ', '
-                    output.write(" | {} | {} | {}x | {} | {}\n".format(p['value'], p['package'], count, p['library'], f))
-
+    for line in selectLines(bom, smt, pth):
+        output.write('|-\n')
+        output.write("| {} | {} | {} | {}x | {} | {}\n".format(', '.join(line.names),
+            line.value, line.package, line.count, line.library, line.feederName))
     contents = output.getvalue()
     output.close()
     return contents
 
-def outputPartsWiki(parts, smt, pth):
+def outputPartsWiki(bom, smt, pth):
     output = io.StringIO()
-    partcounts = {}
-
-    # by part name, with common values collected together...
-    for pn in parts.keys():
-        p = parts[pn]
-        # p['id'] == part value - package
-        if p['id'] in partcounts:
-            partcounts[p['id']]['cnt'] += 1
-            partcounts[p['id']]['list'].append(p)
-
-        else:
-            partcounts[p['id']] = {}
-            partcounts[p['id']]['cnt'] = 1
-            partcounts[p['id']]['list'] = []
-            partcounts[p['id']]['p'] = p
-            partcounts[p['id']]['list'].append(p)
-
-            if 'feeder' in p:
-                partcounts[p['id']]['feed'] = p['feeder']
-
-
     output.write("""
 ==Parts List==
 <blockquote>
@@ -165,61 +75,191 @@ def outputPartsWiki(parts, smt, pth):
 ! Quantity
 ! Feeder
 """)
-    for pn in sorted(iter(partcounts.keys()), key=EagleCAD.natural_sort_key):
-        count = partcounts[pn]['cnt']
-        list  = partcounts[pn]['list']
-        f     = partcounts[pn]['feed']
-        p     = partcounts[pn]['p']
-
-        if      not pn.startswith("-") \
-            and not pn.startswith("target-") \
-            and not pn.startswith("no_load-") \
-            and not pn.startswith("mount-") \
-            and not pn.startswith("fidicual-") \
-            and list :
-
-            if f == CHMTPickNPlace.SKIP:
-                if pth:
-                    output.write('|-\n')
-                    sep='| '
-                    for p in sorted(list, cmp=natcmp, key=lambda i: i['name']):
-                        output.write('{}{}'.format(sep, p['name']))
-                        sep = ', '
-                    output.write("\n| {} \n| {} \n| {}x \n| {}\n".format(p['value'], p['package'], count, 'PTH'))
-            elif f == CHMTPickNPlace.NOTFOUND:
-                if smt:
-                    output.write('|-\n')
-                    sep='| '
-                    for p in sorted(list, cmp=natcmp, key=lambda i: i['name']):
-                        output.write('{}{}'.format(sep, p['name']))
-                        sep = ', '
-                    output.write("\n| {} \n| {} \n| {}x \n| {}\n".format(p['value'], p['package'], count, 'NONE'))
-            else:
-                if smt:
-                    output.write('|-\n')
-                    sep='| '
-                    for p in sorted(list, cmp=natcmp, key=lambda i: i['name']):
-                        output.write('{}{}'.format(sep, p['name']))
-                        sep = ', '
-                    output.write("\n| {} \n| {} \n| {}x \n| {}\n".format(p['value'], p['package'], count, f))
-
+    for line in selectLines(bom, smt, pth, NOTBOUGHTWIKI):
+        output.write('|-\n')
+        output.write('| {}'.format(', '.join(line.names)))
+        output.write("\n| {} \n| {} \n| {}x \n| {}\n".format(line.value, line.package, line.count, line.feederName))
     output.write("|}\n</blockquote>\n")
+    contents = output.getvalue()
+    output.close()
+    return contents
 
+def outputPartsCSV(bom, smt, pth):
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(("Parts", "Value", "Package", "Quantity", "Library", "Type/Feeder"))
+    for line in selectLines(bom, smt, pth):
+        writer.writerow((' '.join(line.names), line.value, line.package, line.count, line.library, line.feederName))
     contents = output.getvalue()
     output.close()
     return contents
 
+def outputPartsJSON(bom, smt, pth):
+    lines = [{"parts":    list(line.names),
+              "value":    line.value,
+              "package":  line.package,
+              "quantity": line.count,
+              "library":  line.library,
+              "feeder":   line.feederName} for line in selectLines(bom, smt, pth)]
+    return json.dumps(lines, indent=2) + "\n"
+
+WRITERS = {
+    "md":   outputPartsMD,
+    "wiki": outputPartsWiki,
+    "csv":  outputPartsCSV,
+    "json": outputPartsJSON,
+}
+
+
+"""
+Rollup writers: totals are from Rollup.rollup(), plan a list of
+(board, quantity, boards per panel)
+"""
+def usedOn(total):
+    return ', '.join("{} {}x{}".format(os.path.basename(b), n, q) for (b, n, q) in total.boards)
+
+def outputRollupMD(plan, totals, smt, pth):
+    output = io.StringIO()
+    output.write("Build plan: {} boards from {} board files\n\n".format(
+        sum(q * n for (b, q, n) in plan), len(plan)))
+    output.write("{:.partlist}\n")  # CSS styling class...
+    output.write("| Value | Package | Quantity | Library | Type/Feeder | Tape (m) | Used On\n")
+    selected = list(selectLines(totals, smt, pth))
+    for t in selected:
+        output.write('|-\n')
+        output.write("| {} | {} | {}x | {} | {} | {:0.2f} | {}\n".format(t.value, t.package, t.quantity,
+            t.library, t.feederName, t.tape / 1000.0, usedOn(t)))
+
+    output.write("\n{:.partlist}\n")
+    output.write("| Feeder | Components | Quantity | Tape (m)\n")
+    for (f, quantity, tape, ts) in Rollup.byFeeder(selected):
+        output.write('|-\n')
+        output.write("| {} | {} | {}x | {:0.2f}\n".format(f, ', '.join(t.value + "-" + t.package for t in ts),
+            quantity, tape / 1000.0))
+    contents = output.getvalue()
+    output.close()
+    return contents
+
+def outputRollupCSV(plan, totals, smt, pth):
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(("Value", "Package", "Quantity", "Library", "Type/Feeder", "Tape (mm)", "Used On"))
+    for t in selectLines(totals, smt, pth):
+        writer.writerow((t.value, t.package, t.quantity, t.library, t.feederName, t.tape, usedOn(t)))
+    contents = output.getvalue()
+    output.close()
+    return contents
+
+def outputRollupJSON(plan, totals, smt, pth):
+    selected = list(selectLines(totals, smt, pth))
+    rollup = {
+        "boards":     [{"board": b, "quantity": q, "boards": q * n} for (b, q, n) in plan],
+        "components": [{"value":    t.value,
+                        "package":  t.package,
+                        "quantity": t.quantity,
+                        "library":  t.library,
+                        "feeder":   t.feederName,
+                        "tape":     t.tape,
+                        "boards":   [{"board": b, "parts": n, "quantity": q} for (b, n, q) in t.boards]}
+                       for t in selected],
+        "feeders":    [{"feeder": f, "quantity": quantity, "tape": tape,
+                        "components": [t.value + "-" + t.package for t in ts]}
+                       for (f, quantity, tape, ts) in Rollup.byFeeder(selected)],
+    }
+    return json.dumps(rollup, indent=2) + "\n"
+
+ROLLUPWRITERS = {
+    "md":   outputRollupMD,
+    "csv":  outputRollupCSV,
+    "json": outputRollupJSON,
+}
+
+def startWorker(args, *shared):
+    BoardCache.configure(args.config)
+
+def processBoard(f, args, feeder, component, palettes):
+    if args.verbose or len(args.PCBfile) > 1:
+        print("Processing {}".format(f))
+
+    outdir = os.path.dirname(f)
+
+    if args.outdir:
+        if args.outdir == '@':
+            outdir = args.config.get('EagleTools', 'defaultBOMdir')
+        elif args.outdir == "-":
+            pass
+        else:
+            outdir = args.outdir
+
+    (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
+    parts    = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
+    bom      = BOM.aggregate(parts)
+
+    for fmt in args.format:
+        content = WRITERS[fmt](bom, args.smt, args.pth)
+        if args.outdir == '-':
+            print(content)
+        else:
+            outfilename = os.path.splitext(os.path.basename(f))[0] + FORMATS[fmt]
+            with Artifact.Artifact(os.path.join(outdir, outfilename)) as outfile:
+                outfile.write(content)
+
+"""
+A board's BOM for a rollup, and the number of boards on it (more than 1
+for an _array panel)
+"""
+def rollupBoard(f, args, feeder, component, palettes):
+    if args.verbose:
+        print("Processing {}".format(f))
+    (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
+    parts = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
+    panel = Panel.detect(f, eagleBoard)
+    return (BOM.aggregate(parts), len(panel.boards) if panel else 1)
+
+"""
+The purchase BOM for a build plan (see Rollup), written next to the plan
+as <plan_basename>.rollup.md (or .csv, .json)
+"""
+def rollupPlan(args, feeder, component, palettes):
+    plan   = Rollup.readPlan(args.rollup)
+    boards = [b for (b, q) in plan]
+    (results, failed) = Batch.mapBoards(rollupBoard, boards, args.jobs,
+                                        (args, feeder, component, palettes), startWorker)
+    if failed:
+        return failed
+
+    boms   = [(b, q, bom) for ((b, q), (bom, n)) in zip(plan, results)]
+    totals = Rollup.rollup(boms, feeder)
+    built  = [(b, q, n) for ((b, q), (bom, n)) in zip(plan, results)]
+
+    outdir = os.path.dirname(args.rollup)
+    if args.outdir == '@':
+        outdir = args.config.get('EagleTools', 'defaultBOMdir')
+    elif args.outdir and args.outdir != '-':
+        outdir = args.outdir
+    for fmt in args.format:
+        content = ROLLUPWRITERS[fmt](built, totals, args.smt, args.pth)
+        if args.outdir == '-':
+            print(content)
+        else:
+            outfilename = os.path.splitext(os.path.basename(args.rollup))[0] + ".rollup." + fmt
+            with Artifact.Artifact(os.path.join(outdir, outfilename)) as outfile:
+                outfile.write(content)
+    return 0
+
 def main():
     """
     main() 
 
     usage: eagle2bom.py [-h] [--eagleRC EAGLERC] [--feederfile FEEDERFILE]
             [--outdir OUTDIR] [--download] [--smt] [--pth] [--key KEY]
-            pcbfile [pcbfile ...]
+            [--format {md,wiki,csv,json}] [--rollup PLAN] [--jobs N]
+            [pcbfile ...]
 
     Create a parts list BOM from an EAGLEcad PCB board file(s).
     The BOM file will be named <pcbfile_basename>.bom.md and
-    will be in markdown table format
+    will be in markdown table format, or, with --format,
+    <pcbfile_basename>.bom.wiki, .bom.csv or .bom.json
 
     positional arguments:
       pcbfile               an EAGLEcad .brd file to process
@@ -234,6 +274,13 @@ def main():
       --smt                 SMT parts only?
       --pth                 PTH parts only?
       --key KEY             Google Sheets document access key
+      --format {md,wiki,csv,json}
+                            BOM format (may be repeated, default md)
+      --rollup PLAN         one purchase BOM for the boards and quantities
+                            in the csv build plan PLAN, written to
+                            <plan_basename>.rollup.md (or .csv, .json)
+      --jobs N, -j N        process boards in parallel with N worker
+                            processes (0 = one per CPU, default 1)
 
     """
 
@@ -251,10 +298,11 @@ def main():
     configuration.read(cfile)
     
     parser = argparse.ArgumentParser(description='Create a parts list BOM from an EAGLEcad PCB board file(s).\n'
-                         'The BOM file will be named <pcbfile_basename>.bom.wiki and\n'
-                         'will be in MediaWiki table format',
+                         'The BOM file will be named <pcbfile_basename>.bom.md and\n'
+                         'will be in markdown table format, or, with --format,\n'
+                         '<pcbfile_basename>.bom.wiki, .bom.csv or .bom.json',
                      formatter_class=argparse.RawDescriptionHelpFormatter)
-    parser.add_argument('PCBfile', metavar='pcbfile', type=str, nargs='+',
+    parser.add_argument('PCBfile', metavar='pcbfile', type=str, nargs='*',
             help='an EAGLEcad .brd file to process')
     parser.add_argument("--eagleRC",    help="Eagle rc file with palette definitions")
     parser.add_argument("--feederfile", help="csv file with feeder component assignments")
@@ -263,11 +311,23 @@ def main():
     parser.add_argument("--smt",        action="store_true", help="SMT parts only?")
     parser.add_argument("--pth",        action="store_true", help="PTH parts only?")
     parser.add_argument("--key",        help="Google Sheets document access key")
+    parser.add_argument("--format",     action="append", choices=sorted(FORMATS),
+            help="BOM format (may be repeated, default md)")
+    parser.add_argument("--rollup",     metavar="PLAN",
+            help="one purchase BOM for the boards and quantities in the csv build plan PLAN")
     parser.add_argument('--verbose',   '-v',  action='store_true', help='Verbose flag')
+    parser.add_argument('--jobs',      '-j',  type=int, default=1,
+            help='process boards in parallel with N worker processes (0 = one per CPU, default 1)')
     
 
     args = parser.parse_args()
+    if not args.PCBfile and not args.rollup:
+        parser.error("a pcbfile or a --rollup build plan is needed")
+    if args.rollup and "wiki" in (args.format or ()):
+        parser.error("a --rollup BOM can be md, csv or json")
     args.config = configuration
+    BoardCache.configure(configuration)
+    CHMTPickNPlace.configure(configuration)
     feederfile = args.config.get('EagleTools', 'defaultfeederfile')
     if args.feederfile:
         feederfile = args.feederfile
@@ -278,6 +338,8 @@ def main():
 
     if not args.smt and not args.pth:
         args.smt = args.pth = True
+    if not args.format:
+        args.format = ["md"]
 
     if (args.download or not os.path.isfile(feederfile) ):
         print("Downloading feederfile: ", feederfile)
@@ -286,35 +348,13 @@ def main():
     (feeder, component) = CHMTPickNPlace.loadFeeders(feederfile)
     palettes = EagleCAD.getLayers(rcfile)
 
-    for f in args.PCBfile:
-        if args.verbose or len(args.PCBfile) > 1:
-            print("Processing {}".format(f))
-
-        outfilename = os.path.splitext(os.path.basename(f))[0] + ".bom.md"
-        outdir = os.path.dirname(f)
-
-        if args.outdir:
-            if args.outdir == '@':
-                outdir = args.config.get('EagleTools', 'defaultBOMdir')
-            elif args.outdir == "-":
-                pass
-            else:
-                outdir = args.outdir
-        
-        bn = os.path.basename(outfilename)
-        outfilename = os.path.join(outdir, bn)
-
-        (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
-        parts    = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
-        used     = EagleCAD.getUsedComponents(parts, feeder)
-
-        content = outputParts(parts, args.smt, args.pth)
-        if args.outdir == '-':
-            print(content)
-        else:
-            with open(outfilename, "w") as outfile:
-                outfile.write(outputParts(parts, args.smt, args.pth))
-
+    if args.rollup:
+        failed = rollupPlan(args, feeder, component, palettes)
+    else:
+        failed = Batch.runBoards(processBoard, args.PCBfile, args.jobs,
+                                 (args, feeder, component, palettes), startWorker)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
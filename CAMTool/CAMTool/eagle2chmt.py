@@ -18,47 +18,43 @@ referenced here with the default key
 import configparser
 from pkg_resources import Requirement, resource_filename
 import CAMTool.fab.SiteConfiguration as config
-from .fab import CHMTPickNPlace, EagleCAD
+from .fab import Artifact, Batch, BoardCache, CHMTPickNPlace, EagleCAD, FeederPlan, Panel, PickPath
 
 import sys
 import os
 import datetime
 import argparse
-import io
 import os.path
 
 
 """
-Output routines to create a CharmHigh dpv file
+Output routines to create a CharmHigh dpv file, each writing its section
+of the job to output (see writeDPV())
 
 Note that there are several "typos" in the keywords used by the CHMT machine,
 they are called out when found.
 
 """
 
-def outputHeader(filename):
+# header lines that change on every run, and don't make the job different
+VOLATILE = ("DATE,", "TIME,")
+
+def outputHeader(output, filename, paneltype=0):
     now   = datetime.datetime.now()
     date  = now.strftime('DATE,%Y/%m/%d\n')
     time  = now.strftime('TIME,%H:%M:%S\n')
     fn    = os.path.splitext(os.path.basename(filename))[0]
     # File header
-
-    output = io.StringIO()
-
     output.write("separated\n");
     output.write("FILE,{}.dpv\n".format(fn))
     output.write("PCBFILE,SPCoast CHMT Processor\n")
     output.write(date)
     output.write(time)
-    output.write("PANELYPE,0\n")             # Typo is correct. Type 0 = batch of PCBs. Type 1 = panel of PCBs.
+    output.write("PANELYPE,{}\n".format(paneltype)) # Typo is correct. Type 0 = batch of PCBs. Type 1 = panel of PCBs.
     output.write("\n")                       # See addBatch() for details
     output.write("\n")
-    contents = output.getvalue()
-    output.close()
-    return contents
 
-def outputStations(used, feeder, component):
-    output = io.StringIO()
+def outputStations(output, used, feeder, component):
     stacknumber = 0
     output.write("Table,No.,ID,DeltX,DeltY,FeedRates,Note,Height,Speed,Status,SizeX,SizeY,HeightTake,DelayTake,nPullStripSpeed\n")
     for p,v in enumerate(used):
@@ -70,24 +66,25 @@ def outputStations(used, feeder, component):
               "{options:d}, "
               "{sizeX:0.2f}, {sizeY:0.2f}, "
               "{pickHeight:0.2f}, {pickDelay:0.2f}, {pullSpeed:d}\n".format(
-            stack=stacknumber, fnum=int(f[CHMTPickNPlace.feedernum]), fXoff=float(f[CHMTPickNPlace.feederXoff]), fYoff=float(f[
-                                                                                                                           CHMTPickNPlace.feederYoff]),
-            pullDist=int(f[CHMTPickNPlace.pulldist]), name=f[CHMTPickNPlace.partname], placeHeight=float(f[
-                                                                                                       CHMTPickNPlace.placeheight]), placeSpeed=int(f[
-                                                                                                                                                     CHMTPickNPlace.placespeed]),
-            options=f[CHMTPickNPlace.options],
-            sizeX=float(f[CHMTPickNPlace.partsizeX]), sizeY=float(f[CHMTPickNPlace.partsizeY]),
-            pickHeight=float(f[CHMTPickNPlace.pickheight]), pickDelay=float(f[CHMTPickNPlace.pickdelay]), pullSpeed=int(f[
-                                                                                                                      CHMTPickNPlace.pullspeed])))
+            stack=stacknumber,
+            fnum=f.station,
+            fXoff=f.xOffset,
+            fYoff=f.yOffset,
+            pullDist=f.pullDist,
+            name=f.name,
+            placeHeight=f.placeHeight,
+            placeSpeed=f.placeSpeed,
+            options=f.options,
+            sizeX=f.sizeX,
+            sizeY=f.sizeY,
+            pickHeight=f.pickHeight,
+            pickDelay=f.pickDelay,
+            pullSpeed=f.pullSpeed))
         stacknumber = stacknumber + 1
     output.write("\n")
-    contents = output.getvalue()
-    output.close()
-    return contents
 
 
-def outputBatch():
-    output = io.StringIO()
+def outputBatch(output):
     #    Batch takes multiple copies of the same board and mounts them into the machine at the same time.
     #    This is different from an array where you have one PCB with X number of design copies in a panel
     #    Reference from outputHeader():
@@ -101,7 +98,7 @@ def outputBatch():
     output.write("Table,No.,ID,DeltX,DeltY\n");
     output.write("Panel_Coord,0,1,0,0\n");
 
-    #    When you define an array you get this:
+    #    When you define an array you get this (see outputPanelArray()):
     #     IntervalX = x spacing. Not sure if this is distance between array
     #     NumX = number of copies in X direction
     #print("Table,No.,ID,IntervalX,IntervalY,NumX,NumY")
@@ -111,56 +108,70 @@ def outputBatch():
     #    When you add a skip, you get another
     #print("Panel_Array,1,4,0,0,2,2")    # Skip board #4 in the array
     #    This doesn't quite make sense but skips will most likely NOT be automated
-    contents = output.getvalue()
-    output.close()
-    return contents
 
 
-def outputParts(parts, feeder):
-    output = io.StringIO()
+"""
+A panel of boards: one board's parts are placed on every board of the array
+"""
+def outputPanelArray(output, panel, xout=()):
+    output.write("Table,No.,ID,IntervalX,IntervalY,NumX,NumY\n")
+    output.write("Panel_Array,0,1,{:0.2f},{:0.2f},{},{}\n".format(panel.dx, panel.dy, panel.columns, panel.rows))
+
+    #    X'd out (or missing) boards get a skip record
+    skips = sorted(set(panel.missing()) | set(xout))
+    for (n, board) in enumerate(skips, 1):
+        output.write("Panel_Array,{},{},0,0,{},{}\n".format(n, board, panel.columns, panel.rows))
+
+
+"""
+The parts are placed in designator order, or, with optimize, in the order
+PickPath finds to cut down on head travel.  Parts on the bottom of the
+board are left out (see EagleCAD.getSMDParts()).
+"""
+def outputParts(output, parts, feeder, optimize=False):
     #EComponent, 0, 1, 1, 17, 19.05, 38.10, 90.00, 0.50, 2, 0, LED1, R - 0603, 0.00
     count = 0
     output.write("Table, No., ID, PHead, STNo., DeltX, DeltY, Angle, Height, Skip, Speed, Explain, Note, Delay\n")
-    for pn in sorted(iter(parts.keys()), key=EagleCAD.natural_sort_key):
-        p = parts[pn]
-        fnum = p['feeder']
-        if fnum == CHMTPickNPlace.SKIP or fnum == CHMTPickNPlace.NOTFOUND:
-            continue
-
+    placed = [p for p in EagleCAD.sortedParts(parts)
+              if p.feeder != CHMTPickNPlace.SKIP and p.feeder != CHMTPickNPlace.NOTFOUND]
+    bottom = [p.name for p in placed if p.placement is None]
+    if bottom:
+        print("Note: {} on the bottom of the board, not placed: {}".format(
+            "part is" if len(bottom) == 1 else "parts are", " ".join(bottom)))
+        placed = [p for p in placed if p.placement is not None]
+    if optimize:
+        (placed, before, after) = PickPath.optimize(placed, feeder)
+        if before > 0:
+            print("Pick path: {:0.0f}mm of head travel, was {:0.0f}mm ({:0.0f}% less)".format(
+                after, before, 100.0 * (before - after) / before))
+
+    for p in placed:
+        fnum = p.feeder
         f = feeder[fnum]
 
         output.write( "EComponent, "
                       "{num:d}, {id:d}, {head:d}, {fnum:d}, "
                       "{cX:0.2f}, {cY:0.2f}, {angle:0.2f}, {height:0.2f}, "
                       "{skip:d}, {speed:d}, {name}, {note}, {dly:0.2f}\n".format(
-            num=count, id=count+1, head=int(f[CHMTPickNPlace.head]), fnum=int(f[CHMTPickNPlace.feedernum]),
-            cX=float(p['x']), cY=float(p['y']), angle=p['rot'], height=float(f[CHMTPickNPlace.pickheight]),
-            skip=int(f[CHMTPickNPlace.options]),
-            speed=int(f[CHMTPickNPlace.pullspeed]),
-            name=p['name'],
-            note=f[CHMTPickNPlace.partname],
-            dly=float(f[CHMTPickNPlace.pickdelay])
+            num=count, id=count+1, head=f.head, fnum=f.station,
+            cX=p.x, cY=p.y, angle=p.placement, height=f.pickHeight,
+            skip=f.options,
+            speed=f.pullSpeed,
+            name=p.name,
+            note=f.name,
+            dly=f.pickDelay
         ))
         count = count + 1
     output.write("\n")
     output.write("\n")
 
-    contents = output.getvalue()
-    output.close()
-    return contents
-
 
 #    Add any IC tray info
-def outputICTray():
-    output = io.StringIO()
+def outputICTray(output):
     output.write("Table,No.,ID,CenterX,CenterY,IntervalX,IntervalY,NumX,NumY,Start\n")
-    contents = output.getvalue()
-    output.close()
-    return contents
 
 
-def outputPCBCalibrate():
-    output = io.StringIO()
+def outputPCBCalibrate(output):
     #   Flags to say what type and if calibration of the board has been done
     output.write("\n")
     output.write("Table,No.,nType,nAlg,nFinished\n")
@@ -168,27 +179,25 @@ def outputPCBCalibrate():
 
     #    Type: 0 = use components as calibration marks, 1 = use marks as calibration marks
     #    Finished: ? 0 = you haven't cal'd a board, 1 = you have cal'd the board
-    contents = output.getvalue()
-    output.close()
-    return contents
 
 
-def outputFiducials():
-    output = io.StringIO()
+"""
+The fiducial marks the board or panel is calibrated against, from
+EagleCAD.chooseFiducials().  Without any, the machine's default marks
+are written and have to be set up by hand when calibrating.
+"""
+def outputFiducials(output, marks=()):
     #   Adds the fiducials or mark information about this board or panel
-    #   TODO - Should we pull in the marks from the PCB file? It might make better
-    #   sense to have user do this manually as it will be pretty specific.
     output.write("\n")
     output.write("Table,No.,ID,offsetX,offsetY,Note\n")
-    output.write("CalibPoint,0,1,0.750,0.350,Mark1\n")
-    output.write("CalibPoint,1,2,1.525,0.725,Mark3\n")
-    contents = output.getvalue()
-    output.close()
-    return contents
+    if not marks:
+        output.write("CalibPoint,0,1,0.750,0.350,Mark1\n")
+        output.write("CalibPoint,1,2,1.525,0.725,Mark3\n")
+    for (n, m) in enumerate(marks):
+        output.write("CalibPoint,{},{},{:0.3f},{:0.3f},{}\n".format(n, n + 1, m.x, m.y, m.name))
 
 
-def outputCalibrationFactor():
-    output = io.StringIO()
+def outputCalibrationFactor(output):
     #   Add the calibration factor. This is all the offsets calculated when the
     #   PCB is calibrated. We don't have to set anything here because the program
     #   will calculate things after user calibrates the PCB.
@@ -196,15 +205,111 @@ def outputCalibrationFactor():
     output.write("\n")
     output.write("Table,No.,DeltX,DeltY,AlphaX,AlphaY,BetaX,BetaY,DeltaAngle\n")
     output.write("CalibFator,0,0,0,0,0,1,1,0\n") # Typo is required
-    contents = output.getvalue()
-    output.close()
-    return contents
+
+
+"""
+Write the complete .dpv job for a board's parts to output.  For a Panel
+(see Panel.detect()), a single board's parts and a Panel_Array record;
+xout lists the numbers of any X'd out boards in the panel.  fiducials are
+the board's fiducial Parts (EagleCAD.getFiducials()); a panel is
+calibrated against the marks on its first board, or, if its boards have
+none, those on its rails.
+"""
+def writeDPV(output, boardname, parts, feeder, component, optimize=False, panel=None, xout=(), fiducials=None):
+    fiducials = fiducials or {}
+    if panel is not None:
+        single = panel.single(parts)
+        if single is None:
+            print("Note: {} is not a panel of identical boards, placing every part".format(boardname))
+            panel = None
+        else:
+            parts     = single
+            fiducials = panel.single(fiducials) or fiducials
+    used     = EagleCAD.getUsedComponents(parts, feeder)
+
+    if panel is None:
+        outputHeader(output, boardname)
+        outputStations(output, used, feeder, component)
+        outputBatch(output)
+    else:
+        outputHeader(output, boardname, 1)
+        outputStations(output, used, feeder, component)
+        outputPanelArray(output, panel, xout)
+    outputParts(output, parts, feeder, optimize)
+    outputICTray(output)
+    outputPCBCalibrate(output)
+    outputFiducials(output, EagleCAD.chooseFiducials(fiducials))
+    outputCalibrationFactor(output)
+
+def startWorker(args, *shared):
+    BoardCache.configure(args.config)
+    PickPath.configure(args.config)
+
+def dpvFilename(f, args):
+    outfilename = os.path.splitext(os.path.basename(f))[0] + ".dpv"
+    outdir = os.path.dirname(f)
+
+    if args.outdir:
+        if args.outdir == '@':
+            outdir = args.config.get('EagleTools', 'defaultBOMdir')
+        elif args.outdir == "-":
+            pass
+        else:
+            outdir = args.outdir
+
+    bn = os.path.basename(outfilename)
+    return os.path.join(outdir, bn)
+
+def processBoard(f, args, feeder, component, palettes):
+    if len(args.PCBfile) > 1:
+        print("Processing {}".format(f))
+
+    outfilename = dpvFilename(f, args)
+
+    (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
+    parts    = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
+    panel    = None if args.flat else Panel.detect(f, eagleBoard)
+
+    with Artifact.Artifact(outfilename, VOLATILE) as outfile:
+        writeDPV(outfile, f, parts, feeder, component, args.optimize, panel, args.xout,
+                 EagleCAD.getFiducials(eagleBoard))
+
+"""
+Plan the feeders for the boards as a job, in the order given (see
+FeederPlan), write each board's .dpv for its planned feeders, and
+the feeder sheet as it will be after the last board to planfile
+"""
+def planBoards(args, feederfile, palettes, planfile):
+    rows = CHMTPickNPlace.readFeederRows(feederfile)
+    (feeder, component) = CHMTPickNPlace.buildFeeders(rows)
+
+    boards = []
+    loaded = []
+    for f in args.PCBfile:
+        (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
+        boards.append((f, EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)))
+        loaded.append((eagleBoard, packages))
+
+    plan = FeederPlan.FeederPlan(rows).plan(boards)
+    print(FeederPlan.report(plan))
+
+    for ((f, parts), (eagleBoard, packages), planned) in zip(boards, loaded, plan):
+        (feeder, component) = CHMTPickNPlace.buildFeeders(planned["rows"])
+        parts   = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
+        panel   = None if args.flat else Panel.detect(f, eagleBoard)
+        with Artifact.Artifact(dpvFilename(f, args), VOLATILE) as outfile:
+            writeDPV(outfile, f, parts, feeder, component, args.optimize, panel, args.xout,
+                     EagleCAD.getFiducials(eagleBoard))
+
+    if plan:
+        CHMTPickNPlace.writeFeederRows(planfile, plan[-1]["rows"], CHMTPickNPlace.feederLineEnding(feederfile))
 
 
 """
 main() 
 
-usage: eagle2chmt.py [-h] pcbfile [pcbfile ...]
+usage: eagle2chmt.py [-h] [--optimize] [--flat] [--xout N] [--plan FEEDERCSV]
+                     [--jobs N] pcbfile [pcbfile ...]
 
 Create a CHMT pick-n-place job from an EAGLEcad PCB board file.
 
@@ -213,6 +318,16 @@ positional arguments:
 
 optional arguments:
   -h, --help  show this help message and exit
+  --optimize  order placements to cut down on head travel
+  --flat      place every copy's parts on _array boards instead of using
+              a Panel_Array
+  --xout N    board N of an _array panel is X'd out (may be repeated)
+  --plan FEEDERCSV
+              plan the feeders for the boards as one job, in order,
+              writing the revised feeder sheet to FEEDERCSV
+  --jobs N, -j N
+              process boards in parallel with N worker processes
+              (0 = one per CPU, default 1)
 
 
 """
@@ -258,9 +373,20 @@ def main():
     parser.add_argument("--outdir",     help="output directory (default is <PCBfile>.bom.txt)")
     parser.add_argument("--download",   action="store_true", help="download a fresh feeder file from Google Sheets?")
     parser.add_argument("--key",        help="Google Sheets document access key")
+    parser.add_argument("--optimize",   action="store_true", help="order placements to cut down on head travel")
+    parser.add_argument("--flat",       action="store_true", help="place every copy's parts on _array boards instead of using a Panel_Array")
+    parser.add_argument("--xout",       type=int, action="append", default=[], metavar="N",
+            help="board N of an _array panel is X'd out (may be repeated)")
+    parser.add_argument("--plan",       metavar="FEEDERCSV",
+            help="plan the feeders for the boards as one job, in order, writing the revised feeder sheet to FEEDERCSV")
+    parser.add_argument('--jobs',      '-j',  type=int, default=1,
+            help='process boards in parallel with N worker processes (0 = one per CPU, default 1)')
 
     args = parser.parse_args()
     args.config = configuration
+    BoardCache.configure(configuration)
+    CHMTPickNPlace.configure(configuration)
+    PickPath.configure(configuration)
     
     feederfile = args.config.get('EagleTools', 'defaultfeederfile')
     if args.feederfile:
@@ -274,44 +400,17 @@ def main():
         print("DL feederfile: ", feederfile)
         CHMTPickNPlace.downloadFeederFile(args, feederfile, args.key)
 
-    (feeder, component) = CHMTPickNPlace.loadFeeders(feederfile)
     palettes = EagleCAD.getLayers(rcfile)
 
-    for f in args.PCBfile:
-        if len(args.PCBfile) > 1:
-            print("Processing {}".format(f))
-
-        outfilename = os.path.splitext(os.path.basename(f))[0] + ".dpv"
-        outdir = os.path.dirname(f)
-
-        if args.outdir:
-            if args.outdir == '@':
-                outdir = args.config.get('EagleTools', 'defaultBOMdir')
-            elif args.outdir == "-":
-                pass
-            else:
-                outdir = args.outdir
-                
-        bn = os.path.basename(outfilename)
-        outfilename = os.path.join(outdir, bn)
+    if args.plan:
+        planBoards(args, feederfile, palettes, args.plan)
+        return
 
-        (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
-        parts    = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
-        used     = EagleCAD.getUsedComponents(parts, feeder)
-
-        content = ""
-        content = content + outputHeader(f)
-        content = content + outputStations(used, feeder, component)
-        content = content + outputBatch()
-        content = content + outputParts(parts, feeder)
-        content = content + outputICTray()
-        content = content + outputPCBCalibrate()
-        content = content + outputFiducials()
-        content = content + outputCalibrationFactor()
-
-        outfile = open(outfilename, "w")
-        outfile.write(content)
-        outfile.close()
+    (feeder, component) = CHMTPickNPlace.loadFeeders(feederfile)
+    failed = Batch.runBoards(processBoard, args.PCBfile, args.jobs,
+                             (args, feeder, component, palettes), startWorker)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Generate all the fab files for an Eagle board in one go:
+
+    <pcbfile_basename>.bom.md   parts BOM               (as eagle2bom)
+    <pcbfile_basename>.dpv      CHMT pick-n-place job   (as eagle2chmt)
+    <pcbfile_basename>.brd.svg  board rendering         (as eagle2svg)
+
+The separate tools each start an interpreter, load the feeder table and
+parse the board; this loads the feeder table once and hands the same board
+model to all three writers.  eagle2CAM calls makeFabFiles() directly.
+"""
+
+import configparser
+from pkg_resources import Requirement, resource_filename
+import CAMTool.fab.SiteConfiguration as config
+from CAMTool.fab import Artifact, Batch, BoardCache, CHMTPickNPlace, EagleCAD, Panel, PickPath
+from CAMTool import eagle2bom, eagle2chmt, eagle2svg
+
+import sys
+import argparse
+import os.path
+
+OUTPUTS = ("bom", "dpv", "svg")
+
+
+"""
+outdir is None (next to the board), '@' (the configured default directory)
+or a directory name
+"""
+def outputFilename(f, suffix, outdir, defaultdir):
+    outfilename = os.path.splitext(os.path.basename(f))[0] + suffix
+    if outdir == '@':
+        return os.path.join(defaultdir, outfilename)
+    elif outdir:
+        return os.path.join(outdir, outfilename)
+    return os.path.join(os.path.dirname(f), outfilename)
+
+"""
+Load what the writers share: the feeder table and the layer palettes.
+The feeder file is downloaded from Google Sheets if asked, or if it is
+missing (see CHMTPickNPlace.fetchFeederFile).
+
+Returns (feeder, component, palettes)
+"""
+def loadFabData(configuration, feederfile=None, eagleRC=None, download=False, key=None):
+    if not feederfile:
+        feederfile = configuration.get('EagleTools', 'defaultfeederfile')
+    if not eagleRC:
+        eagleRC = configuration.get('EagleTools', 'defaulteaglerc')
+    if not key:
+        key = configuration.get('google', 'spreadsheet_key')
+    CHMTPickNPlace.configure(configuration)
+    PickPath.configure(configuration)
+
+    if (download or not os.path.isfile(feederfile) ):
+        print("Downloading feederfile: ", feederfile)
+        CHMTPickNPlace.downloadFeederFile(None, feederfile, key)
+
+    (feeder, component) = CHMTPickNPlace.loadFeeders(feederfile)
+    palettes = EagleCAD.getLayers(eagleRC)
+    return (feeder, component, palettes)
+
+"""
+Parse board f once and write the requested outputs ("bom", "dpv" and/or "svg")
+"""
+def makeFabFiles(f, outputs, feeder, component, palettes, configuration, outdir=None, optimize=False):
+    (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
+    parts    = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
+
+    if "bom" in outputs:
+        outfilename = outputFilename(f, ".bom.md", outdir, configuration.get('EagleTools', 'defaultBOMdir'))
+        with Artifact.Artifact(outfilename) as outfile:
+            outfile.write(eagle2bom.outputParts(parts, True, True))
+
+    if "dpv" in outputs:
+        outfilename = outputFilename(f, ".dpv", outdir, configuration.get('EagleTools', 'defaultBOMdir'))
+        panel = Panel.detect(f, eagleBoard)
+        with Artifact.Artifact(outfilename, eagle2chmt.VOLATILE) as outfile:
+            eagle2chmt.writeDPV(outfile, f, parts, feeder, component, optimize, panel,
+                                fiducials=EagleCAD.getFiducials(eagleBoard))
+
+    if "svg" in outputs:
+        outfilename = outputFilename(f, ".brd.svg", outdir, configuration.get('EagleTools', 'defaultSVGdir'))
+        eagle2svg.outputSVG(outfilename, eagleBoard, layers)
+
+
+def startWorker(args, *shared):
+    BoardCache.configure(args.config)
+    PickPath.configure(args.config)
+
+def processBoard(f, args, feeder, component, palettes):
+    if args.verbose or len(args.PCBfile) > 1:
+        print("Processing {}".format(f))
+    makeFabFiles(f, args.outputs, feeder, component, palettes, args.config, args.outdir, args.optimize)
+
+
+def main():
+    """
+    main()
+
+    usage: eagle2fab.py [-h] [--eagleRC EAGLERC] [--feederfile FEEDERFILE]
+            [--outdir OUTDIR] [--download] [--key KEY] [--bom] [--dpv] [--svg]
+            [--optimize] [--jobs N] [--verbose] pcbfile [pcbfile ...]
+
+    Create the BOM, CHMT pick-n-place job and SVG rendering for EAGLEcad
+    PCB board file(s), parsing each board only once.
+
+    positional arguments:
+      pcbfile               an EAGLEcad .brd file to process
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      --eagleRC EAGLERC     Eagle rc file with palette definitions
+      --feederfile FEEDERFILE
+                            csv file with feeder component assignments
+      --outdir OUTDIR       output directory (default is next to the pcbfile,
+                            '@' for the directories in EagleTools.cfg)
+      --download            download a fresh feeder file from Google Sheets?
+      --key KEY             Google Sheets document access key
+      --bom                 write the .bom.md BOM
+      --dpv                 write the .dpv pick-n-place job
+      --svg                 write the .brd.svg rendering
+                            (default is all three)
+      --optimize            order pick-n-place placements to cut down on
+                            head travel
+      --jobs N, -j N        process boards in parallel with N worker
+                            processes (0 = one per CPU, default 1)
+      --verbose, -v         Verbose flag
+
+    """
+
+    cfile = os.path.expanduser(config.DefaultConfigFile)
+    if not os.path.isfile(cfile):
+        print("First time usage: Creating {} with default contents - edit and customize before using!".format(cfile))
+        examplefn = resource_filename(Requirement.parse('CAMTool'),"CAMTool/EagleTools.cfg")
+        configuration = configparser.ConfigParser()
+        configuration.read(examplefn)
+        with open(cfile, 'w') as configfile:
+            configuration.write(configfile)
+        sys.exit(0)
+
+    configuration = configparser.ConfigParser()
+    configuration.read(cfile)
+
+    parser = argparse.ArgumentParser(description='Create the BOM, CHMT pick-n-place job and SVG rendering for EAGLEcad PCB board file(s),\n'
+                         'parsing each board only once.',
+                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('PCBfile', metavar='pcbfile', type=str, nargs='+',
+            help='an EAGLEcad .brd file to process')
+    parser.add_argument("--eagleRC",    help="Eagle rc file with palette definitions")
+    parser.add_argument("--feederfile", help="csv file with feeder component assignments")
+    parser.add_argument("--outdir",     help="output directory (default is next to the pcbfile, '@' for the directories in EagleTools.cfg)")
+    parser.add_argument("--download",   action="store_true", help="download a fresh feeder file from Google Sheets?")
+    parser.add_argument("--key",        help="Google Sheets document access key")
+    parser.add_argument("--bom",        action="store_true", help="write the .bom.md BOM")
+    parser.add_argument("--dpv",        action="store_true", help="write the .dpv pick-n-place job")
+    parser.add_argument("--svg",        action="store_true", help="write the .brd.svg rendering (default is all three)")
+    parser.add_argument("--optimize",   action="store_true", help="order pick-n-place placements to cut down on head travel")
+    parser.add_argument('--jobs',      '-j',  type=int, default=1,
+            help='process boards in parallel with N worker processes (0 = one per CPU, default 1)')
+    parser.add_argument('--verbose',   '-v',  action='store_true', help='Verbose flag')
+
+    args = parser.parse_args()
+    args.config = configuration
+    BoardCache.configure(configuration)
+
+    args.outputs = [o for o in OUTPUTS if getattr(args, o)] or list(OUTPUTS)
+
+    (feeder, component, palettes) = loadFabData(configuration, args.feederfile, args.eagleRC,
+                                                args.download, args.key)
+
+    failed = Batch.runBoards(processBoard, args.PCBfile, args.jobs,
+                             (args, feeder, component, palettes), startWorker)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
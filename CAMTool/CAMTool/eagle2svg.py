@@ -4,29 +4,23 @@ Author: John Plocher, 2019
 URL:    www.SPCoast.com
 License: Python Software Foundation License
 
-Take an Eagle BRD file and render it as a SVG
+Take an Eagle BRD file and render it as a SVG: wires, pads, smds, vias,
+polygons, circles, rectangles, holes and texts, layer by layer
 
 Limits:  Some Eagle part numbers (names with embedded commas) are illegal XML tag names and cause the xml parser to throw errors
 """
 
 import configparser
 from pkg_resources import Requirement, resource_filename
-from CAMTool.fab import CHMTPickNPlace, EagleCAD
+from CAMTool.fab import Artifact, Artwork, Batch, BoardCache, EagleCAD, Geometry, SVGStream
 import CAMTool.fab.SiteConfiguration as config
 
 import sys
-import svgwrite
 import os
-import datetime
 import argparse
-import io
 
 """
 Output routines to create a SVG file
-
-Note that there are several "typos" in the keywords used by the CHMT machine,
-they are called out when found.
-
 """
 
 STYLES = """.red { fill: red; stroke=none; }
@@ -34,113 +28,150 @@ STYLES = """.red { fill: red; stroke=none; }
 .blue { fill: blue; stroke: yellow; stroke-width: 5; }
 .yellow { fill: yellow; stroke: none; }
 .text { font-family: serif; fill: white; }
+.wires { fill: none; stroke: currentColor; stroke-linecap: round; stroke-linejoin: round; }
+.fills { fill: currentColor; stroke: none; }
+.texts { fill: currentColor; font-family: sans-serif; }
+"""
+
+# a layer's group, everything in it drawn in the layer's color
+LAYERSTYLE = ".layer{} {{ color: {}; }}\n".format
+
+# an EAGLE text's size is about the height of its capitals, 0.7 em
+FONTSIZE = 1.4
+
+HALIGN = {"left": "start", "center": "middle", "right": "end"}
+VALIGN = {"bottom": "alphabetic", "center": "central", "top": "hanging"}
+FLIP   = {"left": "right", "right": "left", "bottom": "top", "top": "bottom", "center": "center"}
+
+
+"""
+A Geometry wires array's groups (see Geometry.wireGroups()), with
+zero width wires drawn 1.0 wide
+"""
+def wireGroups(wires):
+    wires = wires.copy()
+    wires[wires[:, 4] == 0.0, 4] = 1.0
+    return Geometry.wireGroups(wires)
+
+"""
+A text's SVG transform, text-anchor and dominant-baseline.  Unless it is
+spun, EAGLE turns a text that would read downwards or upside down around
+its anchor point to keep it readable.
+"""
+def textPlacement(t):
+    (v, sep, h) = t.align.partition("-")
+    h = h or "center"
+    angle = t.angle
+    if not t.spin and 90.0 < angle <= 270.0:
+        angle -= 180.0
+        (v, h) = (FLIP[v], FLIP[h])
+    transform = "translate({:.6g} {:.6g}) rotate({:.6g}) scale({} -1)".format(
+        t.x, t.y, angle, -1 if t.mirror else 1)
+    return (transform, HALIGN[h], VALIGN[v])
+
+"""
+Everything on one layer: its filled shapes as one path, its wires and
+circles one path per width, then its texts
 """
+def outputLayer(dwg, art):
+    fills = SVGStream.ringData(art.rings) + SVGStream.discData(art.discs)
+    if fills:
+        dwg.path(fills, "fills")
+    strokes = {}
+    for (layer, width, wires) in wireGroups(art.wires):
+        strokes[width] = SVGStream.pathData(wires)
+    for width in set(art.circles[:, 3].tolist()):
+        strokes[width] = strokes.get(width, '') + SVGStream.discData(art.circles[art.circles[:, 3] == width])
+    for width in sorted(strokes):
+        dwg.path(strokes[width], "wires", width)
+    for t in art.texts:
+        dwg.text(t.value, "texts", t.size * FONTSIZE, *textPlacement(t))
+
+"""
+Render a board to an SVG file, streamed out as it is drawn (see SVGStream);
+with validate, build it with svgwrite and check every element instead.
+
+Each layer the board has a color for is a group, drawn in EAGLE's
+stacking order (see Artwork).
+"""
+def outputSVG(outfilename, eagleBoard, layers, validate=False):
+    # get max board dimensions
+    (x1,y1,x2,y2) = EagleCAD.getBoardDimensions(eagleBoard)
+    (w, h) = (x2 - x1, y2 - y1)
+
+    #print("dimensions: (x1:{} y1:{}), (x2:{},y2:{})".format(x1,y1,x2,y2))
 
+    drawn = [(layer, art) for (layer, art) in Artwork.stack(eagleBoard.artwork()) if layer in layers]
 
-def u2mm(n):
-    return n * 10000
-
-def outputHeader(filename):
-    now   = datetime.datetime.now()
-    date  = now.strftime('DATE,%Y/%m/%d\n')
-    time  = now.strftime('TIME,%H:%M:%S\n')
-    fn    = os.path.splitext(os.path.basename(filename))[0]
-    # File header
-
-    output = io.StringIO()
-
-    output.write(date)
-    output.write(time)
-
-    contents = output.getvalue()
-    output.close()
-    return contents
-
-# list of symbols...
-def outputStations(used, feeder, component):
-    output = io.StringIO()
-    stacknumber = 0
-    output.write("Table,No.,ID,DeltX,DeltY,FeedRates,Note,Height,Speed,Status,SizeX,SizeY,HeightTake,DelayTake,nPullStripSpeed\n")
-    for p,v in enumerate(used):
-        f = feeder[CHMTPickNPlace.getFeederForComponent(v, component)]
-
-        output.write("Station, "
-              "{stack:d}, {fnum:d}, {fXoff:0.2f}, {fYoff:0.2f}, "
-              "{pullDist:d}, {name}, {placeHeight:0.2f}, {placeSpeed:d}, "
-              "{options:d}, "
-              "{sizeX:0.2f}, {sizeY:0.2f}, "
-              "{pickHeight:0.2f}, {pickDelay:0.2f}, {pullSpeed:d}\n".format(
-            stack=stacknumber,
-            fnum=int(f[CHMTPickNPlace.feedernum]),
-            fXoff=float(f[CHMTPickNPlace.feederXoff]),
-            fYoff=float(f[CHMTPickNPlace.feederYoff]),
-            pullDist=int(f[CHMTPickNPlace.pulldist]),
-            name=f[CHMTPickNPlace.partname],
-            placeHeight=float(f[CHMTPickNPlace.placeheight]),
-            placeSpeed=int(f[CHMTPickNPlace.placespeed]),
-            options=f[CHMTPickNPlace.options],
-            sizeX=float(f[CHMTPickNPlace.partsizeX]),
-            sizeY=float(f[CHMTPickNPlace.partsizeY]),
-            pickHeight=float(f[CHMTPickNPlace.pickheight]),
-            pickDelay=float(f[CHMTPickNPlace.pickdelay]),
-            pullSpeed=int(f[CHMTPickNPlace.pullspeed])))
-
-        stacknumber = stacknumber + 1
-    output.write("\n")
-    contents = output.getvalue()
-    output.close()
-    return contents
-
-
-# actual parts
-def outputParts(feeder, parts):
-    output = io.StringIO()
-    #EComponent, 0, 1, 1, 17, 19.05, 38.10, 90.00, 0.50, 2, 0, LED1, R - 0603, 0.00
-    count = 0
-    output.write("Table, No., ID, PHead, STNo., DeltX, DeltY, Angle, Height, Skip, Speed, Explain, Note, Delay\n")
-    for pn in sorted(iter(parts.keys()), key=EagleCAD.natural_sort_key):
-        p = parts[pn]
-        fnum = p['feeder']
-        if fnum == CHMTPickNPlace.SKIP or fnum == CHMTPickNPlace.NOTFOUND:
-            continue
-        f = feeder[fnum]
-
-        output.write("EComponent, "
-              "{num:d}, {id:d}, {head:d}, {fnum:d}, "
-              "{cX:0.2f}, {cY:0.2f}, {angle:0.2f}, {height:0.2f}, "
-              "{skip:d}, {speed:d}, {name}, {note}, {dly:0.2f}\n".format(
-            num=count, id=count+1, head=int(f[CHMTPickNPlace.head]), fnum=int(f[CHMTPickNPlace.feedernum]),
-            cX=float(p['x']), cY=float(p['y']), angle=p['rot'], height=float(f[CHMTPickNPlace.pickheight]),
-            skip=int(f[CHMTPickNPlace.options]),
-            speed=int(f[CHMTPickNPlace.pullspeed]),
-            name=p['name'],
-            note=f[CHMTPickNPlace.partname],
-            dly=float(f[CHMTPickNPlace.pickdelay])
-        ))
-        count = count + 1
-    output.write("\n")
-    output.write("\n")
-
-    contents = output.getvalue()
-    output.close()
-    return contents
+    with Artifact.Artifact(outfilename, encoding='utf-8') as outfile:
+        dwg = (SVGStream.Validator if validate else SVGStream.Writer)(
+            outfile, "{:.6g}mm".format(w), "{:.6g}mm".format(h), (x1, -y2, w, h))
+        dwg.style(STYLES + ''.join(LAYERSTYLE(layer, SVGStream.rgb(layers[layer])) for (layer, art) in drawn))
 
+        # Background will be dark but not black so the background does not overwhelm the colors.
+        dwg.rect((x1, -y2), (w, h), 'grey')
+
+        # EAGLE's y axis points up
+        dwg.group(transform="scale(1 -1)")
+        for (layer, art) in drawn:
+            dwg.group("layer{}".format(layer))
+            outputLayer(dwg, art)
+            dwg.endGroup()
+        dwg.endGroup()
+        dwg.close()
+
+
+def startWorker(args, *shared):
+    BoardCache.configure(args.config)
+
+def processBoard(f, args, palettes):
+    if len(args.PCBfile) > 1:
+        print("Processing {}\n".format(f))
+
+    outfilename = os.path.splitext(os.path.basename(f))[0] + ".brd.svg"
+    outdir = os.path.dirname(f)
+
+    if args.outdir:
+        if args.outdir == '@':
+            outdir = args.config.get('EagleTools', 'defaultSVGdir')
+        elif args.outdir == "-":
+            pass
+        else:
+            outdir = args.outdir
+
+    bn = os.path.basename(outfilename)
+    outfilename = os.path.join(outdir, bn)
+
+    (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
+    outputSVG(outfilename, eagleBoard, layers, args.validate)
 
 
 def main():
     """
     main() 
 
-    usage: eagle2svg.py [-h] pcbfile [pcbfile ...]
+    usage: eagle2svg.py [-h] [--eagleRC EAGLERC] [--outdir OUTDIR] [--validate]
+                        [--jobs N] pcbfile [pcbfile ...]
 
-    Create a CHMT pick-n-place job from an EAGLEcad PCB board file.
+    Create a SVG rendering from an EAGLEcad PCB board file.
 
     positional arguments:
       pcbfile     an EAGLEcad .brd file to process
 
     optional arguments:
       -h, --help  show this help message and exit
-
+      --eagleRC EAGLERC
+                  Eagle rc file with palette definitions
+      --outdir OUTDIR
+                  output directory (default is ./<PCBfile>.brd.svg)
+      --validate  build the SVG with svgwrite, checking every element
+                  (slow; needs svgwrite installed)
+      --jobs N, -j N
+                  process boards in parallel with N worker processes
+                  (0 = one per CPU, default 1)
+
+    --feederfile, --download and --key are still accepted, so older scripts
+    keep working, but are ignored: the rendering doesn't use the feeder sheet.
 
     """
 
@@ -161,159 +192,33 @@ def main():
                      formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('PCBfile', metavar='pcbfile', type=str, nargs='+',
             help='an EAGLEcad .brd file to process')
-    parser.add_argument("--feederfile", help="csv file with feeder component assignments")
+    parser.add_argument("--eagleRC",    help="Eagle rc file with palette definitions")
     parser.add_argument("--outdir",     help="output directory (default is ./<PCBfile>.brd.svg)")
-    parser.add_argument("--download",   action="store_true", help="download a fresh feeder file from Google Sheets?")
-    parser.add_argument("--key",        help="Google Sheets document access key")
+    parser.add_argument("--validate",   action="store_true",
+            help="build the SVG with svgwrite, checking every element (slow; needs svgwrite installed)")
+    parser.add_argument('--jobs',      '-j',  type=int, default=1,
+            help='process boards in parallel with N worker processes (0 = one per CPU, default 1)')
+    # deprecated, ignored
+    parser.add_argument("--feederfile", help=argparse.SUPPRESS)
+    parser.add_argument("--download",   action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--key",        help=argparse.SUPPRESS)
 
     args = parser.parse_args()
     args.config = configuration
-    
-    feederfile = args.config.get('EagleTools', 'defaultfeederfile')
-    if args.feederfile:
-        feederfile = args.feederfile
-
-    if (args.download):
-        CHMTPickNPlace.downloadFeederFile(args, feederfile, args.key)
-
-    (feeder, component) = CHMTPickNPlace.loadFeeders(feederfile)
-
-    for f in args.PCBfile:
-        if len(args.PCBfile) > 1:
-            print("Processing {}\n".format(f))
-
-        outfilename = os.path.splitext(os.path.basename(f))[0] + ".brd.svg"
-        outdir = os.path.dirname(f)
+    BoardCache.configure(configuration)
 
-        if args.outdir:
-            if args.outdir == '@':
-                outdir = args.config.get('EagleTools', 'defaultSVGdir')
-            elif args.outdir == "-":
-                pass
-            else:
-                outdir = args.outdir
-                
-        bn = os.path.basename(outfilename)
-        outfilename = os.path.join(outdir, bn)
+    if args.feederfile or args.download or args.key:
+        print("Note: eagle2svg doesn't use the feeder sheet, --feederfile, --download and --key are deprecated and ignored")
 
-        palettes = EagleCAD.getLayers("/Users/jplocher/.eaglerc")
-        (eagleBoard, packages, layers) = EagleCAD.loadBoard(f, palettes)
-        parts    = EagleCAD.getSMDParts(eagleBoard, packages, component, feeder)
-        used     = EagleCAD.getUsedComponents(parts, feeder)
+    rcfile = args.config.get('EagleTools', 'defaulteaglerc')
+    if args.eagleRC:
+        rcfile = args.eagleRC
+    palettes = EagleCAD.getLayers(rcfile)
 
-
-        # get max board dimensions
-        (x1,y1,x2,y2) = EagleCAD.getBoardDimensions(eagleBoard)
-
-        #print("dimensions: (x1:{} y1:{}), (x2:{},y2:{})".format(x1,y1,x2,y2))
-
-        dwg = svgwrite.Drawing(outfilename, size=(x2-x1, y2-y1), debug=True)
-        dwg.defs.add(dwg.style(STYLES))
-
-        # Background will be dark but not black so the background does not overwhelm the colors.
-        dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='grey'))
-
-        symbols = {}
-        for P in eagleBoard.getElementsByTagName("package"):
-            name = P.getAttribute("name").lower()
-            # 1. create the symbol
-            symbol = dwg.symbol(id=name)
-            symbols[name] = symbol
-
-            # 2. add symbols to the defs section
-            dwg.defs.add(symbol)
-            # 3. important: define viewbox of the symbol!
-            (x1,y1, x2,y2) = EagleCAD.getSymbolBounds(P, 10000, 10000, -10000, -10000)
-            symbol.viewbox(x1,y1, x2,y2)
-            # 4. add symbol to the container
-            for wire in P.getElementsByTagName("wire"):
-                layer = int(wire.getAttribute("layer"))
-                width = float(wire.getAttribute("width"))
-                if width == 0.0:
-                    width=1.0
-                wx1 = float(wire.getAttribute("x1"))
-                wy1 = float(wire.getAttribute("y1"))
-                wx2 = float(wire.getAttribute("x2"))
-                wy2 = float(wire.getAttribute("y2"))
-
-                color_with_alpha = layers[layer]
-                symbol.add(dwg.line((wx1, wy1), (wx2, wy2), stroke_width=width, stroke=svgwrite.rgb(
-                    int(color_with_alpha[2:4], 16),
-                    int(color_with_alpha[4:6], 16),
-                    int(color_with_alpha[6:8], 16))))
-
-        for E in eagleBoard.getElementsByTagName("elements"):
-            for e in E.getElementsByTagName("element"):
-                # <element name="BOARD1" library="SPCoast" package="BOARD-SEEED10X10-NOHOLES" value="" x="0" y="0"/>
-                # <element name="UPPER" library="SPCoast" package="1X04_LOCK" value="1x4 0.100" x="22.86" y="7.62" smashed="yes" rot="R180">
-                # <attribute name="NAME" x="24.765" y="6.35" size="0.889" layer="25" font="vector" ratio="11" rot="R180"/>
-                # </element>
-                # <element name="LOWER" library="SPCoast" package="1X04_LOCK" value="1x4 0.100" x="22.86" y="3.81" smashed="yes" rot="R180">
-                # <attribute name="NAME" x="24.749" y="1.222" size="0.889" layer="25" font="vector" ratio="11" rot="R180"/>
-                # </element>
-                # <element name="LED1" library="SPCoast" package="0603-LED" value="R" x="19.05" y="38.1" smashed="yes" rot="R180">
-                # <attribute name="OPL" value="19-217-R6C-AL1M2VY-3T" x="19.05" y="38.1" size="1.778" layer="27" rot="R180" display="off"/>
-                # <attribute name="VALUE" x="24.13" y="38.735" size="1.27" layer="27" rot="R180"/>
-                # </element>
-                name = e.getAttribute("name").lower()
-                pkg  = e.getAttribute("package").lower()
-                x    = float(e.getAttribute("x"))
-                y    = float(e.getAttribute("y"))
-                r    = e.getAttribute("rot")
-                # [S][M]Rnnn
-                #
-                #     S    sets the Spin flag, which disable keeping texts readable from the bottom or right side of the drawing (only available in a board context)
-                #     M    sets the Mirror flag, which mirrors the object about the y-axis
-                #     Rnnn sets the Rotation to the given value, which may be in the range 0.0...359.9 (at a resolution of 0.1 degrees) in a board context, or one of 0, 90, 180 or 270 in a schematic context (angles may be given as negative values, which will be converted to the corresponding positive value)
-                #
-                #     The key letters S, M and R may be given in upper- or lowercase, and there must be at least R followed by a number.
-                #     If the Mirror flag is set in an element as well as in a text within the element's package, they cancel each other out. The same applies to the Spin flag.
-                #     Examples:
-                #
-                #     R0      no rotation
-                #     R90     rotated 90 counterclockwise
-                #     R-90    rotated 90 clockwise (will be converted to 270)
-                #     MR0     mirrored about the y-axis
-                #     SR0     spin texts
-                #     SMR33.3 rotated 33.3 counterclockwise, mirrored and spin texts
-
-                if not r or r == '':
-                    angle=0
-                elif r.startswith('MSR'):
-                    angle = int(r.lstrip('MSR'))  # TODO: Do I need to += 180?
-                elif r.startswith('SMR'):
-                    angle = int(r.lstrip('SMR'))  # TODO: Do I need to += 180?
-                elif r.startswith('MR'):
-                    angle = int(r.lstrip('MR'))   # TODO: Do I need to += 180?
-                elif r.startswith('SR'):
-                    angle = int(r.lstrip('SR'))   # TODO: Do I need to += 180?
-                elif r.startswith('R'):
-                    angle = int(r.lstrip('R'))
-                else:
-                    angle = int(r)
-
-                rot="rotate({} {} {})".format(angle, x, y)
-
-                dwg.add( dwg.use(symbols[pkg], transform=rot, insert=(x + packages[pkg]['xmin'], y + packages[pkg]['ymin']), size=(packages[pkg]['xmax'] - packages[pkg]['xmin'], packages[pkg]['ymax'] - packages[pkg]['ymin'])))
-
-        for E in eagleBoard.getElementsByTagName("plain"):
-            for wire in E.getElementsByTagName("wire"):
-                layer = int(wire.getAttribute("layer"))
-                width = float(wire.getAttribute("width"))
-                if width == 0.0:
-                    width = 1.0
-                wx1 = float(wire.getAttribute("x1"))
-                wy1 = float(wire.getAttribute("y1"))
-                wx2 = float(wire.getAttribute("x2"))
-                wy2 = float(wire.getAttribute("y2"))
-
-                color_with_alpha = layers[layer]
-                dwg.add(dwg.line((wx1, wy1), (wx2, wy2), stroke_width=width, stroke=svgwrite.rgb(
-                    int(color_with_alpha[2:4], 16),
-                    int(color_with_alpha[4:6], 16),
-                    int(color_with_alpha[6:8], 16))))
-
-        dwg.save()
+    failed = Batch.runBoards(processBoard, args.PCBfile, args.jobs,
+                             (args, palettes), startWorker)
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
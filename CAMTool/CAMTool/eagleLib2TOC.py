@@ -119,9 +119,8 @@ def main():
 	    outfilename = os.path.join(outdir, bn)
 
 	(eagleLibrary, packages, symbols) = EagleCAD.loadLibrary(f)
-
-
-	content = outputTOC(args, eagleLibrary, packages, symbols)
+	with eagleLibrary:
+	    content = outputTOC(args, eagleLibrary, packages, symbols)
 	if args.outdir == '-':
 	    print(content)
 	else:
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Writing the generated fab files (.dpv, .bom.md, .svg)
+
+The writers stream their output into a temporary file next to the final
+one, which is moved into place only once it is complete: a run that dies
+part way leaves the previous file (or none) behind, never half of one.
+
+A file whose contents haven't changed is left alone, so its modification
+time still says when the board last changed, and eagle2CAM, CopyFile and
+BOMTool don't see everything downstream of it as out of date.  Lines that
+change on every run (the .dpv's DATE and TIME) can be left out of the
+comparison.
+"""
+
+__version__ = "0.1"
+
+import hashlib
+import os
+import os.path
+import tempfile
+
+BUFFERSIZE = 64 * 1024
+
+# mkstemp makes files only the owner can read; give them the usual permissions
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+"""
+The SHA1 of a text file's lines, leaving out those starting with any of
+the volatile prefixes; None if there is no such file
+"""
+def digest(filename, volatile=(), encoding=None):
+    h = hashlib.sha1()
+    try:
+        with open(filename, 'r', encoding=encoding, buffering=BUFFERSIZE) as f:
+            for line in f:
+                if volatile and line.startswith(volatile):
+                    continue
+                h.update(line.encode('utf-8', 'surrogateescape'))
+    except (OSError, UnicodeDecodeError):
+        return None
+    return h.hexdigest()
+
+class Artifact(object):
+    """
+    with Artifact(filename, volatile=("DATE,", "TIME,")) as output:
+        output.write(...)
+
+    filename is replaced when the block finishes, unless the new contents
+    are the same as the old (apart from volatile lines); it is left alone
+    if the block raises.  Afterwards, changed says whether it was written.
+    """
+    __slots__ = ("filename", "volatile", "encoding", "changed", "_tmp", "_output")
+
+    def __init__(self, filename, volatile=(), encoding=None):
+        self.filename = filename
+        self.volatile = tuple(volatile)
+        self.encoding = encoding
+        self.changed  = None
+        self._tmp     = None
+        self._output  = None
+
+    def __enter__(self):
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        (fd, self._tmp) = tempfile.mkstemp(dir=dirname, suffix=".tmp",
+                                           prefix="." + os.path.basename(self.filename) + ".")
+        self._output = os.fdopen(fd, 'w', encoding=self.encoding, buffering=BUFFERSIZE)
+        return self._output
+
+    def __exit__(self, kind, value, traceback):
+        try:
+            self._output.close()
+            if kind is None:
+                self.changed = digest(self._tmp, self.volatile, self.encoding) != \
+                               digest(self.filename, self.volatile, self.encoding)
+                if self.changed:
+                    os.chmod(self._tmp, 0o666 & ~_umask)
+                    os.replace(self._tmp, self.filename)
+        finally:
+            if os.path.exists(self._tmp):
+                os.remove(self._tmp)
+        return False
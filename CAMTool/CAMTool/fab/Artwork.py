@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Everything drawn on a board, by layer, for rendering it (see eagle2svg)
+
+A package's primitives are turned into a few NumPy arrays the first time
+it is placed (see EagleCAD.Package.art), and every element using it is
+put on the board at once with the Rotation.Transforms that place their
+bounds and pads; a mirrored element's primitives move to the bottom
+side layers.
+
+    wires    Geometry wires array                   stroked
+    circles  x, y, radius, width, layer             stroked
+    discs    x, y, radius, layer                    filled: round pads,
+                                                    vias, drills, holes
+    rings    list of (layers, points) batches,      filled: smds, pads,
+             points an (N, K, 2) array of N         rectangles, polygons
+             outlines of K points each
+    texts    list of Texts
+
+Arcs in polygons and the corners of rounded smds and long pads are
+broken into straight segments within TOLERANCE, and polygon outlines
+are then simplified (Douglas-Peucker, see Geometry.simplify()).  Rings
+all run counterclockwise, so overlapping ones don't cancel out when they
+are filled as one path.
+
+Pads are drawn on the Pads layer and vias on the Vias layer, as EAGLE
+does, with their drills on the Drills layer.  Signal polygons are drawn
+as outlined, EAGLE doesn't keep the poured copper in the .brd file.
+"""
+
+__version__ = "0.1"
+
+from CAMTool.fab import Geometry, Rotation
+
+import collections
+import math
+
+import numpy as np
+
+PADS, VIAS, DRILLS, HOLES = 17, 18, 44, 45
+
+# EAGLE's stacking order, the bottom-most layer first; layers not listed
+# (user layers 100 and up) are drawn last, in number order
+STACKING = ((52, 42, 40, 38, 36, 34, 32, 30, 28, 26, 24, 22)
+            + tuple(range(16, 0, -1))
+            + (PADS, VIAS, 29, 31, 33, 35, 37, 39, 41, 43, 51, 21, 23, 25, 27,
+               20, DRILLS, HOLES, 46, 47, 48, 49, 19))
+_stacking = dict((layer, n) for (n, layer) in enumerate(STACKING))
+
+# the layer a mirrored (bottom side) element's primitive moves to
+MIRROR = np.arange(256)
+for (top, bottom) in ((1, 16), (21, 22), (23, 24), (25, 26), (27, 28), (29, 30), (31, 32),
+                      (33, 34), (35, 36), (37, 38), (39, 40), (41, 42), (51, 52)):
+    (MIRROR[top], MIRROR[bottom]) = (bottom, top)
+MIRROR.setflags(write=False)
+
+TOLERANCE = 0.01    # mm
+CORNER    = 4       # segments in a rounded corner
+
+# the package primitives that are drawn
+TAGS = Geometry.SHAPES + ("polygon", "text")
+
+
+class Text(collections.namedtuple("Text", ("layer", "x", "y", "size", "angle", "mirror", "spin",
+                                           "align", "value"))):
+    """
+    A text, as EAGLE places it: angle degrees counterclockwise, align its
+    anchor point ("bottom-left", "center", "top-right", ...)
+    """
+    __slots__ = ()
+
+    """
+    The text placed by Transform T, with >NAME, >VALUE, etc replaced from
+    names; None if it has no replacement
+    """
+    def place(self, T, names):
+        value = self.value
+        if value.startswith(">"):
+            value = names.get(value.upper())
+            if value is None:
+                return None
+        (x, y) = T.apply((self.x, self.y)).tolist()
+        r = T.rotation
+        angle = (r.angle - self.angle if r.mirror else r.angle + self.angle) % 360.0
+        layer = int(MIRROR[self.layer]) if r.mirror else self.layer
+        return Text(layer, x, y, self.size, angle, self.mirror != r.mirror, self.spin, self.align, value)
+
+def getText(N, value):
+    r = Rotation.parse(N.get("rot", ""))
+    return Text(int(N.get("layer")), float(N.get("x")), float(N.get("y")), float(N.get("size")),
+                r.angle, r.mirror, r.spin, N.get("align", "bottom-left"), value)
+
+class Art(object):
+    __slots__ = ("wires", "circles", "discs", "rings", "texts")
+
+    def __init__(self, wires, circles, discs, rings, texts):
+        self.wires   = wires
+        self.circles = circles
+        self.discs   = discs
+        self.rings   = rings
+        self.texts   = texts
+
+    """
+    The art put on the board by each of a list of Transforms, all at
+    once; names are the texts' replacements for each (see Text.place())
+    """
+    def placeAll(self, transforms, names):
+        count  = len(transforms)
+        mirror = np.array([T.rotation.mirror for T in transforms])[:, None]
+        layer  = lambda layers: np.where(mirror, MIRROR[layers.astype(int)], layers).reshape(-1)
+        place  = lambda points: Rotation.applyAll(transforms, points).reshape(-1, 2)
+
+        wires = np.tile(self.wires, (count, 1))
+        wires[:, 0:2] = place(self.wires[:, 0:2])
+        wires[:, 2:4] = place(self.wires[:, 2:4])
+        wires[:, 5]   = layer(self.wires[:, 5])
+        wires[:, 6]   = np.where(mirror, -self.wires[:, 6], self.wires[:, 6]).reshape(-1)  # arcs run the other way
+        circles = np.tile(self.circles, (count, 1))
+        circles[:, 0:2] = place(self.circles[:, 0:2])
+        circles[:, 4]   = layer(self.circles[:, 4])
+        discs = np.tile(self.discs, (count, 1))
+        discs[:, 0:2] = place(self.discs[:, 0:2])
+        discs[:, 3]   = layer(self.discs[:, 3])
+        rings = [(layer(layers), counterclockwise(place(points.reshape(-1, 2)).reshape((-1,) + points.shape[1:])))
+                 for (layers, points) in self.rings]
+        texts = [t for (T, n) in zip(transforms, names) for t in (t.place(T, n) for t in self.texts)
+                 if t is not None]
+        return Art(wires, circles, discs, rings, texts)
+
+    """
+    Just the art on one layer
+    """
+    def select(self, layer):
+        rings = []
+        for (layers, points) in self.rings:
+            mask = layers == layer
+            if mask.any():
+                rings.append((layers[mask], points[mask]))
+        return Art(self.wires[self.wires[:, 5] == layer], self.circles[self.circles[:, 4] == layer],
+                   self.discs[self.discs[:, 3] == layer], rings,
+                   [t for t in self.texts if t.layer == layer])
+
+    def layers(self):
+        used = set(self.wires[:, 5].tolist()) | set(self.circles[:, 4].tolist()) | \
+               set(self.discs[:, 3].tolist()) | set(t.layer for t in self.texts)
+        for (layers, points) in self.rings:
+            used.update(layers.tolist())
+        return set(int(layer) for layer in used)
+
+"""
+One Art with everything in arts
+"""
+def combine(arts):
+    arts = list(arts)
+    batches = {}        # rings with the same number of points are one batch
+    for (layers, points) in (ring for a in arts for ring in a.rings):
+        batches.setdefault(points.shape[1], []).append((layers, points))
+    rings = [(np.concatenate([l for (l, p) in batch]), np.concatenate([p for (l, p) in batch]))
+             for batch in batches.values()]
+    return Art(Geometry.wireArray(np.vstack([a.wires for a in arts] or [np.zeros((0, 7))])),
+               np.vstack([a.circles for a in arts] or [np.zeros((0, 5))]),
+               np.vstack([a.discs for a in arts] or [np.zeros((0, 4))]),
+               rings, [t for a in arts for t in a.texts])
+
+"""
+The art on each layer that is drawn, as (layer, Art), in stacking order
+"""
+def stack(art):
+    order = sorted(art.layers(), key=lambda layer: (_stacking.get(layer, len(STACKING)), layer))
+    return [(layer, art.select(layer)) for layer in order]
+
+"""
+Rings (N, K, 2) turned to run counterclockwise
+"""
+def counterclockwise(points):
+    (x, y) = (points[:, :, 0], points[:, :, 1])
+    area = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1)
+    points = points.copy()
+    points[area < 0] = points[area < 0, ::-1]
+    return points
+
+"""
+Outlines of boxes (an (N, 7) array of x, y, half width, half height,
+rotation, roundness (percent), layer) with steps segments per corner
+"""
+def boxRings(boxes, steps):
+    corner = np.repeat(np.arange(4), steps + 1)
+    t  = (corner + np.tile(np.linspace(0, 1, steps + 1), 4)) * (np.pi / 2)
+    sx = np.array((1, -1, -1, 1))[corner]
+    sy = np.array((1, 1, -1, -1))[corner]
+    rc = (np.minimum(boxes[:, 2], boxes[:, 3]) * boxes[:, 5] / 100.0)[:, None]
+    lx = sx * (boxes[:, 2:3] - rc) + rc * np.cos(t)
+    ly = sy * (boxes[:, 3:4] - rc) + rc * np.sin(t)
+    a  = np.radians(boxes[:, 4:5])
+    (c, s) = (np.cos(a), np.sin(a))
+    return np.stack((boxes[:, 0:1] + c * lx - s * ly, boxes[:, 1:2] + s * lx + c * ly), axis=2)
+
+"""
+Octagons (an (N, 5) array of x, y, half width, rotation, layer)
+"""
+def octagonRings(octagons):
+    t = np.radians(22.5 + 45.0 * np.arange(8) + octagons[:, 3:4])
+    r = octagons[:, 2:3] / math.cos(math.radians(22.5))
+    return np.stack((octagons[:, 0:1] + r * np.cos(t), octagons[:, 1:2] + r * np.sin(t)), axis=2)
+
+"""
+A polygon's outline from its (x, y, curve) vertices
+"""
+def polygonRing(vertices):
+    points = np.vstack([Geometry.arcPoints(x1, y1, x2, y2, curve, TOLERANCE)
+                        for ((x1, y1, curve), (x2, y2, c2)) in zip(vertices, vertices[1:] + vertices[:1])])
+    if len(points) > 3:
+        points = Geometry.simplify(points, TOLERANCE, ring=True)
+    return counterclockwise(points[None])
+
+class Builder(object):
+    """
+    Collects primitives, one add() at a time, into an Art
+    """
+    __slots__ = ("wires", "circles", "discs", "boxes", "octagons", "polygons", "texts")
+
+    def __init__(self):
+        self.wires    = []
+        self.circles  = []
+        self.discs    = []
+        self.boxes    = []      # x, y, hx, hy, rotation, roundness, layer
+        self.octagons = []      # x, y, hx, rotation, layer
+        self.polygons = []      # (layer, vertices)
+        self.texts    = []
+
+    def pad(self, N, layer, diameter, drill):
+        (x, y)  = (float(N.get("x")), float(N.get("y")))
+        angle   = Geometry.getAngle(N)
+        shape   = N.get("shape", "round")
+        if shape == "round":
+            self.discs.append((x, y, diameter / 2, layer))
+        elif shape == "square":
+            self.boxes.append((x, y, diameter / 2, diameter / 2, angle, 0, layer))
+        elif shape == "octagon":
+            self.octagons.append((x, y, diameter / 2, angle, layer))
+        else:   # long and offset pads are twice as long as they are wide
+            if shape == "offset":
+                a = math.radians(angle)
+                (x, y) = (x + diameter / 2 * math.cos(a), y + diameter / 2 * math.sin(a))
+            self.boxes.append((x, y, diameter, diameter / 2, angle, 100, layer))
+        if drill:
+            self.discs.append((float(N.get("x")), float(N.get("y")), drill / 2, DRILLS))
+
+    """
+    Add a primitive; N is its XML node or attribute dict, as for
+    Geometry.addShape(), with a text's value in N["value"]
+    """
+    def add(self, tag, N):
+        if tag == "wire":
+            self.wires.append(Geometry.getWire(N))
+        elif tag == "smd":
+            (x, y)   = (float(N.get("x")), float(N.get("y")))
+            (hx, hy) = (float(N.get("dx")) / 2, float(N.get("dy")) / 2)
+            roundness = float(N.get("roundness", "0"))
+            if roundness == 100 and hx == hy:
+                self.discs.append((x, y, hx, int(N.get("layer"))))
+            else:
+                self.boxes.append((x, y, hx, hy, Geometry.getAngle(N), roundness, int(N.get("layer"))))
+        elif tag == "pad":
+            drill = float(N.get("drill", "0"))
+            self.pad(N, PADS, float(N.get("diameter", "0")) or Geometry.padDiameter(drill), drill)
+        elif tag == "via":
+            drill = float(N.get("drill", "0"))
+            self.pad(N, VIAS, float(N.get("diameter", "0")) or Geometry.padDiameter(drill), drill)
+        elif tag == "rectangle":
+            (x1, y1) = (float(N.get("x1")), float(N.get("y1")))
+            (x2, y2) = (float(N.get("x2")), float(N.get("y2")))
+            self.boxes.append(((x1 + x2) / 2, (y1 + y2) / 2, abs(x2 - x1) / 2, abs(y2 - y1) / 2,
+                               Geometry.getAngle(N), 0, int(N.get("layer"))))
+        elif tag == "circle":
+            (x, y, r) = (float(N.get("x")), float(N.get("y")), float(N.get("radius")))
+            width = float(N.get("width", "0"))
+            if width:
+                self.circles.append((x, y, r, width, int(N.get("layer"))))
+            else:
+                self.discs.append((x, y, r, int(N.get("layer"))))
+        elif tag == "hole":
+            self.discs.append((float(N.get("x")), float(N.get("y")), float(N.get("drill")) / 2, HOLES))
+        elif tag == "polygon":
+            self.polygons.append((int(N.get("layer")), list(N.get("vertices", []))))
+        elif tag == "vertex":
+            # a package's polygon is followed by its vertices
+            self.polygons[-1][1].append((float(N.get("x")), float(N.get("y")), float(N.get("curve", "0"))))
+        elif tag == "text":
+            self.texts.append(getText(N, N.get("value", "")))
+
+    def art(self):
+        rings = []
+        boxes = np.array(self.boxes, dtype=float).reshape(-1, 7)
+        for (square, steps) in ((boxes[:, 5] == 0, 0), (boxes[:, 5] != 0, CORNER)):
+            if square.any():
+                rings.append((boxes[square, 6].astype(int), boxRings(boxes[square], steps)))
+        octagons = np.array(self.octagons, dtype=float).reshape(-1, 5)
+        if len(octagons):
+            rings.append((octagons[:, 4].astype(int), octagonRings(octagons)))
+        for (layer, vertices) in self.polygons:
+            if len(vertices) >= 3:
+                rings.append((np.array((layer,)), polygonRing(vertices)))
+        return Art(Geometry.wireArray(self.wires),
+                   np.array(self.circles, dtype=float).reshape(-1, 5),
+                   np.array(self.discs, dtype=float).reshape(-1, 4),
+                   rings, self.texts)
+
+"""
+A package's art, from its (tag, attributes) nodes
+"""
+def packageArt(nodes):
+    builder = Builder()
+    for (tag, N) in nodes:
+        if tag in TAGS:
+            builder.add(tag, N)
+    return builder.art()
+
+"""
+The texts of a smashed element's attributes, already placed on the board
+"""
+def attributeArt(e):
+    texts = []
+    for a in e.get("attributes", ()):
+        if a.get("display", "value") == "off" or "x" not in a:
+            continue
+        name  = a.get("name", "")
+        value = {"NAME": e.get("name", ""), "VALUE": e.get("value", "")}.get(name, a.get("value", ""))
+        if a.get("display") == "name":
+            value = name
+        elif a.get("display") == "both":
+            value = "{}={}".format(name, value)
+        if value:
+            texts.append(getText(a, value))
+    return Art(Geometry.wireArray([]), np.zeros((0, 5)), np.zeros((0, 4)), [], texts)
+
+"""
+The art drawn on the board itself, from a BoardIndex's tags (its
+wires, signal wires and polygons, vias, holes, circles, rectangles and texts)
+"""
+def boardArt(tags):
+    builder = Builder()
+    for tag in ("wire", "via", "hole", "circle", "rectangle", "polygon", "text"):
+        for N in tags.get(tag, ()):
+            builder.add(tag, N)
+    return builder.art()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+A board's parts, collected into BOM lines
+
+The parts are grouped by their canonical component id (see ComponentID),
+so 10k and 10K resistors, or 100nF and 0.1uF capacitors, are one line.
+Each line lists its parts' designators in natural order (C2 before C10);
+the lines are in the natural order of their ids.
+
+aggregate() makes one pass over the parts, and the BOM it returns (a
+tuple of Lines) is not changed by the writers, so the same BOM can be
+written as Markdown, MediaWiki, CSV and JSON (see eagle2bom).
+"""
+
+__version__ = "0.1"
+
+from CAMTool.fab import CHMTPickNPlace, ComponentID, EagleCAD
+
+import collections
+
+
+"""
+What goes in a BOM's Type/Feeder column for a part's feeder
+"""
+def feederName(feeder):
+    if feeder == CHMTPickNPlace.SKIP:
+        return 'PTH'
+    if feeder == CHMTPickNPlace.NOTFOUND:
+        return 'NONE'
+    return feeder
+
+class Line(collections.namedtuple("Line", ("id", "value", "package", "library", "feeder", "names"))):
+    """
+    id, value, package and library are those of the line's first part,
+    feeder is its feeder number (or SKIP for PTH parts, NOTFOUND for SMD
+    parts with no feeder), and names its designators
+    """
+    __slots__ = ()
+
+    @property
+    def count(self):
+        return len(self.names)
+
+    @property
+    def feederName(self):
+        return feederName(self.feeder)
+
+    @property
+    def smd(self):
+        return self.feeder != CHMTPickNPlace.SKIP
+
+"""
+The BOM for a dict of Parts (from EagleCAD.getSMDParts()), as a tuple of Lines
+"""
+def aggregate(parts):
+    groups = {}
+    for p in EagleCAD.sortedParts(parts):
+        groups.setdefault(ComponentID.canonical(p.component()), []).append(p)
+
+    lines = []
+    for members in groups.values():
+        p = members[0]
+        lines.append(Line(p.id, p.value, p.package, p.library, p.feeder,
+                          tuple(m.name for m in members)))
+    return tuple(sorted(lines, key=lambda l: EagleCAD.natural_sort_key(l.id)))
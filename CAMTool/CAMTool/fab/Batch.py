@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Run a per-board job over a list of boards, either one after another or
+spread over a pool of worker processes (eagle2bom --jobs N, etc)
+
+The feeder table, palettes and other shared data are loaded once by the
+caller and handed to each worker when it starts, rather than with every
+board.  Whatever a job prints is collected and written out in the order
+the boards were given, as are any errors, so the output is the same no
+matter how many workers are used.
+"""
+
+__version__ = "0.1"
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import io
+import os
+import sys
+import traceback
+
+_shared = ()
+
+
+def _start(initializer, shared):
+    global _shared
+    _shared = shared
+    if initializer is not None:
+        initializer(*shared)
+
+def _run(process, board):
+    output = io.StringIO()
+    error  = None
+    result = None
+    try:
+        with redirect_stdout(output):
+            result = process(board, *_shared)
+    except Exception:
+        error = traceback.format_exc()
+    return (output.getvalue(), error, result)
+
+"""
+Call process(board, *shared) for every board.
+
+jobs is the number of worker processes to use: 1 (or None) runs the boards
+in this process, 0 uses one worker per CPU.  initializer(*shared), if
+given, is run once in each worker before any boards are processed.
+
+Returns the number of boards that failed.
+"""
+def runBoards(process, boards, jobs, shared, initializer=None):
+    (results, failed) = mapBoards(process, boards, jobs, shared, initializer)
+    return failed
+
+"""
+As runBoards(), but also returns what process returned for each board
+(which has to be picklable when jobs > 1):
+
+Returns ([result for each board, None if it failed], number of boards that failed)
+"""
+def mapBoards(process, boards, jobs, shared, initializer=None):
+    boards = list(boards)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs is None or jobs <= 1 or len(boards) <= 1:
+        _start(initializer, shared)
+        return _report(boards, (_run(process, b) for b in boards))
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(boards)),
+                             initializer=_start,
+                             initargs=(initializer, shared)) as pool:
+        return _report(boards, pool.map(_run, [process] * len(boards), boards))
+
+def _report(boards, runs):
+    failed  = 0
+    results = []
+    for (board, (output, error, result)) in zip(boards, runs):
+        sys.stdout.write(output)
+        sys.stdout.flush()
+        if error is not None:
+            failed += 1
+            print("ERROR: {} failed:\n{}".format(board, error), file=sys.stderr)
+        results.append(result)
+    return (results, failed)
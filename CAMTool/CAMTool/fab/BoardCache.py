@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+An on-disk cache of parsed boards
+
+eagle2CAM runs eagle2chmt, eagle2svg and eagle2bom one after another on the
+same .brd file; rather than each of them parsing it from scratch, the first
+one saves its parsed model here and the others load that snapshot.
+
+Entries are keyed by the SHA1 of the file's contents plus the parser version,
+so an edited board (or a newer parser) simply misses and is re-parsed.
+The compiled feeder table is kept here as well (see CHMTPickNPlace.loadFeeders).
+Stale entries are evicted by age and by the total size of the cache.
+"""
+
+__version__ = "0.1"
+
+import CAMTool.fab.SiteConfiguration as config
+
+import hashlib
+import os
+import os.path
+import pickle
+import tempfile
+import time
+
+cachedir = os.path.expanduser(config.DefaultCacheDir)
+maxbytes = config.DefaultCacheSize * 1024 * 1024
+maxage   = config.DefaultCacheAge * 24 * 60 * 60
+
+SUFFIX   = ".board"
+
+
+"""
+Pick up the cache settings from the [EagleTools] section of EagleTools.cfg:
+
+    boardcache:      directory to keep parsed boards in (empty to disable)
+    boardcachesize:  megabytes
+    boardcacheage:   days
+"""
+def configure(configuration):
+    global cachedir, maxbytes, maxage
+    section = 'EagleTools'
+    if configuration.has_option(section, 'boardcache'):
+        cachedir = os.path.expanduser(configuration.get(section, 'boardcache'))
+    if configuration.has_option(section, 'boardcachesize'):
+        maxbytes = configuration.getint(section, 'boardcachesize') * 1024 * 1024
+    if configuration.has_option(section, 'boardcacheage'):
+        maxage   = configuration.getint(section, 'boardcacheage') * 24 * 60 * 60
+
+def getKey(filename, version):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return "{}-{}".format(h.hexdigest(), version)
+
+def cachefilename(key):
+    return os.path.join(cachedir, key + SUFFIX)
+
+"""
+Return the cached model for key, or None
+"""
+def load(key):
+    if not cachedir:
+        return None
+    fn = cachefilename(key)
+    try:
+        with open(fn, 'rb') as f:
+            model = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    os.utime(fn)    # recently used entries are evicted last
+    return model
+
+"""
+Save a model for key, written atomically so that tools running side by
+side never see a half written entry
+"""
+def save(key, model):
+    if not cachedir:
+        return
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        (fd, tmp) = tempfile.mkstemp(dir=cachedir, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cachefilename(key))
+    except OSError as e:
+        print("Note: could not cache board in {}: {}".format(cachedir, e))
+        return
+    evict()
+
+"""
+Remove entries not used in maxage, then the least recently used ones
+until the cache fits in maxbytes
+"""
+def evict():
+    now = time.time()
+    entries = []
+    for fn in os.listdir(cachedir):
+        if not fn.endswith(SUFFIX):
+            continue
+        path = os.path.join(cachedir, fn)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for (mtime, size, path) in entries)
+    for (mtime, size, path) in sorted(entries):
+        if now - mtime < maxage and total <= maxbytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
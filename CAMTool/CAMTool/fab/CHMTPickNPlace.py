@@ -23,14 +23,28 @@ The Google Doc format is expanded and reordered from the Sparkfun original
 __version__ = "0.1"
 
 import CAMTool.fab.SiteConfiguration as config # local config details
+from CAMTool.fab import BoardCache, ComponentID
 
 import csv
+import hashlib
+import io
+import json
+import os
+import os.path
+import tempfile
+import time
 import urllib.request, urllib.error, urllib.parse
 
 
 SKIP       = -1
 NOTFOUND   = -2
 
+# where the feeder sheet is downloaded from; {key} is the Google Sheets key
+feederurl  = 'https://docs.google.com/spreadsheet/ccc?key={key}&output=csv'
+timeout    = 30         # seconds, per attempt
+retries    = 3
+backoff    = 1.0        # seconds before the first retry, doubled after each
+
 # csv file column names
 tapesize   = 'Tape Size'
 feedernum  = 'Feeder Number'
@@ -87,6 +101,87 @@ idx[inventory]   = 22
 idx[reference]   = 23
 
 
+# Feeder attributes, with the column each comes from and its type
+#   (an empty cell is 0 / False)
+columns = (
+    ("tapeSize",    tapesize,    str),
+    ("number",      feedernum,   str),
+    ("name",        partname,    str),
+    ("xOffset",     feederXoff,  float),
+    ("yOffset",     feederYoff,  float),
+    ("pickHeight",  pickheight,  float),
+    ("pickDelay",   pickdelay,   float),
+    ("pullSpeed",   pullspeed,   int),
+    ("pullDist",    pulldist,    int),
+    ("placeHeight", placeheight, float),
+    ("placeSpeed",  placespeed,  int),
+    ("head",        head,        int),
+    ("rotation",    rotation,    int),
+    ("place",       place,       bool),
+    ("vacuum",      usevacuum,   bool),
+    ("vision",      usevision,   bool),
+    ("sizeX",       partsizeX,   float),
+    ("sizeY",       partsizeY,   float),
+    ("centroidX",   centroidX,   float),
+    ("centroidY",   centroidY,   float),
+    ("aliases",     aliases,     str),
+    ("stockNotes",  stocknotes,  str),
+    ("inventory",   inventory,   str),
+    ("usedOn",      reference,   str),
+)
+attribute = dict((column, name) for (name, column, kind) in columns)
+attribute[options] = "options"
+
+# bump when Feeder or ComponentID changes, so cached tables are rebuilt
+TABLE_VERSION = 4
+
+
+def _convert(text, kind, row, column):
+    if kind is str:
+        return text
+    if kind is bool:
+        return text == "Y"
+    if text.strip() == "":
+        return kind(0)
+    try:
+        return kind(text)
+    except ValueError:
+        raise ValueError("feeder sheet: {} for {} is not a number: {!r}".format(
+            column, row[idx[partname]] or row[idx[feedernum]], text)) from None
+
+"""
+One row of the feeder sheet, with its numbers converted and its options
+worked out.  Fields are read as attributes (f.pickHeight); f[column]
+(f[CHMTPickNPlace.pickheight]) gives the same value by column name.
+"""
+class Feeder(object):
+    __slots__ = tuple(name for (name, column, kind) in columns) + ("station", "options")
+
+    def __init__(self, row):
+        row = list(row) + [""] * (len(idx) - len(row))
+        for (name, column, kind) in columns:
+            setattr(self, name, _convert(row[idx[column]], kind, row, column))
+        # the feeder's station number in a .dpv
+        self.station = _convert(self.number, int, row, feedernum)
+
+        #  Status = 0b.0000.0ABC
+        #  A = 1 = Use Vision
+        #  A = 0 = No Vision
+        #  B = 1 = Use Vacuum Detection
+        #  B = 0 = No Vacuum Detection
+        #  C = 1 = Skip placement
+        #  C = 0 = Place this component
+        #  Example: 3 = no place, vac, no vis
+        opt = 0
+        if self.vision:          opt |= 0x04
+        if self.vacuum:          opt |= 0x02
+        if not self.place:       opt |= 0x01
+        self.options = opt
+
+    def __getitem__(self, column):
+        return getattr(self, attribute[column])
+
+
 # Workflow:
 #    downloadFeederFile(feederfilename, GDocSheetKey):
 #
@@ -97,57 +192,88 @@ idx[reference]   = 23
 #    loadFeeders(feederfile)
 #
 #       Open feeders.csv, parse contents, create data structures, expand part aliases
-#       feeder[feederName]  => { place, usevacuum, usevision }
-#       component[partName] => feederName
+#       feeder[feederName]  => Feeder
+#       component[canonical partName] => feederName
 #       Returns feeder dict and component dict
 #
 #    getFeederForComponent(partName, components)
 #
 #       get feederName (or SKIP) for a given part
 
+"""
+The feeder and component dicts for a feeder sheet.
+
+Building them is cached (see BoardCache), keyed by the sheet's path: the
+cached dicts are used as is while the file's modification time and size
+are unchanged, and after that while its contents hash the same.
+"""
 def loadFeeders(feederfilename):
+    st  = os.stat(feederfilename)
+    key = "feeders-{}-{}".format(hashlib.sha1(os.path.abspath(feederfilename).encode()).hexdigest(),
+                                 TABLE_VERSION)
+    cached = BoardCache.load(key)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[3]
+
+    with open(feederfilename, 'rb') as feedercsv:
+        data = feedercsv.read()
+    digest = hashlib.sha1(data).hexdigest()
+    if cached is not None and cached[2] == digest:
+        table = cached[3]
+    else:
+        table = buildFeeders(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+    BoardCache.save(key, (st.st_mtime_ns, st.st_size, digest, table))
+    return table
+
+"""
+The feeder sheet's rows, as lists of strings, header and all
+"""
+def readFeederRows(feederfilename):
+    with open(feederfilename, 'r', newline='') as feedercsv:
+        return [row for row in csv.reader(feedercsv)]
+
+"""
+The line ending a feeder sheet uses ("\r\n" as Google Sheets exports it,
+or "\n"), so a sheet written back out only differs where its rows do
+"""
+def feederLineEnding(feederfilename):
+    with open(feederfilename, 'rb') as feedercsv:
+        first = feedercsv.readline()
+    return "\r\n" if first.endswith(b"\r\n") else "\n"
+
+def writeFeederRows(feederfilename, rows, lineterminator="\n"):
+    with open(feederfilename, 'w', newline='') as feedercsv:
+        csv.writer(feedercsv, lineterminator=lineterminator).writerows(rows)
+
+"""
+Build the feeder and component dicts (see loadFeeders) from feeder sheet rows
+
+A row with a bad number in it is reported and left out, so the rest of
+the sheet can still be used; its parts just won't be found on a feeder.
+"""
+def buildFeeders(rows):
     feeders = {}
     components = {}
 
-    with open(feederfilename, 'r') as feedercsv:
-        feedereader = csv.reader(feedercsv)
-        for row in feedereader:
-            if row[idx[tapesize]] == tapesize:
-                continue
-            if row[idx[tapesize]] == "NoMount":
-                continue
-            if row[idx[tapesize]] == "Stop":
-                break
-            num = row[idx[feedernum]]
-            if num == "":
-                continue
-            me = {}
-            for k,v in list(idx.items()):
-                me[k] = row[v]
-
-            me[place]       = True if me[place]     == "Y" else False
-            me[usevacuum]   = True if me[usevacuum] == "Y" else False
-            me[usevision]   = True if me[usevision] == "Y" else False
-            #  Status = 0b.0000.0ABC
-            #  A = 1 = Use Vision
-            #  A = 0 = No Vision
-            #  B = 1 = Use Vacuum Detection
-            #  B = 0 = No Vacuum Detection
-            #  C = 1 = Skip placement
-            #  C = 0 = Place this component
-            #  Example: 3 = no place, vac, no vis
-            opt = 0
-            if me[usevision]:        opt |= 0x04
-            if me[usevacuum]:        opt |= 0x02
-            if not me[place]:        opt |= 0x01
-            me[options] = opt
-
-            feeders[num] = me
+    for (line, row) in enumerate(rows, 1):
+        if row[idx[tapesize]] == tapesize:
+            continue
+        if row[idx[tapesize]] == "NoMount":
+            continue
+        if row[idx[tapesize]] == "Stop":
+            break
+        num = row[idx[feedernum]]
+        if num == "":
+            continue
+        try:
+            feeders[num] = Feeder(row)
+        except ValueError as e:
+            print("Note: skipping row {} of the {}".format(line, e))
 
     for fidx in sorted(feeders.keys()):
         f = feeders[fidx]
-        name = f[partname].lower()
-        ts   = f[tapesize].lower()
+        name = f.name.lower()
+        ts   = f.tapeSize.lower()
         if name == '':
             continue
         if ts == "":
@@ -156,21 +282,133 @@ def loadFeeders(feederfilename):
             continue
         if ts == "stop":
             continue
-        components[name] = fidx
-        if f[aliases] == '':
-            continue
+        components[ComponentID.canonical(f.name)] = fidx
 
-        aliaslist = f[aliases].split(':')
-        for a in aliaslist:
-            if a.lower in components:
-                continue
-            components[a.lower()] = fidx
-        # print "Alias: {} =>  {}".format(f[partname], aliaslist)
+        # an alias never takes over another reel's name
+        for a in f.aliases.split(':'):
+            if a:
+                components.setdefault(ComponentID.canonical(a), fidx)
+        # print "Alias: {} =>  {}".format(f.name, f.aliases)
     return (feeders, components)
 
 
 
-def downloadFeederFile(args, feederfilename, key):
+"""
+Pick up the download settings from the [google] section of EagleTools.cfg:
+
+    feederurl:      where to download the feeder sheet from ({key} is
+                    replaced with the spreadsheet key); a local stand-in
+                    such as http://localhost:8000/feeders.csv for testing
+    feedertimeout:  seconds
+    feederretries:  attempts before giving up
+"""
+def configure(configuration):
+    global feederurl, timeout, retries
+    section = 'google'
+    if configuration.has_option(section, 'feederurl'):
+        feederurl = configuration.get(section, 'feederurl', raw=True)
+    if configuration.has_option(section, 'feedertimeout'):
+        timeout   = configuration.getfloat(section, 'feedertimeout')
+    if configuration.has_option(section, 'feederretries'):
+        retries   = max(1, configuration.getint(section, 'feederretries'))
+
+# The ETag and Last-Modified of the downloaded copy are kept next to it
+def validatorsfilename(feederfilename):
+    return feederfilename + ".http"
+
+def readValidators(feederfilename, url):
+    try:
+        with open(validatorsfilename(feederfilename), 'r') as f:
+            validators = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if validators.get("url") != url or not os.path.isfile(feederfilename):
+        return {}
+    return validators
+
+def writeAtomically(filename, data):
+    (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+"""
+Something that isn't the feeder sheet (an empty reply, or a sign in or
+error page) shouldn't replace a good copy
+"""
+def isFeederSheet(data):
+    try:
+        return any(row and row[0] == tapesize
+                   for row in csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+    except (UnicodeDecodeError, csv.Error):
+        return False
+
+"""
+Download the feeder sheet at url to feederfilename, if it has changed
+since the copy there was downloaded.  Returns True if the file was
+updated.
+
+The copy is only replaced (atomically) by a complete feeder sheet.  If
+the download fails after the retries and there is an earlier copy, that
+copy is used; without one, the error is raised.
+"""
+def fetchFeederFile(url, feederfilename):
+    validators = readValidators(feederfilename, url)
+    headers    = {}
+    if "etag" in validators:
+        headers["If-None-Match"]     = validators["etag"]
+    if "modified" in validators:
+        headers["If-Modified-Since"] = validators["modified"]
+
+    error = None
+    for attempt in range(retries):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                data = response.read()
+                etag     = response.headers.get("ETag")
+                modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            e.close()       # the error holds the connection open
+            if e.code == 304:
+                print("Feeder data unchanged")
+                return False
+            error = e
+            if e.code < 500 and e.code != 429:
+                break       # asking again won't help
+            continue
+        except (urllib.error.URLError, OSError) as e:
+            error = e
+            continue
+        if not isFeederSheet(data):
+            error = ValueError("{} is not a feeder sheet".format(url))
+            break
+
+        print("Writing to {} ...".format(feederfilename))
+        writeAtomically(feederfilename, data)
+        validators = {"url": url}
+        if etag:
+            validators["etag"] = etag
+        if modified:
+            validators["modified"] = modified
+        try:
+            writeAtomically(validatorsfilename(feederfilename), json.dumps(validators).encode())
+        except OSError:
+            pass        # the next download just won't be conditional
+        return True
+
+    if os.path.isfile(feederfilename):
+        print("Note: could not download feeder data ({}), using {}".format(error, feederfilename))
+        return False
+    raise error
+
+def downloadFeederFile(args, feederfilename, key, url=None):
     # Borrowed from SparkFun's CHMT ulp...
     # The ID from a 'Anyone with the link can view' shared level spreadsheet
     # This spreadsheet contains configurations for each different reel of components
@@ -179,25 +417,21 @@ def downloadFeederFile(args, feederfilename, key):
 
     if feederfilename is None or feederfilename == '':
         feederfilename = config.defaultfeederfile
-    print("Downloading feeder data from the Google ..."),
+    print("Downloading feeder data from the Google ...")
 
     # This is the public spreadsheet that contains all our feeder data
     # I'm too tired to use OAuth at the moment
-    url = 'https://docs.google.com/spreadsheet/ccc?key=' + key + '&output=csv'
-    response = urllib.request.urlopen(url)
-    data = response.read()
-
-    print("Writing to {} ...".format(feederfilename)),
-
-    with open(feederfilename, "wb") as code:
-        code.write(data)
+    if url is None:
+        url = feederurl
+    return fetchFeederFile(url.format(key=key), feederfilename)
 
 
+"""
+components is keyed by canonical component id (see ComponentID), so
+10K-0603-RES finds the reel for 10k-0603-res
+"""
 def getFeederForComponent(partName, components):
-    pn = partName.lower()
-    if pn not in components:
-        return SKIP
-    return components[pn]
+    return components.get(ComponentID.canonical(partName), SKIP)
 
 
 1;
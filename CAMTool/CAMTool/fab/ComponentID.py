@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Canonical forms of component ids, for matching parts to feeders
+
+A part's id is its value and package, "10k-0603-RES"; the feeder sheet
+names its reels (and their aliases) the same way.  The same component can
+be written many ways, in a design or on the sheet:
+
+    10kΩ  10 kohm  10000R  10K  10000          => 10k
+    0.1uF  0.1µF  100nF  0.1u                  => 100n
+    4k7  4.7kΩ  4K7                            => 4.7k
+    1M  1meg  1MΩ  1000k                       => 1M
+    1m  1mΩ                                    => 1m
+    SOT-23  SOT23  sot_23                      => sot23
+
+so ids are compared by their canonical form.  A value that is a
+passive's quantity - a number, with an SI prefix and/or a unit (F, H,
+ohm, Ω or R) or without, or with an SI prefix standing in for the
+decimal point and at most two digits after it (4k7, 2u2, 4R7) - is read
+as a number and put back in engineering notation, without its unit (the
+package tells a 1u capacitor from a 1u inductor), keeping every digit.
+Prefixes are read in either case, except for M (mega) and m (milli).
+Anything with other letters before or after the number (MMBT3904,
+2N7002, 1N4148, HDR) just loses its case and whitespace: a part number is
+never taken for a value.  The package loses its case, whitespace and
+separators, with a few synonyms mapped to one name.
+
+Canonical forms are memoized, as the same few ids turn up over and over.
+"""
+
+__version__ = "0.1"
+
+from decimal import Decimal
+
+import functools
+import re
+
+# SI prefixes (M is mega, m milli; R is the decimal point in 4R7)
+PREFIXES = {
+    'p': -12, 'n': -9, 'u': -6, 'm': -3, '': 0, 'r': 0,
+    'k': 3, 'M': 6, 'meg': 6, 'g': 9,
+}
+ENGINEERING = {-12: 'p', -9: 'n', -6: 'u', -3: 'm', 0: '', 3: 'k', 6: 'M', 9: 'G'}
+
+# package => the name it goes by
+PACKAGES = {
+    'sot233':   'sot23',
+    'sc70':     'sot323',
+    'do214ac':  'sma',
+}
+
+_unit   = r'(?:f|h|ohms?|\u03c9|r)'
+_plain  = re.compile(r'^(?P<number>\d+(?:\.\d*)?|\.\d+)(?P<prefix>meg|[pnumkg])?' + _unit + r'?$',
+                     re.IGNORECASE)
+_infix  = re.compile(r'^(?P<whole>\d+)(?P<prefix>[pnumkgr])(?P<fraction>\d{1,2})' + _unit + r'?$',
+                     re.IGNORECASE)
+_spaces = re.compile(r'\s+')
+_seps   = re.compile(r'[-_.\s]+')
+
+
+def _exponent(prefix):
+    if prefix == 'M':
+        return PREFIXES['M']
+    return PREFIXES[prefix.lower()]
+
+"""
+A passive's value in engineering notation (10k, 100n, 4.7k, 1M), or, if
+it isn't clearly one, the value in lower case
+"""
+@functools.lru_cache(maxsize=None)
+def canonicalValue(value):
+    text = _spaces.sub('', value)
+    text = text.replace('\u00b5', 'u').replace('\u03bc', 'u')            # micro signs
+    text = text.replace('\u2126', '\u03c9').replace('\u03a9', '\u03c9')      # ohm signs
+
+    m = _plain.match(text)
+    if m:
+        number = Decimal(m.group('number'))
+    else:
+        m = _infix.match(text)
+        if not m:
+            return text.lower()
+        number = Decimal(m.group('whole') + '.' + m.group('fraction'))
+    number = number.scaleb(_exponent(m.group('prefix') or ''))
+
+    if number == 0:
+        return '0'
+    exponent = min(max(number.adjusted() // 3 * 3, -12), 9)
+    return '{:f}{}'.format(number.scaleb(-exponent).normalize(), ENGINEERING[exponent])
+
+"""
+A package name in lower case, without separators: SOT-23 => sot23
+"""
+@functools.lru_cache(maxsize=None)
+def canonicalPackage(package):
+    name = _seps.sub('', package.lower())
+    return PACKAGES.get(name, name)
+
+"""
+The canonical form of a value-package component id
+"""
+@functools.lru_cache(maxsize=None)
+def canonical(partName):
+    (value, sep, package) = partName.partition('-')
+    if not sep:
+        return canonicalValue(partName)
+    return canonicalValue(value) + '-' + canonicalPackage(package)
@@ -9,10 +9,11 @@ License: Python Software Foundation License
 __version__ = "0.1"
 
 # from CAMTool.fab.SiteConfiguration import * # local config details
-from CAMTool.fab import CHMTPickNPlace
+from CAMTool.fab import Artwork, BoardCache, CHMTPickNPlace, Geometry, LibraryIndex, Rotation, SpatialIndex
 
-from xml.dom.minidom import parse
-import xml.dom.minidom
+from xml.etree.ElementTree import iterparse
+import itertools
+import math
 import re
 
 """
@@ -48,93 +49,403 @@ def getLayers(eaglercfile):
                 palettes[profile][item] = color
     return palettes
 
+# bump whenever the BoardIndex contents change, so cached boards are re-parsed
+PARSER_VERSION = 5
+
+# board level items that are collected, by tag, into BoardIndex.tags
+INDEXED    = ("wire", "via", "hole", "circle", "rectangle", "text")
+
+# items whose whole subtree is needed, kept until their closing tag is seen
+CONTAINERS = ("package", "symbol", "deviceset", "polygon")
+
+"""
+Walk an EAGLE CAD XML file with a streaming parser, yielding (tag, item) tuples
+as each item of interest is read:
+
+    ('layer',   (number, color))        palette color index for a layer
+    ('package', Package)
+    ('element', {name, library, package, value, x, y, rot, smashed, ...,
+                 attributes: [{name, value, x, y, size, layer, rot, display, ...}]})
+    ('polygon', {width, layer, ..., vertices, signal})
+    ('symbol' or 'deviceset', {name, ...})
+    (INDEXED tag, {attributes..., signal})  e.g. plain and signal wires, vias
+
+Board level items drawn as part of a <signal> carry the signal's name.
+
+Everything else is discarded as soon as it has been read, and a container's
+subtree is only kept until its closing tag has been seen, so memory use is
+bounded by the largest single package rather than by the size of the file.
+"""
+def iterBoard(boardname):
+    stack  = []         # open elements, root first
+    keep   = 0          # >0 while inside a CONTAINERS subtree
+    signal = None       # name of the <signal> being read
+    attributes = []     # of the <element> being read
+
+    for event, node in iterparse(boardname, events=("start", "end")):
+        tag = node.tag
+        if event == "start":
+            stack.append(node)
+            if tag in CONTAINERS:
+                keep += 1
+            elif tag == "signal":
+                signal = node.get("name")
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+
+        if tag in CONTAINERS:
+            keep -= 1
+            if keep:
+                continue    # nested, e.g. a polygon inside a package
+            if tag == "package":
+                yield ("package", getPackage(node))
+            elif tag == "polygon":
+                yield ("polygon", getPolygon(node, signal))
+            else:
+                yield (tag, dict(node.attrib))
+        elif keep:
+            continue    # keep the subtree until its container is done
+        elif tag == "layer":
+            yield ("layer", (int(node.get("number")), int(node.get("color"))))
+        elif tag == "attribute" and parent is not None and parent.tag == "element":
+            attributes.append(dict(node.attrib))
+        elif tag == "element" and parent is not None and parent.tag == "elements":
+            item = dict(node.attrib)
+            item["attributes"] = attributes
+            attributes = []
+            yield ("element", item)
+        elif tag == "signal":
+            signal = None
+        elif tag in INDEXED:
+            item = dict(node.attrib)
+            if signal is not None:
+                item["signal"] = signal
+            if tag == "text":
+                item["value"] = node.text or ""
+            yield (tag, item)
+
+        # done with this node, release it (and anything below it)
+        if parent is not None:
+            parent.remove(node)
+        node.clear()
+
+getWire = Geometry.getWire
+
+"""
+A footprint from a board's (or library's) <packages> section.
+
+A package's geometry is only worked out the first time its wires, boxes,
+points, bounds or art are asked for (see resolvePackages()), so the packages
+of large vendor libraries embedded in a board, but never placed, cost next
+to nothing.
+"""
+class Package(object):
+    __slots__ = ("name", "description", "smd", "_nodes", "_shapes", "_bounds", "_pads", "_art")
+
+    def __init__(self, name, description, smd, nodes):
+        self.name        = name
+        self.description = description
+        self.smd         = smd
+        self._nodes      = nodes    # (tag, attributes) of its primitives, until resolved
+        self._shapes     = None     # (wires, boxes, points), see Geometry
+        self._bounds     = None
+        self._pads       = None
+        self._art        = None     # everything drawn, see Artwork
+
+    def getShapes(self):
+        if self._shapes is None:
+            resolvePackages([self])
+        return self._shapes
+
+    def getBounds(self):
+        if self._bounds is None:
+            resolvePackages([self])
+        return self._bounds
+
+    def getPads(self):
+        if self._pads is None:
+            resolvePackages([self])
+        return self._pads
+
+    def getArt(self):
+        if self._art is None:
+            resolvePackages([self])
+        return self._art
+
+    wires  = property(lambda self: self.getShapes()[0])
+    boxes  = property(lambda self: self.getShapes()[1])
+    points = property(lambda self: self.getShapes()[2])
+    xmin   = property(lambda self: self.getBounds()[0])
+    ymin   = property(lambda self: self.getBounds()[1])
+    xmax   = property(lambda self: self.getBounds()[2])
+    ymax   = property(lambda self: self.getBounds()[3])
+    pads   = property(lambda self: self.getPads())
+    art    = property(lambda self: self.getArt())
+
+"""
+Work out the geometry of any of these packages that have not been resolved
+yet, all in one vectorized pass
+"""
+def resolvePackages(packages):
+    todo = [P for P in packages if P._shapes is None]
+    if not todo:
+        return
+    shapes = []
+    pads   = []
+    for P in todo:
+        (wires, boxes, points) = ([], [], [])
+        named = []
+        for (tag, N) in P._nodes:
+            if tag in ("smd", "pad"):
+                named.append((N.get("name", ""), len(boxes)))
+            Geometry.addShape(tag, N, wires, boxes, points)
+        shapes.append((wires, boxes, points))
+        pads.append(tuple(named))
+    (views, bounds) = Geometry.packShapes(shapes)
+    for (P, v, b, named) in zip(todo, views, bounds.tolist(), pads):
+        P._shapes = tuple(v)
+        P._bounds = tuple(b)
+        P._pads   = named
+        P._art    = Artwork.packageArt(P._nodes)
+        P._nodes  = None
+
+def getPackage(P):
+    description = ''
+    smd         = False   # default
+    nodes       = []
+
+    # one pass over the package's subtree
+    for N in P.iter():
+        if N.tag == "smd":
+            smd = True
+        elif N.tag == "description" and N.text:
+            description = N.text
+        if N.tag == "text":
+            nodes.append((N.tag, dict(N.attrib, value=N.text or "")))
+        elif N.tag in Artwork.TAGS:
+            nodes.append((N.tag, N.attrib))
+    return Package(P.get("name"), description, smd, nodes)
+
+def getPolygon(P, signal):
+    me = dict(P.attrib)
+    me["vertices"] = [(float(V.get("x")), float(V.get("y")), float(V.get("curve", "0")))
+                      for V in P.iter("vertex")]
+    if signal is not None:
+        me["signal"] = signal
+    return me
+
+"""
+Everything needed from a board (or library) file, collected in a single pass:
+
+    packages    lowercase package name => Package, see getPackage() and
+                placedPackages() for resolving their geometry lazily
+    elements    element name => attribute dict, in file order
+    plain       wires drawn on the board itself, as a Geometry wires array
+    layers      layer number => palette color index
+    tags        tag => list of attribute dicts for everything else
+                (signal wires, vias, holes, polygons, symbols, ...)
+
+Callers read from the index instead of re-walking the XML.
+padIndex() adds a SpatialIndex over the placed elements' pads, for
+finding what is near a spot on the board (see getFiducials()).
+"""
+class BoardIndex(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.packages = {}
+        self.elements = {}
+        self.plain    = []
+        self.layers   = {}
+        self.tags     = {}
+        self._spatial = {}
+
+    def add(self, tag, item):
+        if tag == "package":
+            self.packages[item.name.lower()] = item
+        elif tag == "element":
+            if "name" in item:
+                self.elements[item["name"]] = item
+        elif tag == "layer":
+            (lnum, litem) = item
+            self.layers[lnum] = litem
+        else:
+            self.tags.setdefault(tag, []).append(item)
+            if tag == "wire" and "signal" not in item:
+                self.plain.append(getWire(item))
+
+    def getTag(self, tag):
+        return self.tags.get(tag, [])
+
+    # memoizing accessor: the package, with its geometry resolved
+    def getPackage(self, name):
+        P = self.packages[name.lower()]
+        resolvePackages([P])
+        return P
+
+    """
+    The packages actually used by the board's elements (in file order),
+    with their geometry resolved in a single batch
+    """
+    def placedPackages(self):
+        used   = set(e.get("package", "").lower() for e in self.elements.values())
+        placed = dict((n, P) for (n, P) in self.packages.items() if n in used)
+        resolvePackages(list(placed.values()))
+        return placed
+
+    """
+    The board bounds of each element's package, as an (N, 4) array, along
+    with the element names and the transforms placing them.  Elements whose
+    package has no geometry are given a point at their origin.
+    """
+    def elementBounds(self):
+        packages   = self.placedPackages()
+        names      = []
+        transforms = []
+        bounds     = []
+        for e in self.elements.values():
+            T = Rotation.parse(e.get("rot", "")).at(e.get("x", "0"), e.get("y", "0"))
+            P = packages.get(e.get("package", "").lower())
+            if P is None or P.xmin > P.xmax:
+                bounds.append((T.x, T.y, T.x, T.y))
+            else:
+                bounds.append(T.applyBounds(P.getBounds())[0])
+            names.append(e["name"])
+            transforms.append((T, P))
+        return (Geometry.boundsArray(bounds), names, transforms)
+
+    """
+    Everything drawn on the board, in board coordinates, as an Artwork.Art:
+    the board's own wires, polygons, vias, etc, and each element's package
+    with its name and value (or, if it is smashed, its attributes)
+    """
+    def artwork(self):
+        packages = self.placedPackages()
+        arts     = [Artwork.boardArt(self.tags)]
+        placed   = {}       # package => ([Transform], [names])
+        for e in self.elements.values():
+            P = packages.get(e.get("package", "").lower())
+            if P is None:
+                continue
+            T = Rotation.parse(e.get("rot", "")).at(e.get("x", "0"), e.get("y", "0"))
+            if e.get("smashed") == "yes":
+                names = {}
+                arts.append(Artwork.attributeArt(e))
+            else:
+                names = {">NAME": e["name"], ">VALUE": e.get("value", "")}
+            (transforms, elementNames) = placed.setdefault(P.name.lower(), ([], []))
+            transforms.append(T)
+            elementNames.append(names)
+        for (name, (transforms, names)) in placed.items():
+            arts.append(packages[name].art.placeAll(transforms, names))
+        return Artwork.combine(arts)
+
+    """
+    A SpatialIndex of the smds and pads of every element,
+    items are (element name, pad name) tuples
+    """
+    def padIndex(self):
+        if "pads" not in self._spatial:
+            (bounds, names, transforms) = self.elementBounds()
+            items  = []
+            bounds = []
+            for (name, (T, P)) in zip(names, transforms):
+                if P is None or not P.pads:
+                    continue
+                rows = [row for (pad, row) in P.pads]
+                bounds.extend(T.applyBounds(Geometry.boxBounds(P.boxes[rows])).tolist())
+                items.extend((name, pad) for (pad, row) in P.pads)
+            self._spatial["pads"] = SpatialIndex.SpatialIndex(Geometry.boundsArray(bounds), items)
+        return self._spatial["pads"]
+
+    # the spatial index is rebuilt on demand rather than cached with the board
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_spatial"] = {}
+        return state
+
+    # called once everything has been read
+    def finish(self):
+        self.plain = Geometry.wireArray(self.plain)
+
+def indexBoard(filename):
+    index = BoardIndex(filename)
+    for (tag, item) in iterBoard(filename):
+        index.add(tag, item)
+    index.finish()
+    return index
+
 """
 Load the EAGLE CAD XML board file, generating dict's of
     * packages (name, smd/pth, x & y boundary)
     * layers (number, color)
-    as well as the DOM (for further exploration by caller)
+    as well as the BoardIndex (for further exploration by caller)
 """
 def loadBoard(boardname, palettes):
-    packages = {}
-
-    # Open XML document using minidom parser
-    DOMTree = xml.dom.minidom.parse(boardname)
-    X = DOMTree.documentElement
-
-    for P in X.getElementsByTagName("package"):
-        me = {}
-        me["name"] = P.getAttribute("name")
-        me["smd"] = False   # default
-        smd = P.getElementsByTagName("smd")
-        if (smd):
-            me["smd"] = True
-        (me["xmin"], me["ymin"], me["xmax"], me["ymax"]) = getSymbolBounds(P,10000,10000,-10000,-10000)
-        packages[me["name"].lower()] = me
-        # print "Loaded: {} - bounds: ({},{}) ({},{})".format(me['name'],me["xmin"], me["ymin"], me["xmax"], me["ymax"])
+    key   = BoardCache.getKey(boardname, PARSER_VERSION)
+    board = BoardCache.load(key)
+    if board is None:
+        board = indexBoard(boardname)
+        BoardCache.save(key, board)
+    board.filename = boardname
 
     # <layers>
     # <layer number="1" name="Top" color="4" fill="1" visible="yes" active="yes"/>
-
     layers = {}
-    for L in X.getElementsByTagName("layers"):
-        for l in L.getElementsByTagName("layer"):
-            lnum  = int(l.getAttribute("number"))
-            litem = int(l.getAttribute("color"))
-            #print("Layer[{}] = palettes[{}][{}] = {}".format(lnum, 0, litem, palettes[0][litem]))
-            layers[lnum] = palettes[1][litem]
-    return (X, packages, layers)
-
-def loadLibrary(libname):
+    for lnum, litem in board.layers.items():
+        #print("Layer[{}] = palettes[{}][{}] = {}".format(lnum, 0, litem, palettes[0][litem]))
+        layers[lnum] = palettes[1][litem]
+    return (board, board.packages, layers)
+
+"""
+Load packages from an EAGLE CAD library.
+
+Only the packages named (all of them if names is None) are read and parsed,
+using the library's LibraryIndex of byte offsets; the index is returned as
+well so callers can fetch more packages, symbols or devicesets on demand,
+and close it (or use it in a with block) when they are done with it.
+"""
+def loadLibrary(libname, names=None):
+    library  = LibraryIndex.LibraryIndex(libname)
     packages = {}
     symbols  = {}
 
+    if names is None:
+        names = library.names("package")
+    try:
+        for name in names:
+            if library.has("package", name):
+                me = getPackage(library.getNode("package", name))
+                packages[me.name.lower()] = me
+        resolvePackages(list(packages.values()))
+    except BaseException:
+        library.close()
+        raise
 
-    # Open XML document using minidom parser
-    DOMTree = xml.dom.minidom.parse(libname)
-    X = DOMTree.documentElement
+    for me in packages.values():
+        me.description = me.description.replace('\n', '<br>')
 
-    for P in X.getElementsByTagName("package"):
-        me = {}
-        me["name"]        = P.getAttribute("name")
-        me["description"] = ''
-        D = P.getElementsByTagName("description")
-        if D:
-            me["description"] = " ".join(t.nodeValue for t in D[0].childNodes if t.nodeType == t.TEXT_NODE)
-        me["description"] = me["description"].replace('\n', '<br>')
-        me["smd"] = False   # default
-        smd = P.getElementsByTagName("smd")
-        if (smd):
-            me["smd"] = True
-        (me["xmin"], me["ymin"], me["xmax"], me["ymax"]) = getSymbolBounds(P,10000,10000,-10000,-10000)
-        packages[me["name"].lower()] = me
-        print("Package: {}: {} - bounds: ({},{}) ({},{})".format(me['name'],me['description'], me["xmin"], me["ymin"], me["xmax"], me["ymax"]))
+    for name in library.names("symbol"):
+        symbols[name.lower()] = {"name": name}
 
-        #for node in P.childNodes:
-            #print("\tChild: {}".format(node.nodeName)
-
-    return (X, packages, symbols)
+    return (library, packages, symbols)
 
 
+"""
+Bounds of everything drawn inside an XML node (package, symbol, ...),
+merged with the bounds passed in
+"""
 def getSymbolBounds(E, xmin, ymin, xmax, ymax):
-    for wire in E.getElementsByTagName("wire"):
-        #if wire.getAttribute("layer") == "20":
-        (xmin, ymin, xmax, ymax) = getElementBounds(wire, xmin, ymin, xmax, ymax)
-    return (xmin, ymin, xmax, ymax)
-
-def getElementBounds(E, xmin,ymin,xmax,ymax):
-    wx1 = float(E.getAttribute("x1"))
-    wy1 = float(E.getAttribute("y1"))
-    wx2 = float(E.getAttribute("x2"))
-    wy2 = float(E.getAttribute("y2"))
-    if (wx1 > xmax): xmax = wx1
-    if (wy1 > ymax): ymax = wy1
-    if (wx1 < xmin): xmin = wx1
-    if (wy1 < ymin): ymin = wy1
-    if (wx2 > xmax): xmax = wx2
-    if (wy2 > ymax): ymax = wy2
-    if (wx2 < xmin): xmin = wx2
-    if (wy2 < ymin): ymin = wy2
-    return (xmin, ymin, xmax, ymax)
+    wires  = []
+    boxes  = []
+    points = []
+    for N in E.iter():
+        Geometry.addShape(N.tag, N, wires, boxes, points)
+    b = Geometry.bounds(Geometry.wireArray(wires), Geometry.boxArray(boxes), Geometry.pointArray(points))
+    if b is None:
+        return (xmin, ymin, xmax, ymax)
+    return (min(xmin, b[0]), min(ymin, b[1]), max(xmax, b[2]), max(ymax, b[3]))
 
 """
 My boards all have a special SYMBOL called "BOARD" that defines the DIM layer bounds.
@@ -157,109 +468,177 @@ def getBoardDimensions(eagleBoard):
     ymax = xmax
     ymin = xmin
 
-    for P in eagleBoard.getElementsByTagName("package"):
-        name = P.getAttribute("name")
-        if name.startswith('BOARD'):
-            (xmin, ymin, xmax, ymax) = getSymbolBounds(P, xmin, ymin, xmax, ymax)
+    for P in eagleBoard.placedPackages().values():
+        if P.name.startswith('BOARD') and P.xmin <= P.xmax:
+            (xmin, ymin) = (min(xmin, P.xmin), min(ymin, P.ymin))
+            (xmax, ymax) = (max(xmax, P.xmax), max(ymax, P.ymax))
     if xmax > -100000.0:
         return (xmin,ymin,xmax,ymax)
 
     # no BOARD found, or no layer="20" wires on it, look for <board>'s layer20
-    for P in eagleBoard.getElementsByTagName("board"):
-        (xmin, ymin, xmax, ymax) = getSymbolBounds(P, xmin, ymin, xmax, ymax)
-
-    if xmax > -100000.0:
-        return (xmin, ymin, xmax, ymax)
+    b = Geometry.bounds(eagleBoard.plain)
+    if b is not None:
+        return b
 
     # no dimensions found...
     return (0,0,0,0)
 
+"""
+A placed element, as seen by the BOM and pick-n-place writers
+
+    x, y        placement, in mm
+    rot         the element's rotation string, e.g. "MR90"
+    angle       its rotation in degrees, mirror is True for bottom side parts
+    placement   angle to use on the CHMT, None unless the part has a feeder
+                and is on the top of the board (see getSMDParts())
+    sortkey     natural_sort_key(name), for LED1 LED2 ... LED10 ordering
+    id          value-package, used to find the part's feeder
+"""
+class Part(object):
+    __slots__ = ("name", "library", "package", "value", "x", "y", "rot", "angle", "mirror",
+                 "placement", "smashed", "smd", "feeder", "id", "sortkey")
+
+    def __init__(self, e):
+        # <element name="LED1" library="SPCoast" package="0603-LED" value="R" x="19.05" y="38.1" smashed="yes" rot="R180">
+        self.name      = e.get("name", "")
+        self.library   = e.get("library", "")
+        self.package   = e.get("package", "")
+        self.value     = e.get("value", "")
+        self.x         = float(e.get("x", "0"))
+        self.y         = float(e.get("y", "0"))
+        self.rot       = e.get("rot", "")
+        rotation       = Rotation.parse(self.rot)
+        self.angle     = rotation.angle
+        self.mirror    = rotation.mirror
+        self.placement = None
+        self.smashed   = e.get("smashed", "")
+        self.smd       = True  # corrected later if not...
+        self.feeder    = CHMTPickNPlace.SKIP
+        self.id        = self.value.lower() + "-" + self.package.lower()
+        self.sortkey   = natural_sort_key(self.name)
+
+    """
+    The value-package name the feeder sheet knows the part by, in its
+    original case (1M is not 1m)
+    """
+    def component(self):
+        return self.value + "-" + self.package
+
+def sortedParts(parts):
+    return sorted(parts.values(), key=lambda p: p.sortkey)
+
 """
 SMD Parts generally have no plated PADS
 Only SMD Parts are pick-n-placed automatically
 This returns a dict of SMD parts used in a design.
+
+The CHMT only places parts on the top of the board: a mirrored (bottom
+side) part still gets its feeder, so it shows up in the BOM, but no
+placement angle, which leaves it out of the pick-n-place job.
 """
 def getSMDParts(eagleBoard, packages, component, feeder):
     parts = {}
 
-    Boards = eagleBoard.getElementsByTagName("board")
-    for B in Boards:
-        # Get all the elements in the collection
-        E = B.getElementsByTagName("element")
+    # Print detail of each element.
+    for e in eagleBoard.elements.values():
+        me = Part(e)
+        parts[me.name] = me
 
-        # Print detail of each element.
-        for e in E:
-            if not e.hasAttribute("name"):
-                continue
-            # <element name="LED1" library="SPCoast" package="0603-LED" value="R" x="19.05" y="38.1" smashed="yes" rot="R180">
-
-            me = {}
-            me['name']    = e.getAttribute("name")
-            me['library'] = e.getAttribute("library")
-            me['package'] = e.getAttribute("package")
-            me['value']   = e.getAttribute("value")
-            me['x']       = e.getAttribute("x")
-            me['y']       = e.getAttribute("y")
-            me['rot']     = e.getAttribute("rot")
-            me['smashed'] = e.getAttribute("smashed")
-            me['smd']     = True  # corrected later if not...
-            me['feeder']  = CHMTPickNPlace.SKIP
-
-            id = me['value'].lower() + "-" + me['package'].lower()
-            me['id']      = id
-
-            parts[me['name']] = me
-
-            if (me['package'].lower() not in packages) or (not packages[me['package'].lower()]["smd"]):
-                # not a SMD part...
-                me['smd'] = False
-                continue
+        pkg = me.package.lower()
+        if (pkg not in packages) or (not packages[pkg].smd):
+            # not a SMD part...
+            me.smd = False
+            continue
 
-            c = CHMTPickNPlace.getFeederForComponent(id, component)
-            if c != CHMTPickNPlace.SKIP:
-                me['feeder'] = c
-
-                # Normalize rotation...
-                # Most all Eagle FootPrints are correct but we have to subtract 90 because
-                # the CHMT tapes are mounted 90 degrees from the board
-                if me['rot'] == '':
-                    me['rot'] = 'R0'
-                if me['rot'].startswith('MR'):
-                    angle = int(me['rot'].lstrip('MR')) # TODO: Do I need to +180 ?
-                if me['rot'].startswith('R'):
-                    angle = int(me['rot'].lstrip('R'))
-                else:
-                    angle = int(me['rot'])
-                angle = angle - 90
-
-                # However, some feeders/FPs are not horizontal (trays...)
-                # so we correct on a component by component basis
-                angle = angle + int(feeder[c][CHMTPickNPlace.rotation])
-                if (angle > 180):
-                    angle -= 360
-                me['rot'] = angle
-
-                #print "SMD: {name:<10} {id} feeder: {feed}".format(name= e.getAttribute("name"), id= id, feed=component[id])
-            else:
-                me['feeder'] = CHMTPickNPlace.NOTFOUND
-                # print "Note: Could not find feeder for part {} (ret={})".format(id, c)
-        return parts
+        c = CHMTPickNPlace.getFeederForComponent(me.component(), component)
+        if c != CHMTPickNPlace.SKIP:
+            me.feeder = c
+            if me.mirror:
+                continue    # bottom side, placed by hand
+
+            # Normalize rotation...
+            # Most all Eagle FootPrints are correct but we have to subtract 90 because
+            # the CHMT tapes are mounted 90 degrees from the board
+            angle = me.angle - 90
+
+            # However, some feeders/FPs are not horizontal (trays...)
+            # so we correct on a component by component basis
+            angle = angle + feeder[c].rotation
+            if (angle > 180):
+                angle -= 360
+            me.placement = angle
+
+            #print "SMD: {name:<10} {id} feeder: {feed}".format(name=me.name, id=me.id, feed=component[me.id])
+        else:
+            me.feeder = CHMTPickNPlace.NOTFOUND
+            # print "Note: Could not find feeder for part {} (ret={})".format(me.id, c)
+    return parts
 
 """
 The feeder sheet can mark a component as "SKIP"
 If a design's part doesn't have an assigned feeder, assume it isn't used.
+Nor are parts on the bottom of the board (see getSMDParts()).
 """
 def getUsedComponents(parts, feeder):
     used = {}
     for p in sorted(parts.keys()):
-        if parts[p]['feeder'] == CHMTPickNPlace.SKIP:
+        if parts[p].feeder == CHMTPickNPlace.SKIP:
+            continue
+        if parts[p].feeder == CHMTPickNPlace.NOTFOUND:
             continue
-        if parts[p]['feeder'] == CHMTPickNPlace.NOTFOUND:
+        if parts[p].placement is None:
             continue
-        pn = feeder[parts[p]['feeder']][CHMTPickNPlace.partname]
+        pn = feeder[parts[p].feeder].name
         if pn not in used:
             used[pn] = []
         used[pn].append(p)
     return used
 
+"""
+Fiducial marks: elements with a FIDUCIAL* package, or a fiducial value
+(the SPCoast library spells it "fidicual")
+"""
+def isFiducial(e):
+    return e.get("package", "").upper().startswith("FIDUCIAL") \
+        or e.get("value", "").lower() in ("fiducial", "fidicual")
+
+# mm from a fiducial's center that has to be clear of other parts' pads
+FIDUCIAL_CLEARANCE = 1.5
+
+"""
+The board's fiducials, as a dict of Parts.  A mark with another part's pad
+within FIDUCIAL_CLEARANCE of it is left out, as the camera could take the
+pad for the mark.
+"""
+def getFiducials(eagleBoard):
+    fiducials = {}
+    for e in eagleBoard.elements.values():
+        if not isFiducial(e):
+            continue
+        mark    = Part(e)
+        near    = eagleBoard.padIndex().within(mark.x, mark.y, FIDUCIAL_CLEARANCE)
+        crowded = sorted(set(name for (name, pad) in near if name != mark.name), key=natural_sort_key)
+        if crowded:
+            print("Note: fiducial {} is too close to {}, not calibrating against it".format(
+                mark.name, " ".join(crowded)))
+            continue
+        fiducials[mark.name] = mark
+    return fiducials
+
+"""
+The fiducials to calibrate against, in name order: the three that span
+the largest triangle, or, if they are (nearly) in a line, the two
+furthest apart.  Marks close together leave the board's rotation and
+scale poorly determined.
+"""
+def chooseFiducials(fiducials):
+    marks = sortedParts(fiducials)
+    def area(a, b, c):
+        return abs((b.x - a.x) * (c.y - a.y) - (c.x - a.x) * (b.y - a.y)) / 2
+    best = max(itertools.combinations(marks, 3), key=lambda t: area(*t), default=None)
+    if best is None or area(*best) < 1.0:
+        best = max(itertools.combinations(marks, 2),
+                   key=lambda t: math.hypot(t[1].x - t[0].x, t[1].y - t[0].y), default=())
+    return list(best)
+
 1;
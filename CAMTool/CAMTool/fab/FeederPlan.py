@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Plan which reels go in which CHMT feeders for a sequence of boards
+
+The feeder sheet describes the reels mounted on the machine (rows with a
+Feeder Number) as well as reels that are on the shelf (rows with a Tape
+Size and Component, but no Feeder Number).  Parts whose reel is on the
+shelf are normally left out of the .dpv and placed by hand; this works
+out, board by board, which reels to swap onto the machine so they can be
+placed as well.
+
+    * a reel that is already mounted stays where it is
+    * a reel that is needed goes into a feeder of the same tape size whose
+      reel is not needed by this board, preferring the one whose reel will
+      not be needed again for the longest time (so it won't have to be
+      swapped back soon), which keeps the number of reel changes over the
+      whole job to a minimum
+    * between equally good feeders, the one whose pick position (see
+      PickPath) is closest to where the reel's parts go on the board
+
+The planned sheet for each board is a copy of the feeder sheet with the
+Feeder Numbers changed, so it can be written back out or turned into the
+feeder and component dicts used to make that board's .dpv.
+"""
+
+__version__ = "0.1"
+
+from CAMTool.fab import CHMTPickNPlace, ComponentID, PickPath
+
+import math
+
+NEVER = math.inf
+
+
+"""
+A reel the machine could place from: a part name and a tape size
+(not a header, NoMount, or the Stop marker)
+"""
+def isReel(row):
+    ts = row[CHMTPickNPlace.idx[CHMTPickNPlace.tapesize]]
+    if ts in ("", CHMTPickNPlace.tapesize, "NoMount"):
+        return False
+    return row[CHMTPickNPlace.idx[CHMTPickNPlace.partname]] != ""
+
+class FeederPlan(object):
+    def __init__(self, rows):
+        col = CHMTPickNPlace.idx
+        self.rows     = [list(r) for r in rows]
+        self.reels    = {}     # canonical component name or alias => row
+        self.slots    = {}     # feeder number => row of the reel in it
+        self.tape     = {}     # feeder number => tape size
+        self.position = {}     # feeder number => pick position
+        for (i, row) in enumerate(self.rows):
+            if row[col[CHMTPickNPlace.tapesize]] == "Stop":
+                break
+            if not isReel(row):
+                continue
+            name = ComponentID.canonical(row[col[CHMTPickNPlace.partname]])
+            self.reels.setdefault(name, i)
+            for a in row[col[CHMTPickNPlace.aliases]].split(':'):
+                if a:
+                    self.reels.setdefault(ComponentID.canonical(a), i)
+            num = row[col[CHMTPickNPlace.feedernum]]
+            if num != "":
+                self.slots[num]    = i
+                self.tape[num]     = row[col[CHMTPickNPlace.tapesize]].lower()
+                self.position[num] = PickPath.pickPosition(CHMTPickNPlace.Feeder(row))
+
+    def name(self, i):
+        return self.rows[i][CHMTPickNPlace.idx[CHMTPickNPlace.partname]]
+
+    """
+    The reels a board's SMD parts need: {row: [parts]}, and the ids of any
+    parts that have no reel at all
+    """
+    def needs(self, parts):
+        needed  = {}
+        missing = set()
+        for p in parts.values():
+            if not p.smd:
+                continue
+            reel = self.reels.get(ComponentID.canonical(p.component()))
+            if reel is not None:
+                needed.setdefault(reel, []).append(p)
+            else:
+                missing.add(p.id)
+        return (needed, sorted(missing))
+
+    """
+    Plan a sequence of boards, given as (name, parts) tuples.
+
+    Returns a list with, for each board, a dict of
+        name        the board's name
+        rows        the feeder sheet rows as planned for the board
+        changes     (feeder, reel loaded, reel removed) tuples, in the order to make them
+        unplaced    reels it needs that could not be given a feeder
+        missing     part ids that are not on the feeder sheet at all
+    """
+    def plan(self, boards):
+        col   = CHMTPickNPlace.idx[CHMTPickNPlace.feedernum]
+        needs = [self.needs(parts) for (name, parts) in boards]
+
+        def nextUse(reel, after):
+            for k in range(after + 1, len(needs)):
+                if reel in needs[k][0]:
+                    return k
+            return NEVER
+
+        result = []
+        for (b, (name, parts)) in enumerate(boards):
+            (needed, missing) = needs[b]
+            mounted  = set(self.slots.values())
+            changes  = []
+            unplaced = []
+
+            # the most used reels get first pick of the feeders
+            for reel in sorted(needed, key=lambda r: (-len(needed[r]), r)):
+                if reel in mounted:
+                    continue
+                tape = self.rows[reel][CHMTPickNPlace.idx[CHMTPickNPlace.tapesize]].lower()
+                x = sum(p.x for p in needed[reel]) / len(needed[reel])
+                y = sum(p.y for p in needed[reel]) / len(needed[reel])
+                best = None
+                for (slot, occupant) in self.slots.items():
+                    if self.tape[slot] != tape or occupant in needed:
+                        continue
+                    (px, py) = self.position[slot]
+                    key = (-nextUse(occupant, b), math.hypot(px - x, py - y), slot)
+                    if best is None or key < best[0]:
+                        best = (key, slot, occupant)
+                if best is None:
+                    unplaced.append(self.name(reel))
+                    continue
+                (key, slot, occupant) = best
+                self.rows[occupant][col] = ""
+                self.rows[reel][col]     = slot
+                self.slots[slot]         = reel
+                mounted.discard(occupant)
+                mounted.add(reel)
+                changes.append((slot, self.name(reel), self.name(occupant)))
+
+            result.append({"name":     name,
+                           "rows":     [list(r) for r in self.rows],
+                           "changes":  changes,
+                           "unplaced": unplaced,
+                           "missing":  missing})
+        return result
+
+"""
+A printable summary of a plan
+"""
+def report(plan):
+    lines = ["Feeder plan: {} reel changes for {} boards".format(
+        sum(len(p["changes"]) for p in plan), len(plan))]
+    for p in plan:
+        lines.append("{}:".format(p["name"]))
+        for (slot, reel, removed) in p["changes"]:
+            lines.append("    feeder {:>3}: load {} (remove {})".format(slot, reel, removed))
+        for reel in p["unplaced"]:
+            lines.append("    no free feeder for {}".format(reel))
+        for pid in p["missing"]:
+            lines.append("    not on the feeder sheet: {}".format(pid))
+    return "\n".join(lines)
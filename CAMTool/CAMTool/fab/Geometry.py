@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Vectorized geometry for EAGLE CAD packages, libraries and boards
+
+Primitives are collected as plain tuples while a file is being read, and
+then packed into NumPy arrays, one row per primitive:
+
+    wires   x1, y1, x2, y2, width, layer, curve
+    boxes   x, y, half width, half height, rotation
+            (pads, smds, rectangles, circles and holes)
+    points  x, y
+            (polygon vertices)
+
+so the bounds of every package in a board or library can be found with a
+single reduction instead of a Python loop per wire.
+"""
+
+__version__ = "0.1"
+
+import math
+
+import numpy as np
+
+from CAMTool.fab import Rotation
+
+# a bounds array row
+XMIN, YMIN, XMAX, YMAX = 0, 1, 2, 3
+
+# the primitives addShape() knows about
+SHAPES = ("wire", "smd", "pad", "rectangle", "circle", "hole", "vertex")
+
+
+"""
+N may be either an XML node or an attribute dict
+"""
+def getWire(N):
+    return (float(N.get("x1")), float(N.get("y1")),
+            float(N.get("x2")), float(N.get("y2")),
+            float(N.get("width", "0")), int(N.get("layer")),
+            float(N.get("curve", "0")))
+
+def getAngle(N):
+    return Rotation.getAngle(N.get("rot", "R0"))
+
+"""
+EAGLE's default pad diameter when none is given: a 25% restring,
+clamped to 10..20 mil
+"""
+def padDiameter(drill):
+    return drill + 2 * min(max(drill * 0.25, 0.254), 0.508)
+
+"""
+Sort one package (or board) primitive into the wires, boxes or points
+lists, ignoring things that have no geometry of interest (text, etc).
+N is the primitive's XML node or attribute dict.
+"""
+def addShape(tag, N, wires, boxes, points):
+    if tag == "wire":
+        wires.append(getWire(N))
+    elif tag == "smd":
+        boxes.append((float(N.get("x")), float(N.get("y")),
+                      float(N.get("dx")) / 2, float(N.get("dy")) / 2, getAngle(N)))
+    elif tag == "pad":
+        drill    = float(N.get("drill", "0"))
+        diameter = float(N.get("diameter", "0")) or padDiameter(drill)
+        hx = hy  = diameter / 2
+        if N.get("shape") in ("long", "offset"):
+            hx = diameter
+        boxes.append((float(N.get("x")), float(N.get("y")), hx, hy, getAngle(N)))
+    elif tag == "rectangle":
+        (x1, y1) = (float(N.get("x1")), float(N.get("y1")))
+        (x2, y2) = (float(N.get("x2")), float(N.get("y2")))
+        boxes.append(((x1 + x2) / 2, (y1 + y2) / 2, abs(x2 - x1) / 2, abs(y2 - y1) / 2, getAngle(N)))
+    elif tag == "circle":
+        r = float(N.get("radius"))
+        boxes.append((float(N.get("x")), float(N.get("y")), r, r, 0.0))
+    elif tag == "hole":
+        r = float(N.get("drill")) / 2
+        boxes.append((float(N.get("x")), float(N.get("y")), r, r, 0.0))
+    elif tag == "vertex":
+        points.append((float(N.get("x")), float(N.get("y"))))
+
+def wireArray(wires):
+    return np.array(wires, dtype=float).reshape(-1, 7)
+
+def boxArray(boxes):
+    return np.array(boxes, dtype=float).reshape(-1, 5)
+
+def pointArray(points):
+    return np.array(points, dtype=float).reshape(-1, 2)
+
+def boundsArray(bounds):
+    return np.array(bounds, dtype=float).reshape(-1, 4)
+
+"""
+Per-wire bounds, including the bulge of arcs (wires with a curve)
+"""
+def wireBounds(wires):
+    (x1, y1, x2, y2) = (wires[:, 0], wires[:, 1], wires[:, 2], wires[:, 3])
+    b = np.column_stack((np.minimum(x1, x2), np.minimum(y1, y2),
+                         np.maximum(x1, x2), np.maximum(y1, y2)))
+
+    dx = x2 - x1
+    dy = y2 - y1
+    d  = np.hypot(dx, dy)
+    arc = (wires[:, 6] != 0) & (d > 0)
+    if not arc.any():
+        return b
+
+    c  = np.radians(wires[arc, 6])      # + is counterclockwise from (x1,y1) to (x2,y2)
+    (dx, dy, d) = (dx[arc], dy[arc], d[arc])
+    h  = (d / 2) / np.tan(c / 2)        # chord midpoint to center, to the left of the chord
+    cx = (x1[arc] + x2[arc]) / 2 - dy / d * h
+    cy = (y1[arc] + y2[arc]) / 2 + dx / d * h
+    r  = np.hypot(x1[arc] - cx, y1[arc] - cy)
+    start = np.arctan2(y1[arc] - cy, x1[arc] - cx)
+
+    a = b[arc]
+    # the arc reaches past its end points where it crosses 0, 90, 180 or 270 degrees
+    for (quadrant, column, px, py) in ((0, XMAX, 1, 0), (1, YMAX, 0, 1), (2, XMIN, -1, 0), (3, YMIN, 0, -1)):
+        theta = quadrant * np.pi / 2
+        swept = np.where(c > 0, (theta - start) % (2 * np.pi), (start - theta) % (2 * np.pi))
+        hit   = swept <= np.abs(c)
+        edge  = cx * abs(px) + cy * abs(py) + r * (px + py)
+        if column in (XMIN, YMIN):
+            a[:, column] = np.where(hit, np.minimum(a[:, column], edge), a[:, column])
+        else:
+            a[:, column] = np.where(hit, np.maximum(a[:, column], edge), a[:, column])
+    b[arc] = a
+    return b
+
+"""
+Split a wires array into groups drawn with the same pen: a list of
+(layer, width, wires), by layer and then width, each group's wires in
+their original order
+"""
+def wireGroups(wires):
+    if not len(wires):
+        return []
+    w = wires[np.lexsort((wires[:, 4], wires[:, 5]))]     # stable, so order within a group is kept
+    breaks = np.flatnonzero((w[1:, 4:6] != w[:-1, 4:6]).any(axis=1)) + 1
+    return [(int(g[0, 5]), float(g[0, 4]), g) for g in np.split(w, breaks)]
+
+"""
+The radius of each wire's arc (0 for straight wires)
+"""
+def arcRadius(wires):
+    chord = np.hypot(wires[:, 2] - wires[:, 0], wires[:, 3] - wires[:, 1])
+    half  = np.abs(np.sin(np.radians(wires[:, 6]) / 2))
+    return np.divide(chord / 2, half, out=np.zeros(len(wires)), where=half > 0)
+
+"""
+Points along a wire from (x1, y1) towards (x2, y2): just the start of a
+straight one, or enough of an arc that no chord strays from it by more
+than tolerance.  The end point is left for the next wire to start at.
+"""
+def arcPoints(x1, y1, x2, y2, curve, tolerance):
+    c = math.radians(curve)
+    d = math.hypot(x2 - x1, y2 - y1)
+    if not c or not d:
+        return np.array(((x1, y1),))
+    h  = (d / 2) / math.tan(c / 2)      # as in wireBounds()
+    cx = (x1 + x2) / 2 - (y2 - y1) / d * h
+    cy = (y1 + y2) / 2 + (x2 - x1) / d * h
+    r  = math.hypot(x1 - cx, y1 - cy)
+    step = 2 * math.acos(1 - tolerance / r) if r > tolerance else abs(c)
+    n  = max(1, int(math.ceil(abs(c) / step)))
+    t  = math.atan2(y1 - cy, x1 - cx) + c * np.arange(n) / n
+    return np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t)))
+
+"""
+Douglas-Peucker: the points of an (N, 2) polyline needed to keep it
+within tolerance of the original; a ring is closed through its first point
+"""
+def simplify(points, tolerance, ring=False):
+    if ring:
+        return simplify(np.vstack((points, points[:1])), tolerance)[:-1]
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    todo = [(0, n - 1)]
+    while todo:
+        (i, j) = todo.pop()
+        if j - i < 2:
+            continue
+        (a, b) = (points[i], points[j])
+        (dx, dy) = b - a
+        rest = points[i + 1:j] - a
+        length = math.hypot(dx, dy)
+        if length:
+            dist = np.abs(dx * rest[:, 1] - dy * rest[:, 0]) / length
+        else:
+            dist = np.hypot(rest[:, 0], rest[:, 1])
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            todo.extend(((i, k), (k, j)))
+    return points[keep]
+
+"""
+Per-box bounds of (possibly rotated) pads, smds, rectangles, circles and holes
+"""
+def boxBounds(boxes):
+    a  = np.radians(boxes[:, 4])
+    (c, s) = (np.abs(np.cos(a)), np.abs(np.sin(a)))
+    hx = c * boxes[:, 2] + s * boxes[:, 3]
+    hy = s * boxes[:, 2] + c * boxes[:, 3]
+    return np.column_stack((boxes[:, 0] - hx, boxes[:, 1] - hy,
+                            boxes[:, 0] + hx, boxes[:, 1] + hy))
+
+def pointBounds(points):
+    return np.column_stack((points, points))
+
+"""
+Reduce per-primitive bounds to per-owner bounds.
+Owners without any primitives get (inf, inf, -inf, -inf)
+"""
+def reduceBounds(owners, bounds, count):
+    lo = np.full((count, 2),  np.inf)
+    hi = np.full((count, 2), -np.inf)
+    np.minimum.at(lo, owners, bounds[:, 0:2])
+    np.maximum.at(hi, owners, bounds[:, 2:4])
+    return np.hstack((lo, hi))
+
+"""
+Overall bounds of a set of wires, boxes and points, or None if empty
+"""
+def bounds(wires=None, boxes=None, points=None):
+    parts = []
+    if wires is not None and len(wires):
+        parts.append(wireBounds(wires))
+    if boxes is not None and len(boxes):
+        parts.append(boxBounds(boxes))
+    if points is not None and len(points):
+        parts.append(pointBounds(points))
+    if not parts:
+        return None
+    b = np.vstack(parts)
+    return (float(b[:, XMIN].min()), float(b[:, YMIN].min()),
+            float(b[:, XMAX].max()), float(b[:, YMAX].max()))
+
+"""
+Pack the shapes of many packages, and find all their bounds in one pass.
+
+shapes is a list of (wires, boxes, points) lists, one per package; each
+kind is packed into a single array for the whole set, and the returned
+list has each package's (wires, boxes, points) as views into those arrays.
+The returned bounds have one (xmin, ymin, xmax, ymax) row per package;
+packages without any geometry get (10000, 10000, -10000, -10000).
+"""
+def packShapes(shapes):
+    count  = len(shapes)
+    owners  = []
+    extents = []
+    views   = [[] for s in shapes]
+    for (kind, toArray, toBounds) in ((0, wireArray,  wireBounds),
+                                       (1, boxArray,   boxBounds),
+                                       (2, pointArray, pointBounds)):
+        lengths = [len(s[kind]) for s in shapes]
+        rows    = toArray([row for s in shapes for row in s[kind]])
+        ends    = np.cumsum(lengths)
+        for (v, end, n) in zip(views, ends, lengths):
+            v.append(rows[end - n:end])
+        owners.append(np.repeat(np.arange(count), lengths))
+        extents.append(toBounds(rows))
+
+    b = reduceBounds(np.concatenate(owners), np.vstack(extents), count)
+    empty = b[:, XMIN] > b[:, XMAX]
+    b[empty] = (10000, 10000, -10000, -10000)
+    return (views, b)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+A byte offset index for EAGLE CAD libraries
+
+SPCoast.lbr has hundreds of packages, symbols and devicesets, and most
+callers only want a few of them.  This keeps a sidecar file next to the
+library (SPCoast.lbr.idx) that maps each package, symbol and deviceset
+name to the byte range of its XML, so a single entry can be read from a
+mmap of the library and parsed on its own.
+
+The sidecar is rebuilt whenever the library's size or mtime changes; if
+it can not be written (read only directory...) the index is simply kept
+in memory.
+
+A LibraryIndex holds the library open until it is closed, or until the
+end of a with block:
+
+    with LibraryIndex(libname) as library:
+        node = library.getNode("package", "0603-RES")
+"""
+
+__version__ = "0.1"
+
+from xml.etree import ElementTree
+from xml.sax.saxutils import unescape
+
+import json
+import mmap
+import os
+import os.path
+import re
+import tempfile
+
+INDEX_VERSION = 1
+SUFFIX        = ".idx"
+KINDS         = ("package", "symbol", "deviceset")
+
+# <package name="0603-RES">  ... </package>   (or <package name="X"/>)
+_start = re.compile(rb'<(package|symbol|deviceset)\s[^>]*?name="([^"]*)"[^>]*?(/?)>')
+
+
+def indexfilename(libname):
+    return libname + SUFFIX
+
+"""
+Scan the library for the start and end of every package, symbol and deviceset.
+Returns {kind: {lowercase name: [start, end, name]}}
+"""
+def scanLibrary(data):
+    ranges = dict((kind, {}) for kind in KINDS)
+    pos = 0
+    while True:
+        m = _start.search(data, pos)
+        if m is None:
+            break
+        kind = m.group(1).decode()
+        name = unescape(m.group(2).decode('utf-8'), {"&quot;": '"', "&apos;": "'"})
+        if m.group(3):
+            end = m.end()
+        else:
+            close = "</{}>".format(kind).encode()
+            end = data.find(close, m.end())
+            if end < 0:
+                break
+            end += len(close)
+        ranges[kind][name.lower()] = [m.start(), end, name]
+        pos = end
+    return ranges
+
+class LibraryIndex(object):
+    def __init__(self, libname):
+        self.filename = libname
+        self._file    = open(libname, 'rb')
+        self._map     = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.ranges   = self._loadRanges()
+
+    def _loadRanges(self):
+        st = os.stat(self.filename)
+        stamp = [INDEX_VERSION, st.st_size, st.st_mtime]
+        idx = indexfilename(self.filename)
+        try:
+            with open(idx, 'r') as f:
+                saved = json.load(f)
+            if saved.get("stamp") == stamp:
+                return saved["ranges"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        ranges = scanLibrary(self._map)
+        tmp = None
+        try:
+            (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(idx)), suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"stamp": stamp, "ranges": ranges}, f)
+            os.replace(tmp, idx)
+        except OSError:
+            # no sidecar, use the in-memory index
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+        return ranges
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    """
+    The (original case) names of all the entries of a kind
+    """
+    def names(self, kind):
+        return [r[2] for r in self.ranges[kind].values()]
+
+    def has(self, kind, name):
+        return name.lower() in self.ranges[kind]
+
+    """
+    Parse just one entry from the library, returning its XML node
+    """
+    def getNode(self, kind, name):
+        (start, end, realname) = self.ranges[kind][name.lower()]
+        return ElementTree.fromstring(self._map[start:end])
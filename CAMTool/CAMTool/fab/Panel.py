@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Recognize panelized (_array) boards, so the CHMT can be given one board's
+placements and a Panel_Array record instead of every copy's parts.
+
+ulp/make-panel.ulp writes a <project>_array.scr script that builds the
+panel; each copy of an element is added with its row and column appended
+to its name (R1 => R1x11, R1x12, R1x21 ...), at
+
+    (origin x + (column - 1) * spacing x,  origin y + (row - 1) * spacing y)
+
+add 0603-RES@SPCoast R1x21 R90.000000 (2500.000000 1300.000000);
+
+The columns, rows and spacing are worked out from the positions of those
+copies, taken from the script when there is one next to the board, or
+from the board's own elements otherwise.
+
+Boards are numbered along X first, from the panel's origin: in a 2x2
+panel, board 2 is column 2 of row 1.  Copies that were deleted from the
+panel (all of a board's parts missing) are treated as X'd out.
+"""
+
+__version__ = "0.1"
+
+from CAMTool.fab import CHMTPickNPlace
+
+import copy
+import math
+import os.path
+import re
+
+SUFFIX    = "_array"
+TOLERANCE = 0.01        # mm
+
+_copy = re.compile(r'^(?P<base>.+)x(?P<cell>\d\d+)$')
+_add  = re.compile(r'^\s*add\s+\S+@\S+\s+(?P<name>\S+)\s+\S*R[-+.\d]+\s+'
+                   r'\(\s*(?P<x>[-+.\d]+)\s+(?P<y>[-+.\d]+)\s*\)\s*;', re.IGNORECASE)
+
+MM_PER_MIL = 0.0254
+
+
+class Panel(object):
+    __slots__ = ("columns", "rows", "dx", "dy", "cells", "boards", "template")
+
+    def __init__(self, columns, rows, dx, dy, cells):
+        self.columns  = columns
+        self.rows     = rows
+        self.dx       = dx
+        self.dy       = dy
+        self.cells    = cells           # element name => (column, row), from 0
+        self.boards   = sorted(set(self.number(c, r) for (c, r) in cells.values()))
+        self.template = self.number(*min(cells.values(), key=lambda cr: self.number(*cr)))
+
+    def number(self, column, row):
+        return row * self.columns + column + 1
+
+    """
+    Boards with no parts at all
+    """
+    def missing(self):
+        return [n for n in range(1, self.columns * self.rows + 1) if n not in self.boards]
+
+    """
+    The parts of a single board, moved to the panel's first board position,
+    or None if any placed part is not one of the panel's copies
+    """
+    def single(self, parts):
+        single = {}
+        for p in parts.values():
+            if p.name not in self.cells:
+                if p.feeder not in (CHMTPickNPlace.SKIP, CHMTPickNPlace.NOTFOUND):
+                    return None
+                continue
+            (c, r) = self.cells[p.name]
+            if self.number(c, r) != self.template:
+                continue
+            p = copy.copy(p)
+            p.x -= c * self.dx
+            p.y -= r * self.dy
+            single[p.name] = p
+        return single
+
+"""
+Work out the panel from (name, x, y) element placements, in mm.
+Returns None if they don't look like a panel of copies.
+"""
+def fromPlacements(placements):
+    groups = {}
+    for (name, x, y) in placements:
+        m = _copy.match(name)
+        if m:
+            groups.setdefault(m.group("base"), []).append((name, x, y))
+    if not groups:
+        return None
+
+    # the spacing is the smallest distance between two copies of an element
+    def spacing(axis):
+        steps = []
+        for members in groups.values():
+            values = sorted(set(round(m[axis], 3) for m in members))
+            steps.extend(b - a for (a, b) in zip(values, values[1:]) if b - a > TOLERANCE)
+        return min(steps) if steps else 0.0
+    dx = spacing(1)
+    dy = spacing(2)
+    if dx == 0 and dy == 0:
+        return None
+
+    # every copy of a board lies within one spacing of the panel's first element
+    x0 = min(x for members in groups.values() for (n, x, y) in members)
+    y0 = min(y for members in groups.values() for (n, x, y) in members)
+    def cell(v, v0, d):
+        return int(math.floor((v - v0) / d + TOLERANCE)) if d else 0
+
+    cells = {}
+    used  = set()
+    for members in groups.values():
+        ox   = []
+        oy   = []
+        seen = set()
+        for (name, x, y) in members:
+            (c, r) = (cell(x, x0, dx), cell(y, y0, dy))
+            if (c, r) in seen:
+                return None
+            seen.add((c, r))
+            cells[name] = (c, r)
+            ox.append(x - c * dx)
+            oy.append(y - r * dy)
+        if max(ox) - min(ox) > TOLERANCE or max(oy) - min(oy) > TOLERANCE:
+            return None         # the copies are not on a grid
+        used.add(frozenset(seen))
+
+    # a board is either all there, or not there at all
+    if len(used) != 1:
+        return None
+    columns = max(c for (c, r) in cells.values()) + 1
+    rows    = max(r for (c, r) in cells.values()) + 1
+    if columns * rows < 2:
+        return None
+    return Panel(columns, rows, dx, dy, cells)
+
+"""
+The elements a make-panel.ulp script adds, as (name, x, y) in mm
+"""
+def readScript(scriptname):
+    placements = []
+    with open(scriptname, 'r') as script:
+        for line in script:
+            m = _add.match(line)
+            if m:
+                placements.append((m.group("name"),
+                                   float(m.group("x")) * MM_PER_MIL,
+                                   float(m.group("y")) * MM_PER_MIL))
+    return placements
+
+def scriptfilename(boardname):
+    return os.path.splitext(boardname)[0] + ".scr"
+
+"""
+The Panel for an _array board, or None
+"""
+def detect(boardname, eagleBoard):
+    if not os.path.splitext(boardname)[0].endswith(SUFFIX):
+        return None
+    script = scriptfilename(boardname)
+    if os.path.isfile(script):
+        placements = readScript(script)
+    else:
+        placements = [(e["name"], float(e.get("x", "0")), float(e.get("y", "0")))
+                      for e in eagleBoard.elements.values()]
+    return fromPlacements(placements)
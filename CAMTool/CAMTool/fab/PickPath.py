@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Order the placements of a CHMT pick-n-place job to cut down on head travel
+
+In designator order (C1 C2 ... R1 R2 ...) the head zig-zags across the
+board, and back and forth between feeders.  Each placement is a trip from
+wherever the head is to the part's feeder, and then on to where the part
+goes; the order here comes from a nearest neighbour tour over those trips,
+improved with 2-opt (reversing runs of placements while that shortens the
+total).
+
+Parts are kept in groups by the feeder sheet's Head column, each group
+placed in one go, in head order.
+
+A feeder's pick position comes from its Feeder Number and the layout of
+the machine's feeders (see configure()), moved by the feeder sheet's
+Feeder XOffset and Feeder YOffset (the DeltX/DeltY pick corrections).
+The head is assumed to start at the board's origin.  Distances are
+straight lines in mm; they are an estimate of head travel for comparing
+orders, not a prediction of machine time.
+"""
+
+__version__ = "0.1"
+
+import numpy as np
+
+# 2-opt stops after this many passes without reaching a local minimum
+MAXPASSES = 50
+
+# where the feeders are, in mm from the board's origin: feeder 1's pick
+# position, and the spacing from one feeder to the next along X.  Only a
+# rough guess at a CHMT36 with the board at the front of its table.
+feederx     = 0.0
+feedery     = -50.0
+feederpitch = 10.0
+
+
+"""
+Pick up the feeder layout from the [chmt] section of EagleTools.cfg:
+
+    feederx:        where feeder 1 picks from, in mm from the board's origin
+    feedery:
+    feederpitch:    mm from one feeder to the next, along X
+"""
+def configure(configuration):
+    global feederx, feedery, feederpitch
+    section = 'chmt'
+    if configuration.has_option(section, 'feederx'):
+        feederx     = configuration.getfloat(section, 'feederx')
+    if configuration.has_option(section, 'feedery'):
+        feedery     = configuration.getfloat(section, 'feedery')
+    if configuration.has_option(section, 'feederpitch'):
+        feederpitch = configuration.getfloat(section, 'feederpitch')
+
+"""
+Where the head picks a Feeder's parts: its place in the row of feeders,
+moved by the feeder sheet's XOffset and YOffset
+"""
+def pickPosition(f):
+    return (feederx + (f.station - 1) * feederpitch + f.xOffset, feedery + f.yOffset)
+
+def getHead(f):
+    return f.head
+
+"""
+Trip lengths between placements:
+
+    costs[q, p]   from placing q to placing p (via p's feeder)
+    start[p]      from (x, y) to placing p
+"""
+def tripCosts(picks, places, x=0.0, y=0.0):
+    place2pick = np.hypot(places[:, None, 0] - picks[None, :, 0],
+                          places[:, None, 1] - picks[None, :, 1])
+    pick2place = np.hypot(places[:, 0] - picks[:, 0], places[:, 1] - picks[:, 1])
+    costs = place2pick + pick2place
+    start = np.hypot(picks[:, 0] - x, picks[:, 1] - y) + pick2place
+    return (costs, start)
+
+def tourLength(tour, costs, start):
+    if not len(tour):
+        return 0.0
+    tour = np.asarray(tour)
+    return float(start[tour[0]] + costs[tour[:-1], tour[1:]].sum())
+
+def nearestNeighbour(costs, start):
+    n       = len(start)
+    visited = np.zeros(n, dtype=bool)
+    tour    = []
+    reach   = start
+    for k in range(n):
+        nxt = int(np.argmin(np.where(visited, np.inf, reach)))
+        tour.append(nxt)
+        visited[nxt] = True
+        reach = costs[nxt]
+    return tour
+
+"""
+Improve an (open, directed) tour by reversing runs of it, while any
+reversal makes it shorter.  Trips are not symmetric (a placement's feeder
+is visited on the way to it), so both directions of each run are summed.
+"""
+def twoOpt(tour, costs, start):
+    tour = np.array(tour, dtype=int)
+    n    = len(tour)
+    if n < 3:
+        return tour.tolist()
+
+    for passes in range(MAXPASSES):
+        improved = False
+        for i in range(n - 1):
+            while True:
+                # forward and backward trip lengths along the tour, as prefix sums
+                fwd = np.concatenate(([0.0], np.cumsum(costs[tour[:-1], tour[1:]])))
+                bwd = np.concatenate(([0.0], np.cumsum(costs[tour[1:], tour[:-1]])))
+
+                js = np.arange(i + 1, n)
+                ti = tour[i]
+                tj = tour[js]
+                if i == 0:
+                    delta = start[tj] - start[ti]
+                else:
+                    delta = costs[tour[i - 1], tj] - costs[tour[i - 1], ti]
+                delta = delta + (bwd[js] - bwd[i]) - (fwd[js] - fwd[i])
+                after = tour[js[:-1] + 1]
+                delta[:-1] += costs[ti, after] - costs[tj[:-1], after]
+
+                j = int(np.argmin(delta))
+                if delta[j] >= -1e-9:
+                    break
+                j = int(js[j])
+                tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return tour.tolist()
+
+"""
+Reorder parts (Part objects with a feeder) for less head travel.
+
+Returns (ordered parts, travel before, travel after), the travel in mm
+for the order given and for the new order.  The tour is only better than
+nearest neighbour, not optimal, so if it is no shorter than the order
+given, that order is kept.
+"""
+def optimize(parts, feeder, x=0.0, y=0.0):
+    parts = list(parts)
+    if not parts:
+        return (parts, 0.0, 0.0)
+
+    picks  = np.array([pickPosition(feeder[p.feeder]) for p in parts], dtype=float)
+    places = np.array([(p.x, p.y) for p in parts], dtype=float)
+    heads  = [getHead(feeder[p.feeder]) for p in parts]
+
+    before = travel(picks, places, range(len(parts)), x, y)
+
+    order = []
+    (hx, hy) = (x, y)
+    for h in sorted(set(heads)):
+        group = np.array([i for i in range(len(parts)) if heads[i] == h], dtype=int)
+        (costs, start) = tripCosts(picks[group], places[group], hx, hy)
+        tour = twoOpt(nearestNeighbour(costs, start), costs, start)
+        order.extend(group[tour].tolist())
+        (hx, hy) = places[order[-1]]
+
+    after = travel(picks, places, order, x, y)
+    if after >= before:
+        return (parts, before, before)
+    return ([parts[i] for i in order], before, after)
+
+"""
+Head travel, in mm, placing the parts in the given order starting from (x, y)
+"""
+def travel(picks, places, order, x=0.0, y=0.0):
+    order = list(order)
+    if not order:
+        return 0.0
+    (costs, start) = tripCosts(picks, places, x, y)
+    return tourLength(order, costs, start)
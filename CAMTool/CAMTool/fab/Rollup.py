@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+Roll the BOMs of several boards, each built some number of times, up
+into one purchase BOM (eagle2bom --rollup)
+
+The build plan is a csv file of board files and how many of each are
+being built; a quantity of an _array board is a number of panels, each
+with every copy's parts on it:
+
+    # board,                      quantity
+    signals/signals.brd,           10
+    turnout/turnout_array.brd,     5
+
+Board files are relative to the plan.  Lines starting with # are
+comments, and a missing quantity is 1.
+
+Each board's BOM (see BOM.aggregate()) is made once, however many times
+it is built; the totals are per canonical component (see ComponentID),
+along with the length of tape they use up on their feeder's reel.
+"""
+
+__version__ = "0.1"
+
+from CAMTool.fab import BOM, CHMTPickNPlace, ComponentID, EagleCAD
+
+import collections
+import csv
+import os.path
+
+
+class Total(collections.namedtuple("Total", ("id", "value", "package", "library", "feeder",
+                                             "quantity", "tape", "boards"))):
+    """
+    A component's total over the build plan: quantity parts, using tape
+    mm of reel (0 if it isn't on a feeder), placed on boards, a tuple of
+    (board, parts per board, boards built) tuples
+    """
+    __slots__ = ()
+
+    @property
+    def feederName(self):
+        return BOM.feederName(self.feeder)
+
+    @property
+    def smd(self):
+        return self.feeder != CHMTPickNPlace.SKIP
+
+"""
+The build plan, as a list of (board file, quantity), each board once
+"""
+def readPlan(planfilename):
+    plandir = os.path.dirname(planfilename)
+    plan    = {}
+    with open(planfilename, 'r') as planfile:
+        for row in csv.reader(planfile):
+            row = [c.strip() for c in row]
+            if not row or not row[0] or row[0].startswith('#'):
+                continue
+            board = os.path.join(plandir, row[0])
+            try:
+                quantity = int(row[1]) if len(row) > 1 and row[1] else 1
+            except ValueError:
+                raise ValueError("{}: quantity for {} is not a number: {!r}".format(
+                    planfilename, row[0], row[1])) from None
+            plan[board] = plan.get(board, 0) + quantity
+    return list(plan.items())
+
+"""
+The purchase BOM for a build plan: boms is a list of (board, quantity,
+BOM) tuples, feeder the feeder dict the BOMs were made with.
+
+Returns a tuple of Totals, in the natural order of their ids.
+"""
+def rollup(boms, feeder):
+    totals = {}
+    for (board, quantity, bom) in boms:
+        for line in bom:
+            key = ComponentID.canonical(line.value + "-" + line.package)
+            if key not in totals:
+                totals[key] = [line, 0, []]
+            totals[key][1] += line.count * quantity
+            totals[key][2].append((board, line.count, quantity))
+
+    result = []
+    for (line, quantity, boards) in totals.values():
+        tape = 0
+        if line.feeder in feeder:
+            tape = quantity * feeder[line.feeder].pullDist
+        result.append(Total(line.id, line.value, line.package, line.library, line.feeder,
+                            quantity, tape, tuple(boards)))
+    return tuple(sorted(result, key=lambda t: EagleCAD.natural_sort_key(t.id)))
+
+"""
+The totals for each feeder: a list of (feeder, quantity, tape, [Totals]),
+in feeder order
+"""
+def byFeeder(totals):
+    feeders = {}
+    for t in totals:
+        if t.feeder in (CHMTPickNPlace.SKIP, CHMTPickNPlace.NOTFOUND):
+            continue
+        feeders.setdefault(t.feeder, []).append(t)
+    return [(f, sum(t.quantity for t in ts), sum(t.tape for t in ts), ts)
+            for (f, ts) in sorted(feeders.items(), key=lambda ft: (len(ft[0]), ft[0]))]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+EAGLE CAD rotation strings, and the placement transforms they describe
+
+    [S][M]Rnnn
+
+    S    sets the Spin flag, which disable keeping texts readable from the bottom or right side of the drawing (only available in a board context)
+    M    sets the Mirror flag, which mirrors the object about the y-axis
+    Rnnn sets the Rotation to the given value, which may be in the range 0.0...359.9 (at a resolution of 0.1 degrees) in a board context, or one of 0, 90, 180 or 270 in a schematic context (angles may be given as negative values, which will be converted to the corresponding positive value)
+
+    The key letters S, M and R may be given in upper- or lowercase, and there must be at least R followed by a number.
+    A bare number (rot="90") is read as if it had the R.
+
+    R0      no rotation
+    R90     rotated 90 counterclockwise
+    R-90    rotated 90 clockwise (will be converted to 270)
+    MR0     mirrored about the y-axis
+    SR0     spin texts
+    SMR33.3 rotated 33.3 counterclockwise, mirrored and spin texts
+
+A board only uses a handful of distinct rotation strings, so parsed
+Rotations are memoized and shared by every element, pad and text using them.
+"""
+
+__version__ = "0.1"
+
+from functools import lru_cache
+
+import math
+import re
+
+import numpy as np
+
+_rot = re.compile(r'^\s*([SM]*)R?([-+]?(?:\d+\.?\d*|\.\d+))\s*$', re.IGNORECASE)
+
+
+class Rotation(object):
+    __slots__ = ("text", "angle", "mirror", "spin", "matrix")
+
+    def __init__(self, text, angle, mirror, spin):
+        self.text   = text
+        self.angle  = angle     # degrees counterclockwise, 0 <= angle < 360
+        self.mirror = mirror
+        self.spin   = spin
+
+        # mirror about the y-axis first, then rotate
+        a = math.radians(angle)
+        (c, s) = (math.cos(a), math.sin(a))
+        m = -1.0 if mirror else 1.0
+        self.matrix = np.array(((c * m, -s),
+                                (s * m,  c)))
+        self.matrix.setflags(write=False)
+
+    def __repr__(self):
+        return "Rotation({!r})".format(self.text)
+
+    """
+    The transform that places a package's (or symbol's) coordinates at (x, y)
+    """
+    def at(self, x=0.0, y=0.0):
+        return Transform(self, float(x), float(y))
+
+class Transform(object):
+    __slots__ = ("rotation", "x", "y")
+
+    def __init__(self, rotation, x, y):
+        self.rotation = rotation
+        self.x        = x
+        self.y        = y
+
+    """
+    Transform an (N, 2) array (or any (..., 2) array) of x, y points
+    """
+    def apply(self, points):
+        points = np.asarray(points, dtype=float)
+        return points @ self.rotation.matrix.T + (self.x, self.y)
+
+    """
+    The axis aligned (xmin, ymin, xmax, ymax) bounds of transformed
+    (N, 4) bounds rows
+    """
+    def applyBounds(self, bounds):
+        bounds  = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        corners = np.stack((bounds[:, [0, 1]], bounds[:, [2, 1]],
+                            bounds[:, [0, 3]], bounds[:, [2, 3]]), axis=1)
+        corners = self.apply(corners)
+        return np.hstack((corners.min(axis=1), corners.max(axis=1)))
+
+"""
+Transform an (N, 2) array of points by each of a list of Transforms at
+once, giving an (len(transforms), N, 2) array
+"""
+def applyAll(transforms, points):
+    matrices = np.stack([T.rotation.matrix for T in transforms])
+    offsets  = np.array([(T.x, T.y) for T in transforms], dtype=float)
+    return np.einsum('nj,eij->eni', np.asarray(points, dtype=float), matrices) + offsets[:, None, :]
+
+"""
+Parse a rotation string; an empty (or missing) rotation is R0.
+Raises ValueError for anything that isn't [S][M]Rnnn (or [S][M]nnn)
+"""
+@lru_cache(maxsize=None)
+def parse(text):
+    if text is None or text.strip() == "":
+        return Rotation("R0", 0.0, False, False)
+    m = _rot.match(text)
+    if m is None:
+        raise ValueError("Invalid EAGLE rotation: {!r}".format(text))
+    flags = m.group(1).upper()
+    angle = float(m.group(2)) % 360.0
+    return Rotation(text, angle, "M" in flags, "S" in flags)
+
+def getAngle(text):
+    return parse(text).angle
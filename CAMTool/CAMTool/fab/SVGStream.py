@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+A minimal streaming SVG writer for eagle2svg
+
+svgwrite builds the whole drawing in memory and, with debug=True, checks
+every attribute of every element as it is added; a panel with tens of
+thousands of wires spends most of its time there.  Writer instead writes
+each element straight to the (buffered) output as it is made, with the
+format strings below, so nothing is kept around.
+
+It writes just what eagle2svg needs - a style sheet, then <rect>, <g>,
+<path> and <text> elements - in the same markup as svgwrite, so the two
+can be compared.  Validator has the same methods but builds an
+svgwrite.Drawing(debug=True), for checking the output (eagle2svg
+--validate); svgwrite is only needed for that.
+
+Everything on a layer is drawn with a few paths: all the wires with the
+same width are one <path>, straight wires as L and arcs as A segments,
+with the layer's color coming from a CSS class (see pathData()), and all
+its filled shapes another (see ringData() and discData()).  A run of
+wires that join end to end, like a board outline, is one subpath.
+"""
+
+__version__ = "0.1"
+
+import functools
+from xml.sax.saxutils import escape
+
+from CAMTool.fab import Geometry
+
+XMLDECL = '<?xml version="1.0" encoding="utf-8" ?>\n'
+SVG     = ('<svg baseProfile="full" height="{}" version="1.1" viewBox="{:.6g},{:.6g},{:.6g},{:.6g}" '
+           'width="{}" xmlns="http://www.w3.org/2000/svg" xmlns:ev="http://www.w3.org/2001/xml-events" '
+           'xmlns:xlink="http://www.w3.org/1999/xlink">').format
+STYLE   = '<defs><style type="text/css"><![CDATA[{}]]></style></defs>'.format
+RECT    = '<rect fill="{}" height="{:.6g}" width="{:.6g}" x="{:.6g}" y="{:.6g}" />'.format
+GROUP   = '<g class="{}">'.format
+MOVED   = '<g transform="{}">'.format
+PATH    = '<path class="{}" d="{}" />'.format
+STROKE  = '<path class="{}" d="{}" stroke-width="{}" />'.format
+TEXT    = ('<text class="{}" dominant-baseline="{}" font-size="{:.6g}" text-anchor="{}" '
+           'transform="{}">{}</text>').format
+
+# path data; 6 significant digits is well under a micron on any board
+NUMBER  = '{:.6g}'.format
+MOVE    = 'M{:.6g} {:.6g}'.format
+LINE    = 'L{:.6g} {:.6g}'.format
+ARC     = 'A{0:.6g} {0:.6g} 0 {1:d} {2:d} {3:.6g} {4:.6g}'.format
+DISC    = 'M{:.6g} {:.6g}A{r:.6g} {r:.6g} 0 1 1 {:.6g} {:.6g}A{r:.6g} {r:.6g} 0 1 1 {:.6g} {:.6g}Z'.format
+
+
+"""
+The stroke color for an Eagle palette entry, as read by EagleCAD.getLayers()
+("AARRGGBB" => "rgb(R,G,B)")
+"""
+@functools.lru_cache(maxsize=None)
+def rgb(color_with_alpha):
+    return "rgb({},{},{})".format(int(color_with_alpha[2:4], 16),
+                                  int(color_with_alpha[4:6], 16),
+                                  int(color_with_alpha[6:8], 16))
+
+"""
+The d attribute of a path drawing a Geometry wires array (one group from
+Geometry.wireGroups()).  An EAGLE curve is the angle swept from the
+first end to the second, counterclockwise if positive; in SVG that is
+the sweep flag, as the coordinates are written unchanged.
+"""
+def pathData(wires):
+    radius = Geometry.arcRadius(wires).tolist()
+    d      = []
+    pen    = None
+    for ((x1, y1, x2, y2, width, layer, curve), r) in zip(wires.tolist(), radius):
+        start = MOVE(x1, y1)
+        if start[1:] != pen:
+            d.append(start)
+        if r:
+            d.append(ARC(r, abs(curve) > 180, curve > 0, x2, y2))
+        else:
+            d.append(LINE(x2, y2))
+        pen = MOVE(x2, y2)[1:]
+    return ''.join(d)
+
+"""
+The d attribute drawing rings, a list of (layers, points) batches with
+points an (N, K, 2) array (see Artwork)
+"""
+def ringData(rings):
+    d = []
+    for (layers, points) in rings:
+        (n, k) = points.shape[0:2]
+        ring = ('M{:.6g} {:.6g}' + 'L{:.6g} {:.6g}' * (k - 1) + 'Z').format
+        d.extend(ring(*row) for row in points.reshape(n, 2 * k).tolist())
+    return ''.join(d)
+
+"""
+The d attribute drawing circles, rows of x, y, radius, ... (each as two
+counterclockwise half circles, like the rings)
+"""
+def discData(discs):
+    return ''.join(DISC(x - r, y, x + r, y, x - r, y, r=r) for (x, y, r) in discs[:, 0:3].tolist())
+
+class Writer(object):
+    """
+    writer = Writer(output, width, height, (x, y, width, height))
+    writer.style(styles)
+    writer.rect(...)
+    writer.group(cls); writer.path(...); writer.text(...); writer.endGroup()
+    writer.close()
+
+    output is a text file; the elements are written to it as they come.
+    """
+    __slots__ = ("write",)
+
+    def __init__(self, output, width, height, viewbox):
+        self.write = output.write
+        self.write(XMLDECL)
+        self.write(SVG(height, *viewbox, width))
+
+    def style(self, styles):
+        self.write(STYLE(styles))
+
+    def rect(self, insert, size, fill):
+        self.write(RECT(fill, size[1], size[0], insert[0], insert[1]))
+
+    def group(self, cls=None, transform=None):
+        self.write(GROUP(cls) if cls else MOVED(transform))
+
+    def endGroup(self):
+        self.write('</g>')
+
+    def path(self, d, cls, width=None):
+        if width is None:
+            self.write(PATH(cls, d))
+        else:
+            self.write(STROKE(cls, d, NUMBER(width)))
+
+    def text(self, value, cls, size, transform, anchor, baseline):
+        self.write(TEXT(cls, baseline, size, anchor, transform, escape(value)))
+
+    def close(self):
+        self.write('</svg>')
+
+class Validator(object):
+    """
+    The same drawing as Writer, made with svgwrite and its validator, and
+    written to output by close()
+    """
+    __slots__ = ("output", "dwg", "containers")
+
+    def __init__(self, output, width, height, viewbox):
+        import svgwrite
+        self.output     = output
+        self.dwg        = svgwrite.Drawing(size=(width, height), debug=True)
+        self.dwg.viewbox(*(NUMBER(n) for n in viewbox))
+        self.containers = [self.dwg]
+
+    def style(self, styles):
+        self.dwg.defs.add(self.dwg.style(styles))
+
+    def rect(self, insert, size, fill):
+        self.containers[-1].add(self.dwg.rect(insert=tuple(NUMBER(n) for n in insert),
+                                              size=tuple(NUMBER(n) for n in size), fill=fill))
+
+    def group(self, cls=None, transform=None):
+        g = self.dwg.g(class_=cls) if cls else self.dwg.g(transform=transform)
+        self.containers[-1].add(g)
+        self.containers.append(g)
+
+    def endGroup(self):
+        self.containers.pop()
+
+    def path(self, d, cls, width=None):
+        if width is None:
+            self.containers[-1].add(self.dwg.path(d=d, class_=cls))
+        else:
+            self.containers[-1].add(self.dwg.path(d=d, class_=cls, stroke_width=NUMBER(width)))
+
+    def text(self, value, cls, size, transform, anchor, baseline):
+        self.containers[-1].add(self.dwg.text(value, class_=cls, font_size=NUMBER(size), transform=transform,
+                                              text_anchor=anchor, dominant_baseline=baseline))
+
+    def close(self):
+        self.dwg.write(self.output)
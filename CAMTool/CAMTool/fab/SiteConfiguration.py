@@ -11,6 +11,9 @@ Site Defaults
 __version__ = "0.1"
 
 DefaultConfigFile = '~/EagleTools.cfg'
+DefaultCacheDir   = '~/.cache/CAMTool/boards'  # parsed boards, see BoardCache.py
+DefaultCacheSize  = 256                        # MB
+DefaultCacheAge   = 30                         # days
 # #DefaultOrdersDirectory = '~/Dropbox/eagle/Seeed-Orders/CurrentOrder'
 #
 # spreadsheet_key   = '1HuY1-9Z5yyQwUiivPqE5rH7m6A_Cvw6qmvkwXvpyZ-k'  # - this is the default public key for John's
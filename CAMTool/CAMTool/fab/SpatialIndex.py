@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+"""
+Author: John Plocher, 2019
+URL:    www.SPCoast.com
+License: Python Software Foundation License
+
+A uniform grid over axis aligned bounding boxes
+
+Questions like "which parts are under this fiducial", "what is inside this
+panel cell" or "which pads are within 0.2mm of each other" only need to
+look at the few grid cells near the area of interest instead of at every
+element on the board.
+
+Each item is stored with its (xmin, ymin, xmax, ymax) bounds, and is
+listed in every grid cell those bounds touch.  Queries return the items
+themselves (element names, (element, pad) names, ...), in the order the
+items were given.
+"""
+
+__version__ = "0.1"
+
+import math
+
+import numpy as np
+
+
+# the cells ring steps away from (col, row)
+def _ring(col, row, ring):
+    if ring == 0:
+        return [(col, row)]
+    cells = []
+    for c in range(col - ring, col + ring + 1):
+        cells.append((c, row - ring))
+        cells.append((c, row + ring))
+    for r in range(row - ring + 1, row + ring):
+        cells.append((col - ring, r))
+        cells.append((col + ring, r))
+    return cells
+
+class SpatialIndex(object):
+    """
+    bounds is an (N, 4) array of xmin, ymin, xmax, ymax rows, items the
+    N things they belong to.  cell is the grid spacing; by default it is
+    chosen so that an average item touches only a few cells.
+    """
+    def __init__(self, bounds, items, cell=None):
+        self.bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        self.items  = list(items)
+        self.grid   = {}
+
+        n = len(self.items)
+        if n == 0:
+            (self.x0, self.y0, self.cell) = (0.0, 0.0, 1.0)
+            self.cols = self.rows = 0
+            return
+
+        self.x0 = float(self.bounds[:, 0].min())
+        self.y0 = float(self.bounds[:, 1].min())
+        width   = float(self.bounds[:, 2].max()) - self.x0
+        height  = float(self.bounds[:, 3].max()) - self.y0
+        if cell is None:
+            sizes = np.maximum(self.bounds[:, 2] - self.bounds[:, 0],
+                               self.bounds[:, 3] - self.bounds[:, 1])
+            cell  = max(float(np.median(sizes)) * 2,
+                        math.sqrt(max(width * height, 1e-6) / n))
+        self.cell = cell if cell > 0 else 1.0
+        self.cols = int(width  // self.cell) + 1
+        self.rows = int(height // self.cell) + 1
+
+        (c0, r0, c1, r1) = self._cells(self.bounds)
+        for (i, (a, b, c, d)) in enumerate(zip(c0, r0, c1, r1)):
+            for col in range(a, c + 1):
+                for row in range(b, d + 1):
+                    self.grid.setdefault((col, row), []).append(i)
+
+    def __len__(self):
+        return len(self.items)
+
+    # the (clamped) range of grid cells covered by bounds rows
+    def _cells(self, bounds):
+        c0 = np.clip((bounds[:, 0] - self.x0) // self.cell, 0, self.cols - 1).astype(int)
+        r0 = np.clip((bounds[:, 1] - self.y0) // self.cell, 0, self.rows - 1).astype(int)
+        c1 = np.clip((bounds[:, 2] - self.x0) // self.cell, 0, self.cols - 1).astype(int)
+        r1 = np.clip((bounds[:, 3] - self.y0) // self.cell, 0, self.rows - 1).astype(int)
+        return (c0.tolist(), r0.tolist(), c1.tolist(), r1.tolist())
+
+    def _candidates(self, xmin, ymin, xmax, ymax):
+        if not self.items or xmax < self.x0 or ymax < self.y0:
+            return np.zeros(0, dtype=int)
+        ((c0,), (r0,), (c1,), (r1,)) = self._cells(np.array(((xmin, ymin, xmax, ymax),)))
+        found = set()
+        for col in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                found.update(self.grid.get((col, row), ()))
+        return np.array(sorted(found), dtype=int)
+
+    # distance from (x, y) to each of the rows' boxes, 0 if inside
+    def _distances(self, rows, x, y):
+        b  = self.bounds[rows]
+        dx = np.maximum(np.maximum(b[:, 0] - x, x - b[:, 2]), 0)
+        dy = np.maximum(np.maximum(b[:, 1] - y, y - b[:, 3]), 0)
+        return np.hypot(dx, dy)
+
+    """
+    Items whose bounds overlap (or touch) the rectangle
+    """
+    def query(self, xmin, ymin, xmax, ymax):
+        rows = self._candidates(xmin, ymin, xmax, ymax)
+        b    = self.bounds[rows]
+        hit  = (b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)
+        return [self.items[i] for i in rows[hit]]
+
+    """
+    Items whose bounds are within distance of the point (x, y)
+    """
+    def within(self, x, y, distance):
+        rows = self._candidates(x - distance, y - distance, x + distance, y + distance)
+        hit  = self._distances(rows, x, y) <= distance
+        return [self.items[i] for i in rows[hit]]
+
+    """
+    The count items closest to (x, y), as (distance, item) tuples, nearest first
+    """
+    def nearest(self, x, y, count=1):
+        if not self.items:
+            return []
+        col = int((x - self.x0) // self.cell)
+        row = int((y - self.y0) // self.cell)
+        # how far the search has to go to have looked at every cell
+        reach = max(abs(col), abs(row), abs(self.cols - 1 - col), abs(self.rows - 1 - row))
+
+        seen = set()
+        best = []
+        for ring in range(reach + 1):
+            rows = set()
+            for (c, r) in _ring(col, row, ring):
+                rows.update(self.grid.get((c, r), ()))
+            rows = np.array(sorted(rows - seen), dtype=int)
+            seen.update(rows.tolist())
+            if len(rows):
+                best.extend(zip(self._distances(rows, x, y).tolist(), rows.tolist()))
+                best.sort()
+                del best[count:]
+            # anything in a cell outside this ring is at least ring cells away
+            if len(best) == count and best[-1][0] <= ring * self.cell:
+                break
+        return [(d, self.items[i]) for (d, i) in best]
+
+    """
+    All pairs of items whose bounds overlap, each pair once, as (a, b)
+    with a listed before b.  With a clearance, the pairs of items that
+    are closer together than that.
+    """
+    def overlaps(self, clearance=0.0):
+        pairs = []
+        for (i, (xmin, ymin, xmax, ymax)) in enumerate(self.bounds.tolist()):
+            rows = self._candidates(xmin - clearance, ymin - clearance, xmax + clearance, ymax + clearance)
+            rows = rows[rows > i]
+            b    = self.bounds[rows]
+            dx   = np.maximum(np.maximum(b[:, 0] - xmax, xmin - b[:, 2]), 0)
+            dy   = np.maximum(np.maximum(b[:, 1] - ymax, ymin - b[:, 3]), 0)
+            for j in rows[np.hypot(dx, dy) <= clearance].tolist():
+                pairs.append((self.items[i], self.items[j]))
+        return pairs
@@ -16,6 +16,7 @@ setup(
             'eagle2bom      = CAMTool.eagle2bom:main',
             'eagle2chmt     = CAMTool.eagle2chmt:main',
             'eagle2svg      = CAMTool.eagle2svg:main',
+            'eagle2fab      = CAMTool.eagle2fab:main',
             'eagleLib2TOC   = CAMTool.eagleLib2TOC:main',
             'convert2jekyll = CAMTool.convert2jekyll:main',
         ]
@@ -26,10 +27,15 @@ setup(
     },
 
     install_requires = [
-        'svgwrite>=1.3.0',
-        'GitPython>=3.1.1'
+        'GitPython>=3.1.1',
+        'numpy>=1.17'
     ],
 
+    extras_require = {
+        # eagle2svg --validate
+        'validate': ['svgwrite>=1.3.0'],
+    },
+
     # metadata to display on PyPI
     
     author="John Plocher",
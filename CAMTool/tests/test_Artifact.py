@@ -0,0 +1,103 @@
+"""
+Artifact: output files replaced only once they are complete, and only
+when their contents change
+"""
+
+import os
+
+import pytest
+
+from CAMTool.fab import Artifact
+
+
+def test_writes_a_new_file(tmp_path):
+    fn = tmp_path / "board.dpv"
+    with Artifact.Artifact(str(fn)) as output:
+        output.write("one\ntwo\n")
+    assert fn.read_text() == "one\ntwo\n"
+    assert os.listdir(tmp_path) == ["board.dpv"]
+
+def test_failure_keeps_the_old_file(tmp_path):
+    fn = tmp_path / "board.dpv"
+    fn.write_text("old\n")
+    with pytest.raises(RuntimeError):
+        with Artifact.Artifact(str(fn)) as output:
+            output.write("half of the new\n")
+            raise RuntimeError("died part way")
+    assert fn.read_text() == "old\n"
+    assert os.listdir(tmp_path) == ["board.dpv"]
+
+def test_failure_leaves_no_file(tmp_path):
+    with pytest.raises(RuntimeError):
+        with Artifact.Artifact(str(tmp_path / "board.dpv")) as output:
+            raise RuntimeError("died")
+    assert os.listdir(tmp_path) == []
+
+def test_nothing_shows_until_done(tmp_path):
+    fn = tmp_path / "board.dpv"
+    with Artifact.Artifact(str(fn)) as output:
+        output.write("x" * 100000)
+        assert not fn.exists()
+    assert fn.stat().st_size == 100000
+
+def test_usual_permissions(tmp_path):
+    fn = tmp_path / "board.dpv"
+    with Artifact.Artifact(str(fn)) as output:
+        output.write("x")
+    assert fn.stat().st_mode & 0o777 == 0o666 & ~Artifact._umask
+
+def test_encoding(tmp_path):
+    fn = tmp_path / "board.svg"
+    with Artifact.Artifact(str(fn), encoding='utf-8') as output:
+        output.write("10kΩ\n")
+    assert fn.read_bytes() == "10kΩ\n".encode('utf-8')
+
+
+def write(fn, text, volatile=()):
+    artifact = Artifact.Artifact(str(fn), volatile)
+    with artifact as output:
+        output.write(text)
+    return artifact.changed
+
+def backdate(fn):
+    os.utime(fn, (1000000, 1000000))
+
+def test_unchanged_file_is_left_alone(tmp_path):
+    fn = tmp_path / "board.bom.md"
+    assert write(fn, "one\ntwo\n") is True
+    backdate(fn)
+    assert write(fn, "one\ntwo\n") is False
+    assert fn.stat().st_mtime == 1000000
+    assert os.listdir(tmp_path) == ["board.bom.md"]
+
+def test_changed_file_is_replaced(tmp_path):
+    fn = tmp_path / "board.bom.md"
+    write(fn, "one\ntwo\n")
+    backdate(fn)
+    assert write(fn, "one\nthree\n") is True
+    assert fn.read_text() == "one\nthree\n"
+    assert fn.stat().st_mtime != 1000000
+
+def test_volatile_lines_are_not_compared(tmp_path):
+    fn = tmp_path / "board.dpv"
+    volatile = ("DATE,", "TIME,")
+    write(fn, "separated\nDATE,2019/01/01\nTIME,10:00:00\nStation,1\n", volatile)
+    backdate(fn)
+    assert write(fn, "separated\nDATE,2019/02/03\nTIME,11:12:13\nStation,1\n", volatile) is False
+    assert "DATE,2019/01/01" in fn.read_text()
+    assert write(fn, "separated\nDATE,2019/02/03\nTIME,11:12:13\nStation,2\n", volatile) is True
+    assert "DATE,2019/02/03" in fn.read_text()
+
+def test_volatile_lines_count_without_the_prefixes(tmp_path):
+    fn = tmp_path / "board.dpv"
+    write(fn, "DATE,2019/01/01\n")
+    assert write(fn, "DATE,2019/02/03\n") is True
+
+def test_digest(tmp_path):
+    fn = tmp_path / "board.dpv"
+    fn.write_text("a\nTIME,1\nb\n")
+    assert Artifact.digest(str(fn), ("TIME,",)) == Artifact.digest(str(fn), ("TIME,", "DATE,"))
+    assert Artifact.digest(str(fn), ("TIME,",)) != Artifact.digest(str(fn))
+    assert Artifact.digest(str(tmp_path / "missing")) is None
+    (tmp_path / "binary").write_bytes(b"\xff\xfe\x00")
+    assert Artifact.digest(str(tmp_path / "binary"), encoding='utf-8') is None
@@ -0,0 +1,157 @@
+"""
+Artwork: package primitives turned into drawable arrays, placed on the
+board, and sorted into layers
+"""
+
+import numpy as np
+import pytest
+
+from CAMTool.fab import Artwork, Rotation
+
+
+def area(ring):
+    (x, y) = (ring[:, 0], ring[:, 1])
+    return (x * np.roll(y, -1) - np.roll(x, -1) * y).sum() / 2
+
+def art(*primitives):
+    return Artwork.packageArt(primitives)
+
+
+def test_counterclockwise():
+    rings = np.array([[(0, 0), (0, 1), (1, 1), (1, 0)],        # clockwise
+                      [(0, 0), (1, 0), (1, 1), (0, 1)]], dtype=float)
+    turned = Artwork.counterclockwise(rings)
+    assert turned[0].tolist() == rings[0][::-1].tolist()
+    assert turned[1].tolist() == rings[1].tolist()
+    assert rings[0].tolist() == [[0, 0], [0, 1], [1, 1], [1, 0]]
+
+@pytest.mark.parametrize("rotation, corners", [
+    (0,  [(3, 2), (-1, 2), (-1, 0), (3, 0)]),
+    (90, [(0, 3), (0, -1), (2, -1), (2, 3)]),
+])
+def test_boxRings(rotation, corners):
+    ring = Artwork.boxRings(np.array([(1, 1, 2, 1, rotation, 0, 1)], dtype=float), 0)[0]
+    assert ring == pytest.approx(np.array(corners, dtype=float))
+    assert area(ring) == pytest.approx(8)
+
+def test_rounded_boxRings():
+    ring = Artwork.boxRings(np.array([(0, 0, 2, 1, 0, 100, 1)], dtype=float), Artwork.CORNER)[0]
+    assert len(ring) == 4 * (Artwork.CORNER + 1)
+    assert np.abs(ring).max(axis=0).tolist() == pytest.approx([2, 1])
+    # the corners are half circles of the box's half height
+    ends = np.hypot(np.abs(ring[:, 0]) - 1, ring[:, 1])
+    assert ends[np.abs(ring[:, 0]) > 1] == pytest.approx(1.0)
+
+def test_octagonRings():
+    ring = Artwork.octagonRings(np.array([(1, 2, 0.5, 0, 17)], dtype=float))[0]
+    assert len(ring) == 8
+    assert (ring[:, 0].min(), ring[:, 0].max()) == pytest.approx((0.5, 1.5))
+    assert (ring[:, 1].min(), ring[:, 1].max()) == pytest.approx((1.5, 2.5))
+    assert area(ring) > 0
+
+def test_polygonRing():
+    square = [(0, 0, 0), (0, 2, 0), (1, 2, 0), (2, 2, 0), (2, 0, 0)]
+    ring = Artwork.polygonRing(square)[0]
+    assert sorted(map(tuple, ring.tolist())) == [(0, 0), (0, 2), (2, 0), (2, 2)]
+    assert area(ring) == pytest.approx(4)
+
+def test_polygonRing_with_an_arc():
+    # a half disc: straight across the bottom, and an arc back over the top
+    ring = Artwork.polygonRing([(-1, 0, 0), (1, 0, 180)])[0]
+    assert area(ring) == pytest.approx(np.pi / 2, abs=0.03)
+    assert np.hypot(ring[:, 0], ring[:, 1]) == pytest.approx(np.ones(len(ring)))
+
+def test_packageArt():
+    a = art(("wire",    {"x1": "0", "y1": "0", "x2": "1", "y2": "0", "width": "0.2", "layer": "21"}),
+            ("smd",     {"x": "0", "y": "0", "dx": "1", "dy": "1", "roundness": "100", "layer": "1"}),
+            ("smd",     {"x": "2", "y": "0", "dx": "1", "dy": "0.5", "layer": "1"}),
+            ("pad",     {"x": "0", "y": "5", "drill": "1", "diameter": "2"}),
+            ("pad",     {"x": "3", "y": "5", "drill": "1", "diameter": "2", "shape": "long"}),
+            ("pad",     {"x": "6", "y": "5", "drill": "1", "diameter": "2", "shape": "octagon"}),
+            ("circle",  {"x": "0", "y": "0", "radius": "3", "width": "0.1", "layer": "21"}),
+            ("circle",  {"x": "0", "y": "0", "radius": "3", "layer": "41"}),
+            ("hole",    {"x": "9", "y": "9", "drill": "3"}),
+            ("polygon", {"layer": "1"}),
+            ("vertex",  {"x": "0", "y": "0"}),
+            ("vertex",  {"x": "1", "y": "0"}),
+            ("vertex",  {"x": "1", "y": "1"}),
+            ("text",    {"x": "0", "y": "1", "size": "1", "layer": "25", "value": ">NAME"}),
+            ("description", {}))
+    assert a.wires.tolist() == [[0, 0, 1, 0, 0.2, 21, 0]]
+    assert a.circles.tolist() == [[0, 0, 3, 0.1, 21]]
+    assert a.discs.tolist() == [[0, 0, 0.5, 1], [0, 5, 1, Artwork.PADS], [0, 5, 0.5, Artwork.DRILLS],
+                                [3, 5, 0.5, Artwork.DRILLS], [6, 5, 0.5, Artwork.DRILLS],
+                                [0, 0, 3, 41], [9, 9, 1.5, Artwork.HOLES]]
+    assert [(layers.tolist(), points.shape) for (layers, points) in a.rings] == [
+        ([1], (1, 4, 2)),                                       # the square smd
+        ([Artwork.PADS], (1, 4 * (Artwork.CORNER + 1), 2)),     # the long pad
+        ([Artwork.PADS], (1, 8, 2)),                            # the octagon
+        ([1], (1, 3, 2)),                                       # the polygon
+    ]
+    assert [(t.layer, t.value) for t in a.texts] == [(25, ">NAME")]
+    assert a.layers() == {1, 21, 25, 41, Artwork.PADS, Artwork.DRILLS, Artwork.HOLES}
+
+def test_placeAll():
+    a = art(("wire", {"x1": "0", "y1": "0", "x2": "1", "y2": "0", "width": "0.2", "layer": "21", "curve": "90"}),
+            ("smd",  {"x": "1", "y": "0", "dx": "1", "dy": "0.5", "layer": "1"}),
+            ("text", {"x": "0", "y": "1", "size": "1", "layer": "25", "value": ">NAME"}),
+            ("text", {"x": "0", "y": "2", "size": "1", "layer": "27", "value": ">VALUE"}))
+    transforms = [Rotation.parse("R90").at(10, 0), Rotation.parse("MR0").at(20, 0)]
+    placed = a.placeAll(transforms, [{">NAME": "R1", ">VALUE": "10k"}, {">NAME": "R2"}])
+
+    assert placed.wires == pytest.approx(np.array([[10, 0, 10, 1, 0.2, 21, 90],
+                                                   [20, 0, 19, 0, 0.2, 22, -90]]))     # bottom side
+    assert [layers.tolist() for (layers, points) in placed.rings] == [[1, 16]]
+    points = placed.rings[0][1]
+    assert area(points[0]) > 0 and area(points[1]) > 0
+    assert points[1][:, 0].min() == pytest.approx(18.5)
+    assert [(t.value, t.layer, t.mirror) for t in placed.texts] == \
+        [("R1", 25, False), ("10k", 27, False), ("R2", 26, True)]     # R2 has no value
+    assert (placed.texts[0].x, placed.texts[0].y, placed.texts[0].angle) == pytest.approx((9, 0, 90))
+
+def test_text_place_mirrored():
+    t = Artwork.Text(25, 1, 0, 1, 30, False, False, "bottom-left", "HELLO")
+    placed = t.place(Rotation.parse("MR90").at(0, 0), {})
+    assert (placed.layer, placed.mirror, placed.value) == (26, True, "HELLO")
+    assert placed.angle == pytest.approx(60)
+    assert (placed.x, placed.y) == pytest.approx((0, -1))
+
+def test_select_and_stack():
+    a = art(("wire",  {"x1": "0", "y1": "0", "x2": "1", "y2": "0", "layer": "21"}),
+            ("wire",  {"x1": "0", "y1": "0", "x2": "1", "y2": "0", "layer": "16"}),
+            ("smd",   {"x": "0", "y": "0", "dx": "1", "dy": "0.5", "layer": "1"}),
+            ("pad",   {"x": "0", "y": "5", "drill": "1"}),
+            ("text",  {"x": "0", "y": "1", "size": "1", "layer": "200", "value": "X"}),
+            ("text",  {"x": "0", "y": "1", "size": "1", "layer": "101", "value": "Y"}))
+    stacked = Artwork.stack(a)
+    assert [layer for (layer, layerArt) in stacked] == [16, 1, Artwork.PADS, 21, Artwork.DRILLS, 101, 200]
+    top = dict(stacked)[1]
+    assert (len(top.wires), len(top.discs), [l.tolist() for (l, p) in top.rings]) == (0, 0, [[1]])
+    assert dict(stacked)[200].texts[0].value == "X"
+
+def test_combine():
+    a = art(("smd", {"x": "0", "y": "0", "dx": "1", "dy": "0.5", "layer": "1"}))
+    b = art(("smd", {"x": "5", "y": "0", "dx": "1", "dy": "0.5", "layer": "16"}),
+            ("pad", {"x": "0", "y": "5", "drill": "1", "shape": "octagon"}),
+            ("wire", {"x1": "0", "y1": "0", "x2": "1", "y2": "0", "layer": "21"}))
+    c = Artwork.combine([a, b])
+    # rings with the same number of points are batched together
+    assert sorted((layers.tolist(), points.shape) for (layers, points) in c.rings) == \
+        [([1, 16], (2, 4, 2)), ([Artwork.PADS], (1, 8, 2))]
+    assert (len(c.wires), len(c.discs)) == (1, 1)
+    empty = Artwork.combine([])
+    assert (empty.wires.shape, empty.circles.shape, empty.discs.shape, empty.rings) == \
+        ((0, 7), (0, 5), (0, 4), [])
+
+@pytest.mark.parametrize("display, expected", [
+    ("value", ["R1", "10k", "1%"]),
+    ("name",  ["NAME", "VALUE", "TOLERANCE"]),
+    ("both",  ["NAME=R1", "VALUE=10k", "TOLERANCE=1%"]),
+    ("off",   []),
+])
+def test_attributeArt(display, expected):
+    e = {"name": "R1", "value": "10k", "attributes": [
+        dict(name=name, value=value, display=display, x="0", y="0", size="1", layer="25")
+        for (name, value) in (("NAME", ""), ("VALUE", ""), ("TOLERANCE", "1%"))]
+        + [{"name": "MPN", "value": "RC0603"}]}            # not placed, so not drawn
+    assert [t.value for t in Artwork.attributeArt(e).texts] == expected
@@ -0,0 +1,53 @@
+"""
+BOM: a board's parts grouped into lines by canonical component id
+"""
+
+from CAMTool.fab import BOM, CHMTPickNPlace, EagleCAD
+
+
+def parts(*specs):
+    result = {}
+    for (name, value, package, feeder) in specs:
+        p = EagleCAD.Part({"name": name, "value": value, "package": package, "library": "SPCoast"})
+        p.feeder = feeder
+        result[name] = p
+    return result
+
+
+def test_aggregate():
+    bom = BOM.aggregate(parts(
+        ("R10", "10K",   "0603-RES", "1"),
+        ("R2",  "10k",   "0603-RES", "1"),
+        ("R1",  "10kΩ",  "0603-RES", "1"),
+        ("C1",  "100nF", "0603-CAP", "3"),
+        ("C2",  "0.1uF", "0603-CAP", "3"),
+        ("R3",  "1k",    "0603-RES", CHMTPickNPlace.NOTFOUND),
+        ("J1",  "HDR",   "1X4",      CHMTPickNPlace.SKIP),
+    ))
+    assert [(l.id, l.names) for l in bom] == [
+        ("1k-0603-res",    ("R3",)),
+        ("10kω-0603-res",  ("R1", "R2", "R10")),      # the first part's id
+        ("100nf-0603-cap", ("C1", "C2")),
+        ("hdr-1x4",        ("J1",)),
+    ]
+    assert (bom[1].value, bom[1].package, bom[1].library) == ("10kΩ", "0603-RES", "SPCoast")
+
+def test_mega_is_not_milli():
+    bom = BOM.aggregate(parts(("R1", "1M", "0603-RES", "5"), ("R2", "1m", "0603-RES", "6")))
+    assert [l.names for l in bom] == [("R1",), ("R2",)]
+
+def test_line():
+    bom = BOM.aggregate(parts(
+        ("J1", "HDR",  "1X4",      CHMTPickNPlace.SKIP),
+        ("R1", "1k",   "0603-RES", CHMTPickNPlace.NOTFOUND),
+        ("C1", "100n", "0603-CAP", "3"),
+        ("C2", "100n", "0603-CAP", "3"),
+    ))
+    assert [(l.feederName, l.smd, l.count) for l in bom] == [
+        ("NONE", True,  1),
+        ("3",    True,  2),
+        ("PTH",  False, 1),
+    ]
+
+def test_empty():
+    assert BOM.aggregate({}) == ()
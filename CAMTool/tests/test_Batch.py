@@ -0,0 +1,55 @@
+"""
+Batch: running a job over boards in this process or in workers, with the
+output and errors kept in board order
+"""
+
+import os
+import time
+
+import pytest
+
+from CAMTool.fab import Batch
+
+
+# jobs run in worker processes have to be importable, so live at module level
+
+def job(board, prefix):
+    time.sleep(0.05 if board == "a.brd" else 0)      # finishes last when run side by side
+    print("{}{} in {}".format(prefix, board, os.getpid()))
+    if board == "bad.brd":
+        raise ValueError("no such board")
+    return board.upper()
+
+started = []
+
+def initializer(prefix):
+    started.append(prefix)
+
+
+@pytest.mark.parametrize("jobs", [None, 1, 2, 0])
+def test_output_in_board_order(jobs, capsys):
+    boards = ["a.brd", "b.brd", "c.brd"]
+    (results, failed) = Batch.mapBoards(job, boards, jobs, (">",))
+    assert (results, failed) == (["A.BRD", "B.BRD", "C.BRD"], 0)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines] == [">a.brd", ">b.brd", ">c.brd"]
+
+def test_workers_are_used(capsys):
+    Batch.runBoards(job, ["a.brd", "b.brd"], 2, ("",))
+    pids = set(line.split()[-1] for line in capsys.readouterr().out.splitlines())
+    assert str(os.getpid()) not in pids
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failures_are_counted_and_reported(jobs, capsys):
+    (results, failed) = Batch.mapBoards(job, ["a.brd", "bad.brd", "c.brd"], jobs, ("",))
+    assert (results, failed) == (["A.BRD", None, "C.BRD"], 1)
+    captured = capsys.readouterr()
+    assert len(captured.out.splitlines()) == 3          # what bad.brd printed before failing too
+    assert captured.err.startswith("ERROR: bad.brd failed:")
+    assert "ValueError: no such board" in captured.err
+    assert Batch.runBoards(job, ["bad.brd"], jobs, ("",)) == 1
+
+def test_initializer_runs_in_this_process(capsys):
+    del started[:]
+    Batch.runBoards(job, ["a.brd", "b.brd"], 1, ("+",), initializer)
+    assert started == ["+"]
@@ -0,0 +1,86 @@
+"""
+BoardCache: keys, saving and loading, and evicting old entries
+"""
+
+import configparser
+import os
+import time
+
+import pytest
+
+from CAMTool.fab import BoardCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(BoardCache, "cachedir", str(tmp_path / "cache"))
+    monkeypatch.setattr(BoardCache, "maxbytes", 1024 * 1024)
+    monkeypatch.setattr(BoardCache, "maxage",   24 * 60 * 60)
+    return tmp_path / "cache"
+
+def age(path, days):
+    t = time.time() - days * 24 * 60 * 60
+    os.utime(path, (t, t))
+
+
+def test_key_follows_contents_and_version(tmp_path):
+    brd = tmp_path / "test.brd"
+    brd.write_text("<eagle/>")
+    key = BoardCache.getKey(str(brd), 1)
+    assert key == BoardCache.getKey(str(brd), 1)
+    assert key != BoardCache.getKey(str(brd), 2)
+    brd.write_text("<eagle></eagle>")
+    assert key != BoardCache.getKey(str(brd), 1)
+
+def test_save_and_load(cache):
+    assert BoardCache.load("key-1") is None
+    BoardCache.save("key-1", {"parts": [1, 2, 3]})
+    assert BoardCache.load("key-1") == {"parts": [1, 2, 3]}
+    assert BoardCache.load("key-2") is None
+    assert [p.name for p in cache.iterdir()] == ["key-1" + BoardCache.SUFFIX]
+
+def test_damaged_entry_is_a_miss(cache):
+    cache.mkdir()
+    (cache / ("key-1" + BoardCache.SUFFIX)).write_bytes(b"not a pickle")
+    assert BoardCache.load("key-1") is None
+
+def test_disabled(cache, monkeypatch):
+    monkeypatch.setattr(BoardCache, "cachedir", "")
+    BoardCache.save("key-1", "model")
+    assert BoardCache.load("key-1") is None
+    assert not cache.exists()
+
+def test_load_marks_entry_used(cache):
+    BoardCache.save("key-1", "model")
+    fn = cache / ("key-1" + BoardCache.SUFFIX)
+    age(fn, 0.5)
+    BoardCache.load("key-1")
+    assert time.time() - fn.stat().st_mtime < 60
+
+def test_evict_by_age(cache):
+    BoardCache.save("old", "model")
+    BoardCache.save("new", "model")
+    age(cache / ("old" + BoardCache.SUFFIX), 2)
+    BoardCache.evict()
+    assert BoardCache.load("old") is None
+    assert BoardCache.load("new") == "model"
+
+def test_evict_least_recently_used_by_size(cache, monkeypatch):
+    for (n, key) in enumerate(("a", "b", "c")):
+        BoardCache.save(key, "x" * 1000)
+        age(cache / (key + BoardCache.SUFFIX), 0.1 * (3 - n))     # a oldest, c newest
+    (cache / "notes.txt").write_text("x" * 5000)
+    monkeypatch.setattr(BoardCache, "maxbytes", 2500)
+    BoardCache.evict()
+    assert sorted(p.name for p in cache.iterdir()) == ["b.board", "c.board", "notes.txt"]
+
+def test_configure(tmp_path, monkeypatch):
+    for name in ("cachedir", "maxbytes", "maxage"):
+        monkeypatch.setattr(BoardCache, name, getattr(BoardCache, name))
+    configuration = configparser.ConfigParser()
+    configuration.read_dict({"EagleTools": {"boardcache": str(tmp_path),
+                                            "boardcachesize": "5", "boardcacheage": "2"}})
+    BoardCache.configure(configuration)
+    assert BoardCache.cachedir == str(tmp_path)
+    assert BoardCache.maxbytes == 5 * 1024 * 1024
+    assert BoardCache.maxage   == 2 * 24 * 60 * 60
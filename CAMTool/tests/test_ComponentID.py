@@ -0,0 +1,57 @@
+"""
+ComponentID: the rows of the module docstring's table, and the values
+that used to slip through as plain text
+"""
+
+import pytest
+
+from CAMTool.fab import ComponentID
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("10kΩ",   "10k"),
+    ("10 kohm",     "10k"),
+    ("10000R",      "10k"),
+    ("10K",         "10k"),
+    ("10000",       "10k"),
+    ("0.1uF",       "100n"),
+    ("0.1µF",  "100n"),
+    ("100nF",       "100n"),
+    ("0.1u",        "100n"),
+    ("4k7",         "4.7k"),
+    ("4.7kΩ",  "4.7k"),
+    ("4K7",         "4.7k"),
+    ("1M",          "1M"),
+    ("1meg",        "1M"),
+    ("1MΩ",    "1M"),
+    ("1000k",       "1M"),
+    ("1m",          "1m"),
+    ("1mΩ",    "1m"),
+])
+def test_values(value, expected):
+    assert ComponentID.canonicalValue(value) == expected
+
+def test_mega_is_not_milli():
+    assert ComponentID.canonicalValue("1M") != ComponentID.canonicalValue("1mΩ")
+    assert ComponentID.canonicalValue("4M7") == "4.7M"
+    assert ComponentID.canonicalValue("4m7") == "4.7m"
+
+def test_every_digit_is_kept():
+    assert ComponentID.canonicalValue("4.99k") == "4.99k"
+    assert ComponentID.canonicalValue("12345") == "12.345k"
+    assert ComponentID.canonicalValue("4R7") == "4.7"
+    assert ComponentID.canonicalValue("2u2") == "2.2u"
+    assert ComponentID.canonicalValue("0") == "0"
+
+@pytest.mark.parametrize("value", ["2N7002", "2N7000", "1N4148", "MMBT3904", "HDR", "LM358", "100N4148"])
+def test_part_numbers_are_not_values(value):
+    assert ComponentID.canonicalValue(value) == value.lower()
+
+@pytest.mark.parametrize("package", ["SOT-23", "SOT23", "sot_23", "SOT-23-3"])
+def test_packages(package):
+    assert ComponentID.canonicalPackage(package) == "sot23"
+
+def test_ids():
+    assert ComponentID.canonical("10K-0603-RES") == ComponentID.canonical("10kΩ-0603_res")
+    assert ComponentID.canonical("1M-0603-RES") != ComponentID.canonical("1m-0603-RES")
+    assert ComponentID.canonical("2N7002-SOT-23") == "2n7002-sot23"
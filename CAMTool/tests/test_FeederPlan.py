@@ -0,0 +1,116 @@
+"""
+FeederPlan: which reels to swap onto the machine, board by board
+"""
+
+import pytest
+
+from CAMTool.fab import CHMTPickNPlace, FeederPlan, PickPath
+
+col = CHMTPickNPlace.idx
+
+
+def row(tape, number, name, aliases=""):
+    r = [""] * len(col)
+    r[col[CHMTPickNPlace.tapesize]]  = tape
+    r[col[CHMTPickNPlace.feedernum]] = number
+    r[col[CHMTPickNPlace.partname]]  = name
+    r[col[CHMTPickNPlace.aliases]]   = aliases
+    return r
+
+class Part(object):
+    def __init__(self, name, value, package, x=0.0, y=0.0, smd=True):
+        (self.name, self.value, self.package) = (name, value, package)
+        (self.x, self.y, self.smd) = (x, y, smd)
+        self.id = (value + "-" + package).lower()
+
+    def component(self):
+        return self.value + "-" + self.package
+
+def parts(*specs):
+    return dict((p.name, p) for p in (Part(*spec) for spec in specs))
+
+def numbers(rows):
+    return dict((r[col[CHMTPickNPlace.partname]], r[col[CHMTPickNPlace.feedernum]]) for r in rows)
+
+@pytest.fixture
+def sheet(monkeypatch):
+    monkeypatch.setattr(PickPath, "feederx", 0.0)
+    monkeypatch.setattr(PickPath, "feedery", -50.0)
+    monkeypatch.setattr(PickPath, "feederpitch", 10.0)
+    return [
+        row(CHMTPickNPlace.tapesize, CHMTPickNPlace.feedernum, CHMTPickNPlace.partname),
+        row("8mm",  "1", "10k-0603-RES", "10kohm-0603-RES"),
+        row("8mm",  "2", "1k-0603-RES"),
+        row("12mm", "3", "SOT23-TRANSISTOR"),
+        row("8mm",  "",  "100nF-0603-CAP"),
+        row("8mm",  "",  "4.7k-0603-RES"),
+        row("16mm", "",  "SOIC8-IC"),
+        row("NoMount", "", "HDR-1X4"),
+        row("Stop", "", ""),
+        row("8mm",  "",  "22p-0603-CAP"),
+    ]
+
+
+def test_isReel(sheet):
+    assert [FeederPlan.isReel(r) for r in sheet] == \
+        [False, True, True, True, True, True, True, False, False, True]
+
+def test_mounted_reels_stay(sheet):
+    board = parts(("R1", "10K", "0603-RES"), ("R2", "10kohm", "0603-RES"), ("R3", "1000R", "0603-RES"))
+    (result,) = FeederPlan.FeederPlan(sheet).plan([("a", board)])
+    assert result["changes"] == [] and result["unplaced"] == [] and result["missing"] == []
+    assert numbers(result["rows"]) == numbers(sheet)
+
+def test_needed_reel_is_loaded(sheet):
+    board = parts(("R1", "10k", "0603-RES"), ("C1", "0.1uF", "0603-CAP"), ("J1", "HDR", "1X4", 0, 0, False))
+    (result,) = FeederPlan.FeederPlan(sheet).plan([("a", board)])
+    # 10k is needed; feeder 2's 1k isn't
+    assert result["changes"] == [("2", "100nF-0603-CAP", "1k-0603-RES")]
+    n = numbers(result["rows"])
+    assert (n["100nF-0603-CAP"], n["1k-0603-RES"], n["10k-0603-RES"]) == ("2", "", "1")
+
+def test_keeps_the_reel_needed_soonest(sheet):
+    boards = [
+        ("a", parts(("C1", "100n", "0603-CAP"))),
+        ("b", parts(("R1", "1k",   "0603-RES"))),
+    ]
+    (a, b) = FeederPlan.FeederPlan(sheet).plan(boards)
+    # 1k is used again by the next board, 10k never: 10k makes way
+    assert a["changes"] == [("1", "100nF-0603-CAP", "10k-0603-RES")]
+    assert b["changes"] == []
+
+def test_closest_feeder_breaks_ties(sheet):
+    board = parts(("C1", "100n", "0603-CAP", 12.0, 0.0), ("C2", "100n", "0603-CAP", 8.0, 0.0))
+    (result,) = FeederPlan.FeederPlan(sheet).plan([("a", board)])
+    # feeder 2 picks at x=10, feeder 1 at x=0
+    assert result["changes"] == [("2", "100nF-0603-CAP", "1k-0603-RES")]
+
+def test_most_used_reel_chooses_first(sheet):
+    board = parts(("R1", "4k7", "0603-RES", 0.0), ("C1", "100n", "0603-CAP", 0.0), ("C2", "100n", "0603-CAP", 0.0))
+    (result,) = FeederPlan.FeederPlan(sheet).plan([("a", board)])
+    assert result["changes"] == [("1", "100nF-0603-CAP", "10k-0603-RES"),
+                                 ("2", "4.7k-0603-RES", "1k-0603-RES")]
+
+def test_unplaced_and_missing(sheet):
+    board = parts(("U1", "SOIC8", "IC"), ("C1", "22p", "0603-CAP"), ("D1", "RED", "0603-LED"))
+    (result,) = FeederPlan.FeederPlan(sheet).plan([("a", board)])
+    assert result["changes"] == []
+    assert result["unplaced"] == ["SOIC8-IC"]           # no 16mm feeder
+    assert result["missing"] == ["22p-0603-cap", "red-0603-led"]    # 22p is past the Stop
+
+def test_each_board_gets_its_own_rows(sheet):
+    boards = [("a", parts(("C1", "100n", "0603-CAP"))), ("b", parts(("R1", "4.7k", "0603-RES")))]
+    (a, b) = FeederPlan.FeederPlan(sheet).plan(boards)
+    assert numbers(a["rows"])["4.7k-0603-RES"] == ""
+    assert numbers(b["rows"])["4.7k-0603-RES"] != ""
+    assert numbers(sheet)["100nF-0603-CAP"] == ""       # the sheet itself is left alone
+
+def test_report(sheet):
+    boards = [("a", parts(("C1", "100n", "0603-CAP"), ("U1", "SOIC8", "IC"), ("D1", "RED", "0603-LED")))]
+    assert FeederPlan.report(FeederPlan.FeederPlan(sheet).plan(boards)) == "\n".join([
+        "Feeder plan: 1 reel changes for 1 boards",
+        "a:",
+        "    feeder   1: load 100nF-0603-CAP (remove 10k-0603-RES)",
+        "    no free feeder for SOIC8-IC",
+        "    not on the feeder sheet: red-0603-led",
+    ])
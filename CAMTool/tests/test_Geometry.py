@@ -0,0 +1,168 @@
+"""
+Geometry: bounds of primitives (arcs included) and of packages, and wires
+grouped by pen
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from CAMTool.fab import Geometry
+
+
+def wire(x1, y1, x2, y2, curve=0.0, width=0.0, layer=21):
+    return Geometry.wireArray([(x1, y1, x2, y2, width, layer, curve)])
+
+
+@pytest.mark.parametrize("curve, expected", [
+    (0,    (-1, 0, 1, 0)),          # straight
+    (180,  (-1, 0, 1, 1)),          # counterclockwise, over the top
+    (-180, (-1, -1, 1, 0)),         # clockwise, underneath
+])
+def test_semicircle(curve, expected):
+    assert Geometry.wireBounds(wire(1, 0, -1, 0, curve))[0] == pytest.approx(expected)
+
+def test_quarter_arc_stays_between_its_ends():
+    assert Geometry.wireBounds(wire(1, 0, 0, 1, 90))[0] == pytest.approx((0, 0, 1, 1))
+
+def test_three_quarter_arc():
+    assert Geometry.wireBounds(wire(1, 0, 0, -1, 270))[0] == pytest.approx((-1, -1, 1, 1))
+
+def test_arc_off_the_origin():
+    assert Geometry.wireBounds(wire(6, 5, 4, 5, 180))[0] == pytest.approx((4, 5, 6, 6))
+
+@pytest.mark.parametrize("start, curve", [(30, 100), (30, -100), (200, 300), (-80, -250)])
+def test_arc_bounds_fit_the_arc(start, curve):
+    (cx, cy, r) = (2.0, -1.0, 3.0)
+    t = np.radians(start + curve * np.linspace(0, 1, 10001))
+    (x, y) = (cx + r * np.cos(t), cy + r * np.sin(t))
+    w = wire(x[0], y[0], x[-1], y[-1], curve)
+    assert Geometry.wireBounds(w)[0] == pytest.approx((x.min(), y.min(), x.max(), y.max()), abs=1e-6)
+
+@pytest.mark.parametrize("angle, expected", [
+    (0,   (-2, -1, 2, 1)),
+    (90,  (-1, -2, 1, 2)),
+    (180, (-2, -1, 2, 1)),
+    (45,  (-1.5 * math.sqrt(2), -1.5 * math.sqrt(2), 1.5 * math.sqrt(2), 1.5 * math.sqrt(2))),
+])
+def test_rotated_box(angle, expected):
+    boxes = Geometry.boxArray([(0, 0, 2, 1, angle)])
+    assert Geometry.boxBounds(boxes)[0] == pytest.approx(expected)
+
+@pytest.mark.parametrize("drill, diameter", [
+    (0.4, 0.4 + 2 * 0.254),         # 10 mil minimum
+    (1.2, 1.2 + 2 * 0.3),           # 25%
+    (3.0, 3.0 + 2 * 0.508),         # 20 mil maximum
+])
+def test_pad_diameter(drill, diameter):
+    assert Geometry.padDiameter(drill) == pytest.approx(diameter)
+
+def test_addShape():
+    (wires, boxes, points) = ([], [], [])
+    Geometry.addShape("wire",      {"x1": "0", "y1": "0", "x2": "1", "y2": "2", "width": "0.1", "layer": "21"}, wires, boxes, points)
+    Geometry.addShape("smd",       {"x": "1", "y": "2", "dx": "1", "dy": "0.5", "rot": "R90"}, wires, boxes, points)
+    Geometry.addShape("pad",       {"x": "0", "y": "0", "drill": "1.2", "shape": "long"}, wires, boxes, points)
+    Geometry.addShape("rectangle", {"x1": "2", "y1": "0", "x2": "0", "y2": "1"}, wires, boxes, points)
+    Geometry.addShape("circle",    {"x": "0", "y": "0", "radius": "3"}, wires, boxes, points)
+    Geometry.addShape("hole",      {"x": "5", "y": "5", "drill": "3.2"}, wires, boxes, points)
+    Geometry.addShape("vertex",    {"x": "1", "y": "1"}, wires, boxes, points)
+    Geometry.addShape("text",      {"x": "9", "y": "9"}, wires, boxes, points)
+    assert wires  == [(0.0, 0.0, 1.0, 2.0, 0.1, 21, 0.0)]
+    assert np.array(boxes) == pytest.approx(np.array([(1, 2, 0.5, 0.25, 90), (0, 0, 1.8, 0.9, 0),
+                                                      (1, 0.5, 1, 0.5, 0), (0, 0, 3, 3, 0), (5, 5, 1.6, 1.6, 0)]))
+    assert points == [(1.0, 1.0)]
+
+def test_bounds():
+    assert Geometry.bounds() is None
+    assert Geometry.bounds(Geometry.wireArray([]), Geometry.boxArray([]), Geometry.pointArray([])) is None
+    assert Geometry.bounds(wire(1, 0, -1, 0, 180),
+                           Geometry.boxArray([(3, 3, 1, 1, 0)]),
+                           Geometry.pointArray([(-5, 0)])) == pytest.approx((-5, 0, 4, 4))
+
+def test_reduceBounds():
+    b = Geometry.boundsArray([(0, 0, 1, 1), (5, 5, 6, 6), (-1, 2, 0, 3)])
+    r = Geometry.reduceBounds(np.array([0, 2, 0]), b, 3)
+    assert r[0] == pytest.approx((-1, 0, 1, 3))
+    assert r[1].tolist() == [np.inf, np.inf, -np.inf, -np.inf]
+    assert r[2] == pytest.approx((5, 5, 6, 6))
+
+def test_packShapes():
+    shapes = [
+        ([(0, 0, 2, 0, 0.1, 21, 0)], [], [(1, 3)]),
+        ([], [], []),
+        ([], [(0, 0, 1, 1, 0), (4, 0, 1, 1, 0)], []),
+    ]
+    (views, b) = Geometry.packShapes(shapes)
+    assert b.tolist() == [[0, 0, 2, 3], [10000, 10000, -10000, -10000], [-1, -1, 5, 1]]
+    assert [[len(kind) for kind in v] for v in views] == [[1, 0, 1], [0, 0, 0], [0, 2, 0]]
+    assert views[2][1][1].tolist() == [4, 0, 1, 1, 0]
+
+def test_wireGroups():
+    wires = Geometry.wireArray([
+        (0, 0, 1, 0, 0.2, 21, 0),
+        (0, 0, 2, 0, 0.1, 21, 0),
+        (0, 0, 3, 0, 0.2, 1,  0),
+        (0, 0, 4, 0, 0.2, 21, 0),
+        (0, 0, 5, 0, 0.1, 21, 0),
+    ])
+    groups = Geometry.wireGroups(wires)
+    assert [(layer, width, g[:, 2].tolist()) for (layer, width, g) in groups] == [
+        (1,  0.2, [3]),
+        (21, 0.1, [2, 5]),          # in their original order
+        (21, 0.2, [1, 4]),
+    ]
+    assert Geometry.wireGroups(Geometry.wireArray([])) == []
+
+@pytest.mark.parametrize("x2, y2, curve, radius", [
+    (-1, 0, 180,  1.0),
+    (-1, 0, -180, 1.0),
+    (0,  1, 90,   1.0),
+    (0, -1, 270,  1.0),
+    (-1, 0, 0,    0.0),
+    (1,  0, 90,   0.0),         # no length
+])
+def test_arcRadius(x2, y2, curve, radius):
+    assert Geometry.arcRadius(wire(1, 0, x2, y2, curve)) == pytest.approx([radius])
+
+@pytest.mark.parametrize("curve", [90, -90, 180, 359])
+@pytest.mark.parametrize("tolerance", [0.1, 0.01, 0.001])
+def test_arcPoints(curve, tolerance):
+    (cx, cy, r) = (1.0, 2.0, 5.0)
+    end = math.radians(curve)
+    (x2, y2) = (cx + r * math.cos(end), cy + r * math.sin(end))
+    pts = Geometry.arcPoints(cx + r, cy, x2, y2, curve, tolerance)
+    assert pts[0] == pytest.approx((cx + r, cy))
+    assert np.hypot(pts[:, 0] - cx, pts[:, 1] - cy) == pytest.approx(np.full(len(pts), r))
+    # no chord, the last one to the end point included, strays further than tolerance
+    ring = np.vstack((pts, (x2, y2)))
+    chords = np.hypot(*(ring[1:] - ring[:-1]).T)
+    assert (r - np.sqrt(r * r - (chords / 2) ** 2)).max() <= tolerance + 1e-12
+    assert len(pts) <= 2 * math.ceil(abs(end) / (2 * math.acos(1 - tolerance / r)))
+
+def test_arcPoints_straight():
+    assert Geometry.arcPoints(1, 2, 3, 4, 0, 0.01).tolist() == [[1, 2]]
+    assert Geometry.arcPoints(1, 2, 1, 2, 90, 0.01).tolist() == [[1, 2]]
+
+def test_simplify_drops_points_on_a_line():
+    points = np.array([(0, 0), (1, 0.001), (2, 0), (3, -0.001), (4, 0), (4, 3)], dtype=float)
+    assert Geometry.simplify(points, 0.01).tolist() == [[0, 0], [4, 0], [4, 3]]
+    # (2, 0) lies on the chord between its neighbours
+    assert Geometry.simplify(points, 0.0001).tolist() == [[0, 0], [1, 0.001], [3, -0.001], [4, 0], [4, 3]]
+
+def test_simplify_stays_within_tolerance():
+    t = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+    points = np.column_stack((10 * np.cos(t), 10 * np.sin(t)))
+    kept = Geometry.simplify(points, 0.05, ring=True)
+    assert 10 < len(kept) < 100
+    # every dropped point is within tolerance of the outline that is left
+    closed = np.vstack((kept, kept[:1]))
+    (a, b) = (closed[:-1], closed[1:])
+    for p in points:
+        ab = b - a
+        u  = np.clip(((p - a) * ab).sum(axis=1) / (ab * ab).sum(axis=1), 0, 1)
+        assert np.hypot(*(a + u[:, None] * ab - p).T).min() <= 0.05 + 1e-9
+
+def test_simplify_ring_keeps_its_corners():
+    square = np.array([(0, 0), (1, 0), (2, 0), (2, 2), (0, 2), (0, 1)], dtype=float)
+    assert Geometry.simplify(square, 0.01, ring=True).tolist() == [[0, 0], [2, 0], [2, 2], [0, 2]]
@@ -0,0 +1,104 @@
+"""
+LibraryIndex: byte offsets of a library's entries, and the sidecar they
+are kept in
+"""
+
+import json
+import os
+
+import pytest
+
+from CAMTool.fab import LibraryIndex
+
+
+LIBRARY = """<?xml version="1.0" encoding="utf-8"?>
+<eagle version="7.7.0">
+<drawing><library>
+<packages>
+<package name="0603-RES">
+<smd name="1" x="-0.8" y="0" dx="0.9" dy="1" layer="1"/>
+<smd name="2" x="0.8" y="0" dx="0.9" dy="1" layer="1"/>
+</package>
+<package name="EMPTY"/>
+<package name="A&amp;B &quot;Q&quot;">
+<pad name="1" x="0" y="0" drill="1"/>
+</package>
+</packages>
+<symbols>
+<symbol name="R"><pin name="1" x="0" y="0"/></symbol>
+</symbols>
+<devicesets>
+<deviceset name="RESISTOR" prefix="R"><gates/></deviceset>
+</devicesets>
+</library></drawing>
+</eagle>
+"""
+
+def sidecar(lbr):
+    with open(LibraryIndex.indexfilename(lbr)) as f:
+        return json.load(f)
+
+@pytest.fixture
+def lbr(tmp_path):
+    fn = tmp_path / "test.lbr"
+    fn.write_bytes(LIBRARY.encode('utf-8'))
+    return str(fn)
+
+
+def test_scan_offsets():
+    data = LIBRARY.encode('utf-8')
+    ranges = LibraryIndex.scanLibrary(data)
+    assert sorted(ranges["package"]) == ['0603-res', 'a&b "q"', 'empty']
+    (start, end, name) = ranges["package"]["0603-res"]
+    assert name == "0603-RES"
+    assert data[start:end].startswith(b'<package name="0603-RES">')
+    assert data[start:end].endswith(b'</package>')
+    (start, end, name) = ranges["package"]["empty"]
+    assert data[start:end] == b'<package name="EMPTY"/>'
+    assert ranges["package"]['a&b "q"'][2] == 'A&B "Q"'
+    assert list(ranges["symbol"]) == ["r"]
+    assert list(ranges["deviceset"]) == ["resistor"]
+
+def test_getNode(lbr):
+    with LibraryIndex.LibraryIndex(lbr) as library:
+        node = library.getNode("package", "0603-res")
+        assert node.get("name") == "0603-RES"
+        assert [s.get("name") for s in node.iter("smd")] == ["1", "2"]
+        assert library.getNode("package", 'A&B "Q"').find("pad") is not None
+        assert library.has("symbol", "R") and not library.has("symbol", "C")
+        assert sorted(library.names("package")) == ['0603-RES', 'A&B "Q"', 'EMPTY']
+
+def test_sidecar_is_written_and_reused(lbr, monkeypatch):
+    with LibraryIndex.LibraryIndex(lbr) as library:
+        ranges = library.ranges
+    saved = sidecar(lbr)
+    assert saved["ranges"] == ranges
+
+    def rescanned(data):
+        raise AssertionError("library rescanned")
+    monkeypatch.setattr(LibraryIndex, "scanLibrary", rescanned)
+    with LibraryIndex.LibraryIndex(lbr) as library:
+        assert library.ranges == ranges
+
+def test_sidecar_is_rebuilt_when_the_library_changes(lbr):
+    LibraryIndex.LibraryIndex(lbr).close()
+    with open(lbr, 'ab') as f:
+        f.write(b'<package name="LATE"/>\n')
+    with LibraryIndex.LibraryIndex(lbr) as library:
+        assert library.has("package", "late")
+    assert "late" in sidecar(lbr)["ranges"]["package"]
+
+def test_unwritable_sidecar(lbr, monkeypatch):
+    def denied(*args, **kwargs):
+        raise PermissionError("read only")
+    monkeypatch.setattr(LibraryIndex.tempfile, "mkstemp", denied)
+    with LibraryIndex.LibraryIndex(lbr) as library:
+        assert library.has("package", "0603-RES")
+    assert not os.path.exists(LibraryIndex.indexfilename(lbr))
+
+def test_close(lbr):
+    with LibraryIndex.LibraryIndex(lbr) as library:
+        pass
+    assert library._file.closed
+    with pytest.raises(ValueError):
+        library.getNode("package", "EMPTY")
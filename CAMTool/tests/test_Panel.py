@@ -0,0 +1,113 @@
+"""
+Panel: recognizing a grid of board copies from their element placements
+"""
+
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from CAMTool.fab import CHMTPickNPlace, Panel
+
+
+# one board: R1 and C1
+BOARD = [("R1", 5.0, 3.0), ("C1", 12.5, 7.25)]
+
+def panel(columns, rows, dx=40.0, dy=30.0, skip=()):
+    placements = []
+    for r in range(rows):
+        for c in range(columns):
+            if r * columns + c + 1 in skip:
+                continue
+            for (name, x, y) in BOARD:
+                placements.append(("{}x{}{}".format(name, r + 1, c + 1), x + c * dx, y + r * dy))
+    return placements
+
+def part(name, x, y, feeder="10k-0603-RES"):
+    return SimpleNamespace(name=name, x=x, y=y, feeder=feeder)
+
+
+def test_fromPlacements():
+    p = Panel.fromPlacements(panel(3, 2) + [("FID1", 0.0, 0.0)])
+    assert (p.columns, p.rows, p.dx, p.dy) == (3, 2, 40.0, 30.0)
+    assert p.cells["R1x11"] == (0, 0)
+    assert p.cells["R1x13"] == (2, 0)
+    assert p.cells["C1x21"] == (0, 1)
+    assert "FID1" not in p.cells
+    assert p.boards == [1, 2, 3, 4, 5, 6]
+    assert (p.template, p.missing()) == (1, [])
+
+def test_numbered_along_x_first():
+    p = Panel.fromPlacements(panel(3, 2))
+    assert [p.number(c, r) for r in range(2) for c in range(3)] == [1, 2, 3, 4, 5, 6]
+
+@pytest.mark.parametrize("columns, rows", [(2, 1), (1, 3), (4, 4)])
+def test_shapes(columns, rows):
+    p = Panel.fromPlacements(panel(columns, rows))
+    assert (p.columns, p.rows) == (columns, rows)
+
+def test_crossed_out_boards():
+    p = Panel.fromPlacements(panel(2, 2, skip=(1, 4)))
+    assert (p.columns, p.rows) == (2, 2)
+    assert p.boards == [2, 3]
+    assert p.missing() == [1, 4]
+    assert p.template == 2
+
+@pytest.mark.parametrize("placements", [
+    [],
+    BOARD,                                                  # no copies
+    panel(1, 1),                                            # just one
+    panel(2, 2)[:-1],                                       # a board with some of its parts
+    panel(2, 2) + [("D1x11", 1.0, 1.0)],                    # a part on one board only
+    [(n, x + (0.5 if n == "R1x12" else 0), y) for (n, x, y) in panel(2, 2)],    # off the grid
+    panel(2, 1) + [("R1x99", 5.0, 3.0)],                    # two copies in one place
+])
+def test_not_a_panel(placements):
+    assert Panel.fromPlacements(placements) is None
+
+def test_single():
+    p = Panel.fromPlacements(panel(2, 2, skip=(1,)))
+    parts = dict((n, part(n, x, y)) for (n, x, y) in panel(2, 2, skip=(1,)))
+    parts["FID1"] = part("FID1", 0.0, 0.0, CHMTPickNPlace.SKIP)
+    before = copy.deepcopy(parts)
+    single = p.single(parts)
+    # board 2 is the first one left, moved back to board 1's place
+    assert sorted(single) == ["C1x12", "R1x12"]
+    assert (single["R1x12"].x, single["R1x12"].y) == (5.0, 3.0)
+    assert (single["C1x12"].x, single["C1x12"].y) == (12.5, 7.25)
+    assert parts["R1x12"].x == before["R1x12"].x
+
+def test_single_with_a_part_outside_the_copies():
+    p = Panel.fromPlacements(panel(2, 1))
+    parts = dict((n, part(n, x, y)) for (n, x, y) in panel(2, 1))
+    parts["U1"] = part("U1", 90.0, 0.0)
+    assert p.single(parts) is None
+
+SCRIPT = """GRID MIL;
+add 0603-RES@SPCoast R1x11 R90.000000 (200.000000 100.000000);
+add 0603-RES@SPCoast R1x12 R90.000000 (1200.000000 100.000000);
+ADD 0603-CAP@SPCoast C1x11 MR0 (300.000000 500.000000);
+add 0603-CAP@SPCoast C1x12 MR0 (1300.000000 500.000000);
+wire 10 (0 0) (2000 0);
+"""
+
+def test_readScript(tmp_path):
+    fn = tmp_path / "board_array.scr"
+    fn.write_text(SCRIPT)
+    placements = Panel.readScript(str(fn))
+    assert [n for (n, x, y) in placements] == ["R1x11", "R1x12", "C1x11", "C1x12"]
+    assert [c for (n, x, y) in placements for c in (x, y)] == \
+        pytest.approx([5.08, 2.54, 30.48, 2.54, 7.62, 12.7, 33.02, 12.7])
+
+def test_detect(tmp_path):
+    board = SimpleNamespace(elements=dict(
+        (n, {"name": n, "x": str(x), "y": str(y)}) for (n, x, y) in panel(2, 2)))
+    assert Panel.detect(str(tmp_path / "board.brd"), board) is None
+    p = Panel.detect(str(tmp_path / "board_array.brd"), board)
+    assert (p.columns, p.rows, p.dx, p.dy) == (2, 2, 40.0, 30.0)
+
+    # the script, when there is one, is used instead of the board
+    (tmp_path / "board_array.scr").write_text(SCRIPT)
+    p = Panel.detect(str(tmp_path / "board_array.brd"), board)
+    assert (p.columns, p.rows) == (2, 1)
+    assert p.dx == pytest.approx(25.4)
@@ -0,0 +1,107 @@
+"""
+PickPath: pick positions, trip costs, and the 2-opt tour improvement
+checked against trying every reversal
+"""
+
+import configparser
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from CAMTool.fab import PickPath
+
+
+def feeder(station, head=1, xOffset=0.0, yOffset=0.0):
+    return SimpleNamespace(station=station, head=head, xOffset=xOffset, yOffset=yOffset)
+
+def asymmetric(n, seed):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(1, 100, (n, n)), rng.uniform(1, 100, n))
+
+# every tour one reversal away from tour
+def reversals(tour):
+    for (i, j) in itertools.combinations(range(len(tour)), 2):
+        yield tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+
+
+def test_pickPosition(monkeypatch):
+    monkeypatch.setattr(PickPath, "feederx", 5.0)
+    monkeypatch.setattr(PickPath, "feedery", -40.0)
+    monkeypatch.setattr(PickPath, "feederpitch", 8.0)
+    assert PickPath.pickPosition(feeder(1)) == (5.0, -40.0)
+    assert PickPath.pickPosition(feeder(4)) == (29.0, -40.0)
+    assert PickPath.pickPosition(feeder(4, xOffset=0.5, yOffset=-0.25)) == (29.5, -40.25)
+
+def test_configure(monkeypatch):
+    for name in ("feederx", "feedery", "feederpitch"):
+        monkeypatch.setattr(PickPath, name, getattr(PickPath, name))
+    configuration = configparser.ConfigParser()
+    configuration.read_dict({"chmt": {"feederx": "12.5", "feederpitch": "4"}})
+    PickPath.configure(configuration)
+    assert (PickPath.feederx, PickPath.feedery, PickPath.feederpitch) == (12.5, -50.0, 4.0)
+
+def test_tripCosts():
+    picks  = np.array([(0.0, 0.0), (10.0, 0.0)])
+    places = np.array([(0.0, 3.0), (10.0, 4.0)])
+    (costs, start) = PickPath.tripCosts(picks, places, 0.0, -4.0)
+    # placing 0, then on to feeder 1 and placing 1
+    assert costs[0, 1] == pytest.approx(np.hypot(10, 3) + 4)
+    assert costs[1, 0] == pytest.approx(np.hypot(10, 4) + 3)
+    assert start.tolist() == pytest.approx([4 + 3, np.hypot(10, 4) + 4])
+    assert PickPath.tourLength([0, 1], costs, start) == pytest.approx(7 + np.hypot(10, 3) + 4)
+    assert PickPath.tourLength([], costs, start) == 0.0
+
+def test_nearestNeighbour():
+    costs = np.array([[0, 5, 1],
+                      [1, 0, 9],
+                      [9, 2, 0]], dtype=float)
+    assert PickPath.nearestNeighbour(costs, np.array([3.0, 9.0, 4.0])) == [0, 2, 1]
+
+@pytest.mark.parametrize("n, seed", [(3, 1), (4, 2), (6, 3), (9, 4), (15, 5), (30, 6)] +
+                                    [(10, seed) for seed in range(10, 30)])
+def test_twoOpt_reaches_a_local_minimum(n, seed):
+    (costs, start) = asymmetric(n, seed)
+    first = PickPath.nearestNeighbour(costs, start)
+    tour  = PickPath.twoOpt(first, costs, start)
+    assert sorted(tour) == list(range(n))
+    length = PickPath.tourLength(tour, costs, start)
+    assert length <= PickPath.tourLength(first, costs, start) + 1e-9
+    for other in reversals(tour):
+        assert PickPath.tourLength(other, costs, start) >= length - 1e-6
+
+@pytest.mark.parametrize("seed", range(10))
+def test_twoOpt_only_takes_shortening_reversals(seed, monkeypatch):
+    # a wrong delta would take reversals that make the tour longer
+    monkeypatch.setattr(PickPath, "MAXPASSES", 1)
+    (costs, start) = asymmetric(12, seed)
+    tour = list(np.random.default_rng(seed).permutation(12))
+    assert PickPath.tourLength(PickPath.twoOpt(tour, costs, start), costs, start) <= \
+           PickPath.tourLength(tour, costs, start) + 1e-9
+
+def test_twoOpt_short_tours():
+    (costs, start) = asymmetric(2, 0)
+    assert PickPath.twoOpt([1, 0], costs, start) == [1, 0]
+    assert PickPath.twoOpt([], costs, start) == []
+
+def test_optimize():
+    feeders = {"A": feeder(1), "B": feeder(2), "C": feeder(3, head=2)}
+    # designator order zig-zags from one end of the board to the other
+    parts = [SimpleNamespace(name="R{}".format(i), feeder=("A", "B")[i % 2], x=(0, 100)[i % 2], y=i * 5.0)
+             for i in range(8)]
+    parts.append(SimpleNamespace(name="U1", feeder="C", x=50.0, y=0.0))
+    (ordered, before, after) = PickPath.optimize(parts, feeders)
+    assert sorted(p.name for p in ordered) == sorted(p.name for p in parts)
+    assert after < before
+    assert ordered[-1].name == "U1"         # head 2's parts after head 1's
+    picks  = np.array([PickPath.pickPosition(feeders[p.feeder]) for p in parts])
+    places = np.array([(p.x, p.y) for p in parts])
+    assert before == pytest.approx(PickPath.travel(picks, places, range(len(parts))))
+    assert after  == pytest.approx(PickPath.travel(picks, places, [parts.index(p) for p in ordered]))
+
+def test_optimize_keeps_a_good_order():
+    feeders = {"A": feeder(1)}
+    parts = [SimpleNamespace(name="R1", feeder="A", x=0.0, y=0.0)]
+    assert PickPath.optimize(parts, feeders)[0] == parts
+    assert PickPath.optimize([], feeders) == ([], 0.0, 0.0)
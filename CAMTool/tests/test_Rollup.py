@@ -0,0 +1,69 @@
+"""
+Rollup: the build plan, and per-component totals over several boards
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from CAMTool.fab import BOM, CHMTPickNPlace, Rollup
+
+
+def line(value, package, feeder, *names):
+    return BOM.Line((value + "-" + package).lower(), value, package, "SPCoast", feeder, names)
+
+FEEDERS = {"1": SimpleNamespace(pullDist=4), "12": SimpleNamespace(pullDist=8),
+           "3": SimpleNamespace(pullDist=4)}
+
+SIGNALS = (line("10k", "0603-RES", "1", "R1", "R2"),
+           line("100n", "0603-CAP", "3", "C1"),
+           line("HDR", "1X4", CHMTPickNPlace.SKIP, "J1"))
+TURNOUT = (line("10K", "0603-RES", "1", "R1"),
+           line("SOIC8", "IC", "12", "U1"),
+           line("2N7002", "SOT23", CHMTPickNPlace.NOTFOUND, "Q1", "Q2"))
+
+
+def test_readPlan(tmp_path):
+    plan = tmp_path / "build.csv"
+    plan.write_text("# board,                 quantity\n"
+                    "signals/signals.brd,     10\n"
+                    "\n"
+                    "turnout/turnout_array.brd\n"
+                    "signals/signals.brd,     2\n"
+                    ",\n")
+    assert Rollup.readPlan(str(plan)) == [
+        (os.path.join(str(tmp_path), "signals/signals.brd"), 12),
+        (os.path.join(str(tmp_path), "turnout/turnout_array.brd"), 1),
+    ]
+
+def test_readPlan_bad_quantity(tmp_path):
+    plan = tmp_path / "build.csv"
+    plan.write_text("signals.brd, ten\n")
+    with pytest.raises(ValueError, match="quantity for signals.brd is not a number: 'ten'"):
+        Rollup.readPlan(str(plan))
+
+def test_rollup():
+    totals = Rollup.rollup([("signals.brd", 10, SIGNALS), ("turnout.brd", 3, TURNOUT)], FEEDERS)
+    assert [(t.id, t.quantity, t.tape) for t in totals] == [
+        ("2n7002-sot23",     6, 0),             # not on a feeder
+        ("10k-0603-res",    23, 23 * 4),        # 10k and 10K together
+        ("100n-0603-cap",   10, 10 * 4),
+        ("hdr-1x4",         10, 0),
+        ("soic8-ic",         3, 3 * 8),
+    ]
+    assert totals[1].boards == (("signals.brd", 2, 10), ("turnout.brd", 1, 3))
+    assert [(t.feederName, t.smd) for t in totals] == [
+        ("NONE", True), ("1", True), ("3", True), ("PTH", False), ("12", True)]
+
+def test_byFeeder():
+    totals = Rollup.rollup([("signals.brd", 10, SIGNALS), ("turnout.brd", 3, TURNOUT)], FEEDERS)
+    assert [(f, quantity, tape, [t.id for t in ts]) for (f, quantity, tape, ts) in Rollup.byFeeder(totals)] == [
+        ("1",  23, 92, ["10k-0603-res"]),
+        ("3",  10, 40, ["100n-0603-cap"]),
+        ("12",  3, 24, ["soic8-ic"]),
+    ]
+
+def test_nothing_to_roll_up():
+    assert Rollup.rollup([], FEEDERS) == ()
+    assert Rollup.byFeeder(()) == []
@@ -0,0 +1,81 @@
+"""
+Rotation: the rotation string grammar, and placing points with a Transform
+"""
+
+import numpy as np
+import pytest
+
+from CAMTool.fab import Rotation
+
+
+@pytest.mark.parametrize("text, angle, mirror, spin", [
+    ("R0",      0.0,   False, False),
+    ("R90",     90.0,  False, False),
+    ("R-90",    270.0, False, False),
+    ("R+45",    45.0,  False, False),
+    ("R360",    0.0,   False, False),
+    ("R450",    90.0,  False, False),
+    ("R.5",     0.5,   False, False),
+    ("R33.3",   33.3,  False, False),
+    ("MR0",     0.0,   True,  False),
+    ("SR0",     0.0,   False, True),
+    ("SMR33.3", 33.3,  True,  True),
+    ("MSR180",  180.0, True,  True),
+    ("mr90",    90.0,  True,  False),
+    (" R90 ",   90.0,  False, False),
+    ("90",      90.0,  False, False),       # the R is optional
+    ("M270",    270.0, True,  False),
+    ("",        0.0,   False, False),
+    (None,      0.0,   False, False),
+])
+def test_parse(text, angle, mirror, spin):
+    r = Rotation.parse(text)
+    assert (r.angle, r.mirror, r.spin) == (pytest.approx(angle), mirror, spin)
+
+@pytest.mark.parametrize("text", ["R", "M", "X90", "RR90", "R90deg", "R9 0", "R90M", "R--90", "R1.2.3"])
+def test_parse_rejects(text):
+    with pytest.raises(ValueError):
+        Rotation.parse(text)
+
+def test_parse_is_shared():
+    assert Rotation.parse("MR90") is Rotation.parse("MR90")
+    assert Rotation.getAngle("R-90") == 270.0
+
+@pytest.mark.parametrize("text, expected", [
+    ("R0",   [(1, 0), (0, 1)]),
+    ("R90",  [(0, 1), (-1, 0)]),
+    ("R180", [(-1, 0), (0, -1)]),
+    ("MR0",  [(-1, 0), (0, 1)]),
+    ("MR90", [(0, -1), (-1, 0)]),           # mirrored, then rotated
+])
+def test_apply(text, expected):
+    T = Rotation.parse(text).at()
+    assert T.apply([(1, 0), (0, 1)]) == pytest.approx(np.array(expected, dtype=float))
+
+def test_apply_at():
+    T = Rotation.parse("R90").at(10, "5")
+    assert T.apply([(2, 1)]) == pytest.approx(np.array([(9.0, 7.0)]))
+    assert T.apply(np.zeros((3, 4, 2))).shape == (3, 4, 2)
+
+def test_matrix_is_read_only():
+    with pytest.raises(ValueError):
+        Rotation.parse("R90").matrix[0, 0] = 2.0
+
+@pytest.mark.parametrize("text, expected", [
+    ("R0",  (10, 5, 12, 6)),
+    ("R90", (9, 5, 10, 7)),
+    ("MR0", (8, 5, 10, 6)),
+    ("R45", (10 - 0.5 ** 0.5, 5, 10 + 2 * 0.5 ** 0.5, 5 + 1.5 * 2 ** 0.5)),
+])
+def test_applyBounds(text, expected):
+    T = Rotation.parse(text).at(10, 5)
+    assert T.applyBounds([0, 0, 2, 1])[0] == pytest.approx(expected)
+
+def test_applyAll():
+    transforms = [Rotation.parse(text).at(x, y) for (text, x, y) in
+                  (("R0", 0, 0), ("R90", 10, 5), ("MR0", -1, 0), ("SMR33.3", 2, 2))]
+    points = np.array([(1.0, 0.0), (0.5, 2.0), (-3.0, 1.0)])
+    together = Rotation.applyAll(transforms, points)
+    assert together.shape == (4, 3, 2)
+    for (T, placed) in zip(transforms, together):
+        assert placed == pytest.approx(T.apply(points))
@@ -0,0 +1,88 @@
+"""
+SVGStream: the streamed markup, checked against svgwrite's, and path data
+for wires, rings and discs
+"""
+
+import io
+from xml.etree import ElementTree
+
+import numpy as np
+import pytest
+
+from CAMTool.fab import Geometry, SVGStream
+
+NS = "{http://www.w3.org/2000/svg}"
+
+
+def draw(kind):
+    output = io.StringIO()
+    dwg = kind(output, "30mm", "20mm", (-5, -25, 30, 20))
+    dwg.style(".wires { fill: none; }")
+    dwg.rect((-5, -25), (30, 20), "grey")
+    dwg.group(transform="scale(1 -1)")
+    dwg.group("layer1")
+    dwg.path("M0 0L10 0", "fills")
+    dwg.path("M0 0L10 10", "wires", 0.254)
+    dwg.text("R1 <10k & \"5%\">", "texts", 1.4, "translate(1 2) rotate(90) scale(1 -1)", "middle", "central")
+    dwg.endGroup()
+    dwg.endGroup()
+    dwg.close()
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("color, expected", [
+    ("FF255B35", "rgb(37,91,53)"),
+    ("b4ff0000", "rgb(255,0,0)"),
+    ("00000000", "rgb(0,0,0)"),
+])
+def test_rgb(color, expected):
+    assert SVGStream.rgb(color) == expected
+
+def test_writer():
+    svg = draw(SVGStream.Writer)
+    assert svg.startswith(SVGStream.XMLDECL)
+    root = ElementTree.fromstring(svg.encode('utf-8'))
+    assert (root.get("width"), root.get("height"), root.get("viewBox")) == ("30mm", "20mm", "-5,-25,30,20")
+    assert root.find(NS + "defs/" + NS + "style").text == ".wires { fill: none; }"
+    (outer,) = root.findall(NS + "g")
+    assert outer.get("transform") == "scale(1 -1)"
+    (layer,) = outer
+    assert layer.get("class") == "layer1"
+    (fills, wires, text) = layer
+    assert (fills.get("d"), fills.get("stroke-width")) == ("M0 0L10 0", None)
+    assert (wires.get("d"), wires.get("stroke-width")) == ("M0 0L10 10", "0.254")
+    assert text.text == "R1 <10k & \"5%\">"
+    assert (text.get("text-anchor"), text.get("dominant-baseline"), text.get("font-size")) == \
+        ("middle", "central", "1.4")
+
+def test_same_markup_as_svgwrite():
+    pytest.importorskip("svgwrite")
+    assert draw(SVGStream.Writer) == draw(SVGStream.Validator)
+
+def wires(*rows):
+    return Geometry.wireArray([(x1, y1, x2, y2, 0.2, 21, curve) for (x1, y1, x2, y2, curve) in rows])
+
+@pytest.mark.parametrize("rows, d", [
+    ([(0, 0, 10, 0, 0), (10, 0, 10, 5, 0)],   "M0 0L10 0L10 5"),                  # joined end to end
+    ([(0, 0, 10, 0, 0), (20, 0, 20, 5, 0)],   "M0 0L10 0M20 0L20 5"),
+    ([(1, 0, -1, 0, 180)],                    "M1 0A1 1 0 0 1 -1 0"),             # counterclockwise
+    ([(1, 0, -1, 0, -180)],                   "M1 0A1 1 0 0 0 -1 0"),             # clockwise
+    ([(1, 0, 0, -1, 270)],                    "M1 0A1 1 0 1 1 0 -1"),             # the long way round
+    ([(0, 0, 0.1234567, 2, 0)],               "M0 0L0.123457 2"),
+    ([],                                      ""),
+])
+def test_pathData(rows, d):
+    assert SVGStream.pathData(wires(*rows)) == d
+
+def test_ringData():
+    triangles = np.array([[(0, 0), (1, 0), (0, 1)], [(5, 5), (6, 5), (5, 6)]], dtype=float)
+    square = np.array([[(0, 0), (2, 0), (2, 2), (0, 2)]], dtype=float)
+    rings = [(np.array([1, 1]), triangles), (np.array([16]), square)]
+    assert SVGStream.ringData(rings) == "M0 0L1 0L0 1ZM5 5L6 5L5 6ZM0 0L2 0L2 2L0 2Z"
+    assert SVGStream.ringData([]) == ""
+
+def test_discData():
+    discs = np.array([(1, 2, 0.5, 17), (0, 0, 1.25, 44)], dtype=float)
+    assert SVGStream.discData(discs) == ("M0.5 2A0.5 0.5 0 1 1 1.5 2A0.5 0.5 0 1 1 0.5 2Z"
+                                         "M-1.25 0A1.25 1.25 0 1 1 1.25 0A1.25 1.25 0 1 1 -1.25 0Z")
+    assert SVGStream.discData(np.zeros((0, 4))) == ""
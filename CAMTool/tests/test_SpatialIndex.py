@@ -0,0 +1,80 @@
+"""
+SpatialIndex: every query checked against looking at every item
+"""
+
+import numpy as np
+import pytest
+
+from CAMTool.fab.SpatialIndex import SpatialIndex
+
+
+def boxes(n, seed):
+    rng  = np.random.default_rng(seed)
+    xy   = rng.uniform(-50, 50, (n, 2))
+    size = rng.uniform(0, 4, (n, 2))
+    return np.hstack((xy, xy + size))
+
+def distances(b, x, y):
+    dx = np.maximum(np.maximum(b[:, 0] - x, x - b[:, 2]), 0)
+    dy = np.maximum(np.maximum(b[:, 1] - y, y - b[:, 3]), 0)
+    return np.hypot(dx, dy)
+
+@pytest.fixture(params=[None, 0.5, 7.0, 500.0], ids=["default", "fine", "coarse", "one-cell"])
+def index(request):
+    b = boxes(300, 1)
+    return (b, SpatialIndex(b, ["item{}".format(i) for i in range(len(b))], request.param))
+
+POINTS = [(0, 0), (-49, 51), (20.5, -3.25), (-200, 10), (75, 75)]
+
+
+def test_query(index):
+    (b, idx) = index
+    for (xmin, ymin, xmax, ymax) in [(-10, -10, 10, 10), (30, -60, 31, 60), (-100, -100, 100, 100), (60, 60, 70, 70)]:
+        hit = (b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)
+        assert idx.query(xmin, ymin, xmax, ymax) == [idx.items[i] for i in np.flatnonzero(hit)]
+
+@pytest.mark.parametrize("x, y", POINTS)
+def test_within(index, x, y):
+    (b, idx) = index
+    for distance in (0.0, 2.5, 12.0):
+        hit = distances(b, x, y) <= distance
+        assert idx.within(x, y, distance) == [idx.items[i] for i in np.flatnonzero(hit)]
+
+@pytest.mark.parametrize("x, y", POINTS)
+def test_nearest(index, x, y):
+    (b, idx) = index
+    d = distances(b, x, y)
+    for count in (1, 5, 300, 400):
+        expected = sorted(zip(d.tolist(), range(len(b))))[:count]
+        assert idx.nearest(x, y, count) == [(di, idx.items[i]) for (di, i) in expected]
+
+def test_overlaps(index):
+    (b, idx) = index
+    for clearance in (0.0, 0.75):
+        expected = []
+        for i in range(len(b)):
+            dx = np.maximum(np.maximum(b[i + 1:, 0] - b[i, 2], b[i, 0] - b[i + 1:, 2]), 0)
+            dy = np.maximum(np.maximum(b[i + 1:, 1] - b[i, 3], b[i, 1] - b[i + 1:, 3]), 0)
+            expected.extend((idx.items[i], idx.items[j]) for j in np.flatnonzero(np.hypot(dx, dy) <= clearance) + i + 1)
+        assert idx.overlaps(clearance) == expected
+
+def test_touching_boxes_overlap():
+    idx = SpatialIndex([(0, 0, 1, 1), (1, 0, 2, 1), (3, 0, 4, 1)], "abc")
+    assert idx.overlaps() == [("a", "b")]
+    assert idx.overlaps(1.0) == [("a", "b"), ("b", "c")]
+    assert idx.query(1, 0.5, 1, 0.5) == ["a", "b"]
+    assert idx.nearest(2.5, 0.5, 2) == [(0.5, "b"), (0.5, "c")]
+
+def test_empty():
+    idx = SpatialIndex(np.zeros((0, 4)), [])
+    assert len(idx) == 0
+    assert idx.query(-1, -1, 1, 1) == []
+    assert idx.within(0, 0, 10) == []
+    assert idx.nearest(0, 0, 3) == []
+    assert idx.overlaps() == []
+
+def test_points():
+    idx = SpatialIndex([(2, 2, 2, 2), (2, 2, 2, 2), (5, 6, 5, 6)], ["p", "q", "r"])
+    assert idx.within(2, 2, 0) == ["p", "q"]
+    assert idx.nearest(5, 2, 1) == [(3.0, "p")]
+    assert idx.overlaps() == [("p", "q")]
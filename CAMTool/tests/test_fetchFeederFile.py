@@ -0,0 +1,160 @@
+"""
+CHMTPickNPlace.fetchFeederFile against a local HTTP stand-in for Google
+Sheets: each test scripts the server's replies, one per request
+"""
+
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from CAMTool.fab import CHMTPickNPlace
+
+SHEET   = b"Tape Size,Feeder Number,Component\r\n8mm,1,10k-0603-RES\r\n"
+NEWER   = b"Tape Size,Feeder Number,Component\r\n8mm,1,1k-0603-RES\r\n"
+ERROR   = b"<html><body>Sign in to continue</body></html>"
+
+
+class StandIn(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.replies  = []      # (status, headers, body, delay) for each request, in turn
+        self.requests = []      # the headers each request came with
+        self.release  = threading.Event()
+
+    def handle_error(self, request, client_address):
+        pass    # a client that timed out and hung up
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        (status, headers, body, delay) = self.server.replies.pop(0)
+        if delay:
+            self.server.release.wait(delay)
+        self.send_response(status)
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(CHMTPickNPlace, "timeout", 0.5)
+    monkeypatch.setattr(CHMTPickNPlace, "retries", 3)
+    monkeypatch.setattr(CHMTPickNPlace, "backoff", 1.0)
+    monkeypatch.setattr(CHMTPickNPlace.time, "sleep", slept.append)
+    return slept
+
+def url(server):
+    return "http://127.0.0.1:{}/feeders.csv".format(server.server_address[1])
+
+def reply(status=200, body=b"", delay=0, **headers):
+    return (status, dict((name.replace("_", "-"), value) for (name, value) in headers.items()), body, delay)
+
+def read(filename):
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+def test_download_saves_the_etag(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.append(reply(body=SHEET, ETag='"v1"', Last_Modified="Mon, 01 Jun 2020 00:00:00 GMT"))
+
+    assert CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert read(feeders) == SHEET
+    validators = json.loads(read(CHMTPickNPlace.validatorsfilename(feeders)))
+    assert validators == {"url": url(server), "etag": '"v1"', "modified": "Mon, 01 Jun 2020 00:00:00 GMT"}
+    assert "If-None-Match" not in server.requests[0]
+    assert sleeps == []
+
+def test_unchanged_sheet_keeps_the_copy(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.append(reply(body=SHEET, ETag='"v1"'))
+    server.replies.append(reply(304))
+    CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+
+    assert not CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert read(feeders) == SHEET
+    assert sleeps == []
+
+def test_retries_server_errors_with_backoff(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.extend([reply(503), reply(500), reply(body=SHEET)])
+
+    assert CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert len(server.requests) == 3
+    assert sleeps == [1.0, 2.0]
+    assert read(feeders) == SHEET
+
+def test_retries_a_timeout(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.extend([reply(body=SHEET, delay=5), reply(body=NEWER)])
+
+    assert CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert sleeps == [1.0]
+    assert read(feeders) == NEWER
+
+def test_client_errors_are_not_retried(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.append(reply(404))
+
+    with pytest.raises(Exception):
+        CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert len(server.requests) == 1
+    assert not os.path.exists(feeders)
+
+def test_error_page_is_not_a_feeder_sheet(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.append(reply(body=ERROR, Content_Type="text/html"))
+
+    assert not CHMTPickNPlace.isFeederSheet(ERROR)
+    with pytest.raises(ValueError):
+        CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert not os.path.exists(feeders)
+
+def test_error_page_keeps_the_copy(server, sleeps, tmp_path):
+    feeders = tmp_path / "feeders.csv"
+    feeders.write_bytes(SHEET)
+    server.replies.append(reply(body=ERROR, Content_Type="text/html"))
+
+    assert not CHMTPickNPlace.fetchFeederFile(url(server), str(feeders))
+    assert feeders.read_bytes() == SHEET
+
+def test_falls_back_to_the_copy_when_every_try_fails(server, sleeps, tmp_path):
+    feeders = tmp_path / "feeders.csv"
+    feeders.write_bytes(SHEET)
+    server.replies.extend([reply(500), reply(502), reply(503)])
+
+    assert not CHMTPickNPlace.fetchFeederFile(url(server), str(feeders))
+    assert len(server.requests) == 3
+    assert sleeps == [1.0, 2.0]
+    assert feeders.read_bytes() == SHEET
+    assert [p.name for p in tmp_path.iterdir()] == ["feeders.csv"]
+
+def test_no_copy_to_fall_back_to(server, sleeps, tmp_path):
+    feeders = str(tmp_path / "feeders.csv")
+    server.replies.extend([reply(500), reply(500), reply(500)])
+
+    with pytest.raises(Exception):
+        CHMTPickNPlace.fetchFeederFile(url(server), feeders)
+    assert not os.path.exists(feeders)